@@ -1,27 +1,52 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends
+from datetime import date as date_type, timedelta
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import EmailStr
 from sqlmodel import Session
+from app.core.config import get_settings
 from app.db.session import get_session
-from app.models.schemas import BookingCreate, BookingResponse
+from app.models.schemas import BookingAvailability, BookingCreate, BookingResponse
 from app.models.db_models import InterviewBooking
+from app.services.booking_engine import InvalidSlot, SlotUnavailable, booking_index, reserve
 
 router = APIRouter(prefix="/booking", tags=["booking"])
 
-@router.post("", response_model=BookingResponse)
-def create_booking(payload: BookingCreate, session: Session = Depends(get_session)) -> BookingResponse:
-    booking = InterviewBooking(
-        name=payload.name,
-        email=payload.email,
-        date=payload.date,
-        time=payload.time,
-    )
-    session.add(booking)
-    session.commit()
-    session.refresh(booking)
+def _to_response(booking: InterviewBooking) -> BookingResponse:
     return BookingResponse(
         id=booking.id,
         name=booking.name,
         email=booking.email,
         date=booking.date,
         time=booking.time,
-    )
\ No newline at end of file
+    )
+
+@router.post("", response_model=BookingResponse)
+def create_booking(payload: BookingCreate, session: Session = Depends(get_session)) -> BookingResponse:
+    """Book one slot; 409 when it is already taken, 422 when the time is not a slot start."""
+    try:
+        return _to_response(reserve(session, payload))
+    except InvalidSlot as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SlotUnavailable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/availability", response_model=List[BookingAvailability])
+def availability(
+    date: date_type,
+    days: int = Query(1, ge=1),
+) -> List[BookingAvailability]:
+    """Free and booked slot start times for ``days`` days from ``date``."""
+    max_days = get_settings().booking_availability_max_days
+    if days > max_days:
+        raise HTTPException(status_code=422, detail=f"days must be at most {max_days}")
+    span = [date + timedelta(days=i) for i in range(days)]
+    slots = booking_index.availability(span)
+    return [
+        BookingAvailability(date=d, slot_minutes=booking_index.slot_minutes, **slots[d])
+        for d in span
+    ]
+
+@router.get("/by-email", response_model=List[BookingResponse])
+def bookings_by_email(email: EmailStr) -> List[BookingResponse]:
+    return [BookingResponse(**b) for b in booking_index.by_email(email)]
@@ -1,21 +1,34 @@
 from __future__ import annotations
-from typing import List, Dict
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, List, Dict, Set, Tuple
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.db.session import get_session
-from app.models.schemas import ChatQuery, ChatAnswer
-from app.models.db_models import ChatSession as ChatSessionDB, ChatMessage as ChatMessageDB
-from app.services.redis_memory import *
-from app.services.retriever import retrieve
-from app.services.groq_llm import chat_completion
-from app.services.booking_llm import extract_booking_info
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.metrics import observe, stage
+from app.db.session import async_engine, get_async_session
+from app.core.config import get_settings
+from app.models.schemas import ChatQuery, ChatAnswer, ChatBatchQuery, ChatBatchAnswer, ChatBatchItem
+from app.models.db_models import ChatMessage as ChatMessageDB
+from app.services.redis_memory import aadd_turn, aget_context
+from app.services.retriever import Retrieval, aretrieve_hybrid, aretrieve_many
+from app.services.groq_llm import achat_completion, astream_chat_completion
+from app.services.booking_llm import aextract_booking_info
+from app.services.intent import stats as intent_stats
+from app.services.semantic_cache import aget_namespace_version, semantic_cache
+from app.services.write_behind import chat_messages_buffer
+from app.services.chat_sessions import chat_session_resolver
+from app.services.history_summary import amaybe_update_summary
+from app.services.prompt_builder import PromptBuilder
+from app.services import booking_flow
 from datetime import datetime
-from app.models.schemas import BookingCreate
-from app.api.booking import create_booking
 import json
-import re
 
 
+settings = get_settings()
+
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 SYSTEM_PROMPT = (
@@ -23,63 +36,131 @@ SYSTEM_PROMPT = (
     "If the answer is not in the context, say you are not sure."
 )
 
-def build_prompt(history: List[Dict[str, str]], context_docs: List[Dict], last_booking: Dict | None = None) -> List[Dict[str, str]]:
-    context_strs = []
-    if last_booking:
-        context_strs.append(
-            "SessionInfo: last_booking="
-            f"{last_booking.get('name')} {last_booking.get('email')} "
-            f"on {last_booking.get('date')} at {last_booking.get('time')}"
-        )
-    for i, d in enumerate(context_docs):
-        meta = d.get("metadata", {})
-        chunk_index = meta.get("chunk_index")
-        filename = meta.get("filename")
-        text = meta.get("text") or ""
-        context_strs.append(f"[{i}] file={filename} chunk={chunk_index}\n{text}".strip())
-    context_block = "\n\n".join([c for c in context_strs if c]).strip()
-
-    messages: List[Dict[str, str]] = [{"role": "system", "content": SYSTEM_PROMPT}]
-    messages.extend(history)
-    if context_block:
-        messages.append({"role": "system", "content": f"Context:\n{context_block}"})
-    return messages
+prompt_builder = PromptBuilder(SYSTEM_PROMPT)
+
 
 def _is_booking_status_question(q: str) -> bool:
     ql = (q or "").lower()
     return any(k in ql for k in ["booked", "booking status", "confirm my booking", "was it booked", "did my interview"])
 
 
-def _normalize_hms_if_needed(t: str) -> str:
-    t = (t or "").strip()
+# strong refs so fire-and-forget tasks (persistence, summarization) are not garbage collected mid-flight
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _store_rows(session: AsyncSession | None, rows: List[Dict[str, Any]]) -> None:
+    if chat_messages_buffer is not None:
+        await chat_messages_buffer.submit(rows)
+    elif session is None:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            session.add_all([ChatMessageDB(**row) for row in rows])
+            await session.commit()
+    else:
+        session.add_all([ChatMessageDB(**row) for row in rows])
+        await session.commit()
+
+
+async def _persist_turn(
+    session: AsyncSession | None, cs_id: int, payload: ChatQuery, answer: str | None, prompt_tokens: int | None = None
+) -> None:
+    """Store the turn in Postgres and the session history in Redis. ``answer=None`` (generation
+    failed) stores only the user message in Postgres; the Redis history, which feeds the next
+    prompt, is left as it was."""
+    now = datetime.utcnow()
+    rows = [dict(session_id=cs_id, sender="user", message=payload.question, prompt_tokens=None, timestamp=now)]
+    if answer is not None:
+        rows.append(dict(session_id=cs_id, sender="assistant", message=answer, prompt_tokens=prompt_tokens, timestamp=now))
+    with stage("persist"):
+        if answer is None:
+            await _store_rows(session, rows)
+            return
+        if chat_messages_buffer is not None:
+            # Postgres rows go through the write-behind buffer; Redis (read by the next turn) is written now
+            _, turns = await asyncio.gather(
+                _store_rows(session, rows), aadd_turn(payload.session_id, payload.question, answer)
+            )
+        else:
+            await _store_rows(session, rows)
+            turns = await aadd_turn(payload.session_id, payload.question, answer)
+    _spawn(amaybe_update_summary(payload.session_id, turns))
+
+
+def _sources(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    sources = []
+    for d in docs:
+        md = d.get("metadata", {})
+        sources.append({
+            "id": d.get("id"),
+            "score": d.get("score"),
+            "filename": md.get("filename"),
+            "chunk_index": md.get("chunk_index"),
+            "page_start": md.get("page_start"),
+            "page_end": md.get("page_end"),
+        })
+        if "ranks" in d:
+            sources[-1]["ranks"] = d["ranks"]  # per-path rank after hybrid fusion
+    return sources
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    if task.done():
+        return
+    task.cancel()
     try:
-        # accept "HH:MM:SS"
-        datetime.strptime(t, "%H:%M:%S")
-        return t
-    except Exception:
+        await task
+    except asyncio.CancelledError:
         pass
-    try:
-        # accept "HH:MM" -> add seconds
-        return datetime.strptime(t, "%H:%M").strftime("%H:%M:00")
     except Exception:
-        return t  # let Pydantic validation catch invalid formats
+        # The retrieval result is unused on this path; don't let its failure mask the reply
+        logger.exception("Cancelled retrieval failed")
 
 
-@router.post("/query", response_model=ChatAnswer)
-def chat_query(payload: ChatQuery, session: Session = Depends(get_session)) -> ChatAnswer:
-    # Ensure chat session row exists
-    cs = session.exec(
-        select(ChatSessionDB).where(ChatSessionDB.session_id == payload.session_id)
-    ).first()
-    if not cs:
-        cs = ChatSessionDB(session_id=payload.session_id)
-        session.add(cs)
-        session.commit()
-        session.refresh(cs)
-
-    # Get history from Redis
-    history = get_messages(payload.session_id, limit=20)
-    last_booking = get_last_booking(payload.session_id)
+@dataclass
+class _Turn:
+    """Outcome of the pre-generation pipeline.
+
+    ``answer`` is set when the turn is fully answered without generation (booking flow, status
+    question, semantic-cache hit); otherwise ``messages`` holds the prompt for the LLM.
+    """
+    cs_id: int
+    answer: str | None = None
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    cache_key: Tuple[str, int, List[float], List[str]] | None = None
+    retrieval: Dict[str, Any] | None = None
+    prompt: Dict[str, Any] | None = None
+
+    @property
+    def prompt_tokens(self) -> int | None:
+        return self.prompt["prompt_tokens"] if self.prompt else None
+
+    def remember(self, answer: str) -> None:
+        if semantic_cache is not None and self.cache_key is not None:
+            ns, version, vec, chunk_ids = self.cache_key
+            semantic_cache.store(ns, version, vec, chunk_ids, answer, self.sources)
+
+
+async def _prepare_turn(session: AsyncSession, payload: ChatQuery) -> _Turn:
+    # Session row (DB) and history/booking (Redis) are independent lookups
+    cs_id, ctx = await asyncio.gather(
+        chat_session_resolver.resolve(session, payload.session_id),
+        aget_context(payload.session_id, limit=20),
+    )
+    last_booking = ctx.last_booking
+
+    # A booking in progress gets the turn first: the reply usually fills in a missing slot
+    in_booking = ctx.booking_draft is not None
+    if in_booking:
+        answer = await booking_flow.acontinue(session, payload.session_id, payload.question, ctx.booking_draft)
+        if answer is not None:
+            return _Turn(cs_id, answer=answer)
 
     if _is_booking_status_question(payload.question):
         if last_booking:
@@ -90,113 +171,230 @@ def chat_query(payload: ChatQuery, session: Session = Depends(get_session)) -> C
             )
         else:
             answer = "I don't see a booking in this session. If you booked earlier, please share the email or re-confirm the details."
-        user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-        asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-        session.add_all([user_msg, asst_msg]); session.commit()
-        add_message(payload.session_id, "user", payload.question)
-        add_message(payload.session_id, "assistant", answer)
-        return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])
-
-    booking_result = extract_booking_info(payload.question)
-    print("Booking extraction result:", booking_result)
-    if "BOOKING_READY" in booking_result:
+        return _Turn(cs_id, answer=answer)
+
+    # Speculatively start retrieval while the booking classifier runs; most turns are RAG turns,
+    # so this hides one LLM round-trip. The task is cancelled if the message turns out to be a booking.
+    ns = payload.namespace or "__default__"
+    retrieval = asyncio.create_task(aretrieve_hybrid(
+        payload.question, top_k=payload.top_k, namespace=ns,
+        mode=payload.mode, vector_weight=payload.vector_weight, lexical_weight=payload.lexical_weight,
+    ))
+    try:
+        # an open draft already ruled this message out as part of the booking
+        booking_result = "NO_BOOKING" if in_booking else await aextract_booking_info(payload.question)
+    except BaseException:
+        await _cancel(retrieval)
+        raise
+    logger.debug(f"Booking extraction result: {booking_result}")
+
+    if not booking_flow.is_booking(booking_result):
+        result = await retrieval
+        query_vec, docs = result.vector, result.docs
+        chunk_ids = [d.get("id") for d in docs]
+        turn = _Turn(cs_id, sources=_sources(docs), retrieval=result.info())
+        if semantic_cache is not None and query_vec is not None:
+            with stage("semantic_cache"):
+                ns_version = await aget_namespace_version(ns)
+                cached = semantic_cache.lookup(ns, ns_version, query_vec, chunk_ids)
+            if cached is not None:
+                logger.debug(f"Semantic cache hit for namespace {ns}")
+                return _Turn(cs_id, answer=cached.answer, sources=cached.sources, retrieval=turn.retrieval)
+            turn.cache_key = (ns, ns_version, query_vec, chunk_ids)
+
+        with stage("prompt"):
+            turn.messages, report = prompt_builder.build(
+                payload.question, ctx.unsummarized(), docs, summary=ctx.summary
+            )
+        turn.prompt = report.as_dict()
+        return turn
+
+    else:
+        # BOOKING_READY / BOOKING_PARTIAL: open or complete the session's booking draft
+        await _cancel(retrieval)
+        answer = await booking_flow.astart(session, payload.session_id, payload.question, booking_result)
+        return _Turn(cs_id, answer=answer)
+
+
+@router.post("/query", response_model=ChatAnswer)
+async def chat_query(payload: ChatQuery, session: AsyncSession = Depends(get_async_session)) -> ChatAnswer:
+    turn = await _prepare_turn(session, payload)
+    answer = turn.answer
+    if answer is None:
+        with stage("generate"):
+            answer = await achat_completion(turn.messages)
+        turn.remember(answer)
+    await _persist_turn(session, turn.cs_id, payload, answer, turn.prompt_tokens)
+    return ChatAnswer(
+        session_id=payload.session_id, answer=answer, sources=turn.sources,
+        retrieval=turn.retrieval, prompt=turn.prompt,
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _persist_streamed_turn(cs_id: int, payload: ChatQuery, answer: str | None, prompt_tokens: int | None) -> None:
+    # The request-scoped session may already be closed once the stream ends; None opens a fresh one
+    try:
+        await _persist_turn(None, cs_id, payload, answer, prompt_tokens)
+    except Exception:
+        logger.exception(f"Failed to persist streamed turn for session {payload.session_id}")
+
+
+@router.post("/stream")
+async def chat_stream(payload: ChatQuery, session: AsyncSession = Depends(get_async_session)) -> StreamingResponse:
+    """Server-Sent Events variant of /chat/query.
+
+    Emits ``sources`` first, then ``token`` events as Groq streams the answer, then ``done`` with
+    usage stats and time-to-first-token. History is written once the stream ends, including when
+    the client disconnects part-way (the partial answer is stored). Nothing is written when the
+    stream ends before the first token, and a failed generation stores only the user message.
+    """
+    started = time.perf_counter()
+    turn = await _prepare_turn(session, payload)
+
+    async def events() -> AsyncIterator[str]:
+        parts: List[str] = []
+        usage: Dict[str, Any] | None = None
+        ttft_ms: float | None = None
+        completed = False
+        failed = False
         try:
-            match = re.search(r'BOOKING_READY:\s*(\{.*?\})', booking_result)
-            if match:
-                booking_data = json.loads(match.group(1))
-                print("Parsed booking data:", booking_data)
+            yield _sse("sources", {"session_id": payload.session_id, "sources": turn.sources,
+                                   "retrieval": turn.retrieval})
+            if turn.answer is not None:
+                parts.append(turn.answer)
+                ttft_ms = (time.perf_counter() - started) * 1000
+                yield _sse("token", {"content": turn.answer})
             else:
-                raise ValueError("No JSON object found after BOOKING_READY")
-        except Exception:
-            answer = "I couldn’t parse the booking details. Please provide name, email, date (YYYY-MM-DD), and time (HH:MM:SS)."
-            user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-            asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-            session.add_all([user_msg, asst_msg]); session.commit()
-            add_message(payload.session_id, "user", payload.question)
-            add_message(payload.session_id, "assistant", answer)
-            return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])
-
-        name = (booking_data.get("name") or "").strip()
-        email = (booking_data.get("email") or "").strip()
-        date_str = (booking_data.get("date") or "").strip()
-        time_str = (booking_data.get("time") or "").strip()
-
-        if not name or not email or not date_str or not time_str:
-            missing = [k for k,v in {"name":name,"email":email,"date":date_str,"time":time_str}.items() if not v]
-            answer = f"To confirm your booking, please provide: {', '.join(missing)}. Time must be HH:MM:SS."
-            user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-            asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-            session.add_all([user_msg, asst_msg]); session.commit()
-            add_message(payload.session_id, "user", payload.question)
-            add_message(payload.session_id, "assistant", answer)
-            return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])
-
-        # 2) Build BookingCreate. Only normalize if validation fails.
-        try:
-            booking_payload = BookingCreate(name=name, email=email, date=date_str, time=time_str)
-        except Exception:
-            time_norm = _normalize_hms_if_needed(time_str)
-            try:
-                booking_payload = BookingCreate(name=name, email=email, date=date_str, time=time_norm)
-            except Exception:
-                answer = "Please provide the time in HH:MM:SS format (e.g., 15:00:00 for 3pm)."
-                user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-                asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-                session.add_all([user_msg, asst_msg]); session.commit()
-                add_message(payload.session_id, "user", payload.question)
-                add_message(payload.session_id, "assistant", answer)
-                return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])
-
-        # 3) Create booking BEFORE responding
-        booking_resp = create_booking(payload=booking_payload, session=session)
-
-        set_last_booking(payload.session_id, {
-            "name": booking_resp.name,
-            "email": booking_resp.email,
-            "date": str(booking_resp.date),
-            "time": str(booking_resp.time),
-        })
+                with stage("generate"):
+                    async for event in astream_chat_completion(turn.messages):
+                        if event["type"] == "token":
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - started) * 1000
+                                observe("ttft", ttft_ms / 1000)
+                            parts.append(event["content"])
+                            yield _sse("token", {"content": event["content"]})
+                        elif event["type"] == "usage":
+                            usage = event["usage"]
+            completed = True
+            yield _sse("done", {"usage": usage, "prompt": turn.prompt, "ttft_ms": ttft_ms,
+                                "total_ms": (time.perf_counter() - started) * 1000})
+        except Exception as e:
+            failed = True
+            logger.exception("Chat stream failed")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            answer = "".join(parts)
+            if completed and turn.answer is None:
+                turn.remember(answer)
+            # an empty or failed answer would otherwise be replayed in the next turn's prompt
+            if parts or completed:
+                # runs to completion even if this generator is being cancelled by a client disconnect
+                _spawn(_persist_streamed_turn(
+                    turn.cs_id, payload, None if failed else answer, turn.prompt_tokens
+                ))
+            logger.debug(f"Chat stream finished: ttft_ms={ttft_ms} completed={completed}")
 
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        answer = f"Booking confirmed for {booking_resp.name} on {booking_resp.date} at {booking_resp.time}."
-        user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-        asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-        session.add_all([user_msg, asst_msg]); session.commit()
-        add_message(payload.session_id, "user", payload.question)
-        add_message(payload.session_id, "assistant", answer)
-        return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])
-
-    elif booking_result.startswith("NO_BOOKING"):
-
-        ns = payload.namespace or "__default__"
-        docs = retrieve(payload.question, top_k=payload.top_k, namespace=ns)
-        messages = build_prompt(history, docs)
-        messages.append({"role": "user", "content": payload.question})
-        answer = chat_completion(messages)
-        user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-        asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-        session.add_all([user_msg, asst_msg]); session.commit()
-        add_message(payload.session_id, "user", payload.question)
-        add_message(payload.session_id, "assistant", answer)
-
-        sources = []
-        for d in docs:
-            md = d.get("metadata", {})
-            sources.append({
-                "id": d.get("id"),
-                "score": d.get("score"),
-                "filename": md.get("filename"),
-                "chunk_index": md.get("chunk_index"),
-            })
-
-        return ChatAnswer(session_id=payload.session_id, answer=answer, sources=sources)
 
-    else:
-        # LLM is asking for missing booking info (multi-turn slot filling)
-        answer = booking_result
-        user_msg = ChatMessageDB(session_id=cs.id, sender="user", message=payload.question)
-        asst_msg = ChatMessageDB(session_id=cs.id, sender="assistant", message=answer)
-        session.add_all([user_msg, asst_msg]); session.commit()
-        add_message(payload.session_id, "user", payload.question)
-        add_message(payload.session_id, "assistant", answer)
-        return ChatAnswer(session_id=payload.session_id, answer=answer, sources=[])    
\ No newline at end of file
+def _error(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+async def _answer_batch_item(
+    index: int,
+    question: str,
+    result: Retrieval | Exception,
+    payload: ChatBatchQuery,
+    ns_version: int | None,
+    generate_slots: asyncio.Semaphore,
+) -> ChatBatchItem:
+    item = ChatBatchItem(index=index, question=question)
+    if isinstance(result, Exception):
+        item.error = _error(result)
+        return item
+    docs = result.docs
+    item.sources, item.retrieval = _sources(docs), result.info()
+    chunk_ids = [d.get("id") for d in docs]
+    use_cache = ns_version is not None and result.vector is not None
+    if use_cache:
+        cached = semantic_cache.lookup(payload.namespace, ns_version, result.vector, chunk_ids)
+        if cached is not None:
+            item.answer, item.sources, item.cached = cached.answer, cached.sources, True
+            return item
+
+    messages, report = prompt_builder.build(question, [], docs)
+    item.prompt = report.as_dict()
+    try:
+        async with generate_slots:
+            with stage("generate"):
+                answer = await achat_completion(messages)
+    except Exception as e:
+        logger.warning(f"Batch item {index} generation failed: {e}")
+        item.error = _error(e)
+        return item
+    item.answer = answer
+    if use_cache:
+        semantic_cache.store(payload.namespace, ns_version, result.vector, chunk_ids, answer, item.sources)
+    return item
+
+
+@router.post("/batch", response_model=ChatBatchAnswer)
+async def chat_batch(payload: ChatBatchQuery) -> ChatBatchAnswer:
+    """Answer many independent questions in one request (offline evaluation, cache pre-warming).
+
+    All questions are embedded in one batched inference call and their searches run concurrently;
+    answers are generated with at most CHAT_BATCH_GENERATE_CONCURRENCY LLM calls in flight. Items
+    are stateless (no session history, booking detection or persistence) and fail individually:
+    a failed item carries ``error`` instead of failing the batch.
+    """
+    if len(payload.questions) > settings.chat_batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.chat_batch_max_items} questions per batch"
+        )
+    started = time.perf_counter()
+    payload.namespace = payload.namespace or "__default__"
+    questions = payload.questions
+    results: List[Retrieval | Exception] = [ValueError("empty question")] * len(questions)
+    valid = [i for i, q in enumerate(questions) if q.strip()]
+
+    with stage("retrieve_batch"):
+        retrieved = await aretrieve_many(
+            [questions[i] for i in valid], top_k=payload.top_k, namespace=payload.namespace,
+            mode=payload.mode, vector_weight=payload.vector_weight, lexical_weight=payload.lexical_weight,
+        )
+    for i, r in zip(valid, retrieved):
+        results[i] = r
+    retrieve_ms = (time.perf_counter() - started) * 1000
+
+    ns_version = None
+    if payload.use_cache and semantic_cache is not None:
+        ns_version = await aget_namespace_version(payload.namespace)
+    generate_slots = asyncio.Semaphore(max(1, settings.chat_batch_generate_concurrency))
+    items = await asyncio.gather(*(
+        _answer_batch_item(i, q, r, payload, ns_version, generate_slots)
+        for i, (q, r) in enumerate(zip(questions, results))
+    ), return_exceptions=True)
+    items = [
+        it if isinstance(it, ChatBatchItem) else ChatBatchItem(index=i, question=questions[i], error=_error(it))
+        for i, it in enumerate(items)
+    ]
+    total_ms = (time.perf_counter() - started) * 1000
+    return ChatBatchAnswer(
+        results=items,
+        failed=sum(1 for it in items if it.error is not None),
+        timings_ms={"retrieve": round(retrieve_ms, 2), "total": round(total_ms, 2)},
+    )
+
+
+@router.get("/intent/stats")
+def intent_fast_path_stats() -> dict:
+    return intent_stats.snapshot()
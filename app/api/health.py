@@ -1,9 +1,39 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from app.core.clients import clients
+from app.services.booking_engine import booking_index
+from app.services.chat_sessions import chat_session_resolver
+from app.services.chunk_text import chunk_text_store
+from app.services.embedding_cache import embedding_cache
+from app.services.lexical import lexical_retriever
+from app.services.semantic_cache import semantic_cache
+from app.services.write_behind import chat_messages_buffer
 
 router = APIRouter(tags=["health"])
 
 @router.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
\ No newline at end of file
+async def health(response: Response) -> dict:
+    """Readiness of each dependency (probe results are cached for HEALTH_CACHE_TTL) and usage of
+    each connection pool; 503 while any dependency is unreachable."""
+    report = await clients.readiness()
+    if not report["ready"]:
+        response.status_code = 503
+    return {"status": "ok" if report["ready"] else "degraded", **report, "pools": clients.pool_stats()}
+
+@router.get("/health/live")
+def live() -> dict[str, str]:
+    # liveness only: no dependency checks
+    return {"status": "ok"}
+
+@router.get("/health/caches")
+def cache_stats() -> dict:
+    return {
+        "embedding": embedding_cache.stats() if embedding_cache else None,
+        "semantic": semantic_cache.stats() if semantic_cache else None,
+        "lexical": lexical_retriever.stats(),
+        "chunk_text": chunk_text_store.stats(),
+        "chat_sessions": chat_session_resolver.stats(),
+        "chat_write_behind": chat_messages_buffer.stats() if chat_messages_buffer else None,
+        "booking_index": booking_index.stats(),
+    }
@@ -1,104 +1,111 @@
 from __future__ import annotations
 
-import uuid
-from typing import Literal, List
+from typing import List, Literal
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from sqlmodel import Session
-from loguru import logger
 
 from app.db.session import get_session
-from app.models.db_models import Document, Chunk
-from app.services.parsers import read_pdf, read_txt
-from app.services.chunking import chunk_recursive, chunk_sliding_window
-from app.services.pinecone_service import PineconeService
+from app.models.db_models import IngestionJob
+from app.services.ingestion_jobs import create_bulk_job, create_job
+from app.services.ingestion_pipeline import IngestionError
+from app.services.job_queue import JobQueue, get_job_queue
 
 router = APIRouter(prefix="/ingest", tags=["ingestion"])
 
 ChunkerName = Literal["recursive", "sliding"]
+ChunkUnit = Literal["chars", "tokens"]
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 def upload_document(
     file: UploadFile = File(...),
     chunker: ChunkerName = Query("recursive"),
     chunk_size: int = Query(800, ge=100, le=4000),
     chunk_overlap: int = Query(100, ge=0, le=2000),
+    chunk_unit: ChunkUnit = Query("chars", description="Measure chunk_size/chunk_overlap in characters or tokens"),
     namespace: str | None = Query(None),
     session: Session = Depends(get_session),
+    queue: JobQueue = Depends(get_job_queue),
 ) -> dict:
-    # 1) Parse file
-    content_type = file.content_type or ""
+    # Parsing, chunking, embedding and upserting run in the ingest worker (python -m app.workers.ingest_worker)
     filename = file.filename or "uploaded"
     try:
-        if filename.lower().endswith(".pdf") or "pdf" in content_type:
-            text = read_pdf(file.file)
-        elif filename.lower().endswith(".txt") or "text" in content_type:
-            text = read_txt(file.file)
-        else:
-            raise HTTPException(status_code=400, detail="Only .pdf or .txt supported")
-    except Exception as e:
-        logger.exception("Failed to parse file")
-        raise HTTPException(status_code=400, detail=f"Failed to parse file: {e}")
-
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="No extractable text found")
-
-    # 2) Chunk
-    if chunker == "recursive":
-        chunks = chunk_recursive(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    else:
-        chunks = chunk_sliding_window(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-    if not chunks:
-        raise HTTPException(status_code=400, detail="Chunking produced no chunks")
-
-    # 3) Create Document record
-    doc = Document(
-        filename=filename,
-        filetype="pdf" if filename.lower().endswith(".pdf") else "txt",
-        source="upload",
-        meta={"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap},
-    )
-    session.add(doc)
-    session.commit()
-    session.refresh(doc)
-
-    # 4) Embed and upsert to Pinecone
-    pc = PineconeService()
-    embeddings = pc.embed_texts(chunks, input_type="passage")
-
-    items = []
-    chunk_rows: List[Chunk] = []
-    for idx, (ch_text, emb) in enumerate(zip(chunks, embeddings)):
-        vector_id = str(uuid.uuid4())
-        items.append({
-            "id": vector_id,
-            "values": emb,
-            "metadata": {
-                "document_id": doc.id,
-                "filename": filename,
-                "chunk_index": idx,
-                "text": ch_text,
+        job = create_job(
+            session,
+            queue,
+            file.file,
+            filename,
+            file.content_type or "",
+            {
+                "chunker": chunker,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "chunk_unit": chunk_unit,
+                "namespace": namespace,
             },
-        })
-        chunk_rows.append(Chunk(
-            document_id=doc.id,
-            chunk_index=idx,
-            text=ch_text,
-            # optional: store embedding locally; we can skip to save space
-            embedding=None,
-        ))
+        )
+    except IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    pc.upsert(items, namespace=namespace)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": filename,
+        "namespace": namespace,
+        "message": "Ingestion queued",
+    }
 
-    # 5) Persist chunks
-    session.add_all(chunk_rows)
-    session.commit()
+@router.post("/bulk", status_code=202)
+def upload_bulk(
+    files: List[UploadFile] = File(..., description=".pdf/.txt files and/or .zip/.tar(.gz) archives of them"),
+    chunker: ChunkerName = Query("recursive"),
+    chunk_size: int = Query(800, ge=100, le=4000),
+    chunk_overlap: int = Query(100, ge=0, le=2000),
+    chunk_unit: ChunkUnit = Query("chars", description="Measure chunk_size/chunk_overlap in characters or tokens"),
+    namespace: str | None = Query(None),
+    session: Session = Depends(get_session),
+    queue: JobQueue = Depends(get_job_queue),
+) -> dict:
+    # One job for all files; its result lists every document's outcome and the overall chunks/s
+    try:
+        job = create_bulk_job(
+            session,
+            queue,
+            [(f.file, f.filename or "uploaded", f.content_type or "") for f in files],
+            {
+                "chunker": chunker,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "chunk_unit": chunk_unit,
+                "namespace": namespace,
+            },
+        )
+    except IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
-        "document_id": doc.id,
-        "filename": filename,
-        "chunks": len(chunks),
+        "job_id": job.id,
+        "status": job.status,
+        "files": len(files),
         "namespace": namespace,
-        "message": "Ingestion completed",
-    }
\ No newline at end of file
+        "message": "Bulk ingestion queued",
+    }
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, session: Session = Depends(get_session)) -> dict:
+    job = session.get(IngestionJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "document_id": job.document_id,
+        "result": job.result,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.core.metrics import CONTENT_TYPE, Family, registry
+from app.services.chat_sessions import chat_session_resolver
+from app.services.chunk_text import chunk_text_store
+from app.services.embedding_cache import embedding_cache
+from app.services.intent import stats as intent_stats
+from app.services.lexical import lexical_retriever
+from app.services.semantic_cache import semantic_cache
+from app.services.write_behind import chat_messages_buffer
+
+router = APIRouter(tags=["metrics"])
+
+
+def _cache_families() -> Iterable[Family]:
+    """Hit/miss counters the caches already keep, read at scrape time."""
+    hits, misses = [], []
+    if embedding_cache is not None:
+        s = embedding_cache.stats()
+        for tier in ("lru", "redis"):
+            hits.append(({"cache": f"embedding_{tier}"}, s[tier]["hits"]))
+            misses.append(({"cache": f"embedding_{tier}"}, s[tier]["misses"]))
+    if semantic_cache is not None:
+        s = semantic_cache.stats()
+        hits.append(({"cache": "semantic"}, s["hits"]))
+        misses.append(({"cache": "semantic"}, s["misses"]))
+    s = chunk_text_store.stats()
+    hits += [({"cache": "chunk_text_lru"}, s["lru"]), ({"cache": "chunk_text_redis"}, s["redis"])]
+    misses.append(({"cache": "chunk_text"}, s["db"] + s["missing"]))
+    s = chat_session_resolver.stats()
+    hits += [({"cache": "chat_session_lru"}, s["local"]), ({"cache": "chat_session_redis"}, s["redis"])]
+    misses.append(({"cache": "chat_session"}, s["db"]))
+    yield "rag_cache_hits_total", "counter", "Cache hits by cache and tier", hits
+    yield "rag_cache_misses_total", "counter", "Cache misses by cache and tier", misses
+
+    s = intent_stats.snapshot()
+    yield "rag_intent_decisions_total", "counter", "Booking-intent decisions by path", [
+        ({"path": k}, v) for k, v in s.items() if k not in ("total", "fast_path_hit_rate")
+    ]
+    if chat_messages_buffer is not None:
+        s = chat_messages_buffer.stats()
+        yield "rag_write_behind_rows_total", "counter", "Chat message rows written or dropped by the buffer", [
+            ({"result": "written"}, s["rows_written"]), ({"result": "failed"}, s["rows_failed"]),
+        ]
+        yield "rag_write_behind_queued_units", "gauge", "Turns waiting in the write-behind queue", [
+            ({}, s["queued_units"]),
+        ]
+    yield "rag_lexical_index_chunks", "gauge", "Chunks in the in-memory BM25 index", [
+        ({"namespace": ns}, v["chunks"]) for ns, v in lexical_retriever.stats().items()
+    ]
+
+
+registry.add_collector(_cache_families)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,307 @@
+"""Process-wide service clients: one pooled, keep-alive client per dependency.
+
+Clients are built on first use and shared by every request and worker thread. The FastAPI
+lifespan warms them at startup (``warm_up``) and closes them on shutdown (``aclose``);
+``readiness`` probes each dependency and ``pool_stats`` reports connection-pool saturation,
+both served by ``/health``. The Groq and Pinecone SDKs are imported with their first client, so
+importing the app stays cheap when warm-up is deferred or off.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.db.session import async_engine, engine
+
+if TYPE_CHECKING:
+    import httpx
+    from groq import AsyncGroq, Groq
+    from pinecone import Pinecone
+
+settings = get_settings()
+
+
+def _httpx_limits() -> httpx.Limits:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=settings.groq_max_connections,
+        max_keepalive_connections=settings.groq_max_keepalive,
+        keepalive_expiry=settings.groq_keepalive_expiry,
+    )
+
+
+def _redis_pool_options() -> Dict[str, Any]:
+    return dict(
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_connect_timeout,
+        socket_keepalive=True,
+        health_check_interval=settings.redis_health_check_interval,
+    )
+
+
+def _saturation(in_use: int | None, limit: int | None) -> float | None:
+    return round(in_use / limit, 3) if in_use is not None and limit else None
+
+
+def _redis_pool_stats(pool: Any) -> Dict[str, Any]:
+    limit = getattr(pool, "max_connections", None)
+    if hasattr(pool, "_in_use_connections"):  # asyncio pool
+        in_use = len(pool._in_use_connections)
+        open_ = in_use + len(getattr(pool, "_available_connections", []))
+    elif hasattr(pool, "_connections"):  # sync blocking pool: idle connections wait in ``pool.queue``
+        open_ = len(pool._connections)
+        in_use = open_ - sum(1 for c in list(pool.pool.queue) if c is not None)
+    else:
+        open_ = in_use = None
+    return {"max": limit, "open": open_, "in_use": in_use, "saturation": _saturation(in_use, limit)}
+
+
+def _sqlalchemy_pool_stats(pool: Any) -> Dict[str, Any]:
+    try:
+        limit, checked_out, idle = pool.size() + settings.db_max_overflow, pool.checkedout(), pool.checkedin()
+    except AttributeError:  # pools without a size limit (e.g. SQLite in-memory)
+        return {"pool": type(pool).__name__}
+    return {"max": limit, "open": checked_out + idle, "in_use": checked_out, "saturation": _saturation(checked_out, limit)}
+
+
+def _httpx_pool_stats(client: Any) -> Dict[str, Any]:
+    # httpx exposes no pool stats; read them from httpcore, tolerating layout changes
+    pool = getattr(getattr(getattr(client, "_client", None), "_transport", None), "_pool", None)
+    limit = settings.groq_max_connections
+    if pool is None:
+        return {"max": limit}
+    conns = list(getattr(pool, "_connections", []))
+    in_use = sum(1 for c in conns if not c.is_idle())
+    return {
+        "max": limit,
+        "open": len(conns),
+        "in_use": in_use,
+        "waiting": len(getattr(pool, "_requests", [])) - in_use if hasattr(pool, "_requests") else None,
+        "saturation": _saturation(in_use, limit),
+    }
+
+
+class ClientRegistry:
+    """Lazily built, shared clients for Groq, Pinecone, Redis and the database.
+
+    Groq and Pinecone clients are dropped on ``aclose`` and rebuilt on next use; Redis pools are
+    disconnected and the SQLModel engines disposed, both of which reconnect on demand, so module
+    references to them (``redis_memory.r``) stay valid.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._readiness: Tuple[float, Dict[str, Any]] | None = None
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+    # --- clients ---------------------------------------------------------------------------------
+
+    @staticmethod
+    def _build_groq(asynchronous: bool) -> Groq | AsyncGroq:
+        import groq
+
+        cls, http_client = (
+            (groq.AsyncGroq, groq.DefaultAsyncHttpxClient) if asynchronous else (groq.Groq, groq.DefaultHttpxClient)
+        )
+        return cls(
+            api_key=settings.groq_api_key,
+            timeout=settings.groq_timeout,
+            max_retries=settings.groq_max_retries,
+            http_client=http_client(limits=_httpx_limits(), timeout=settings.groq_timeout),
+        )
+
+    @staticmethod
+    def _build_pinecone() -> Pinecone:
+        import pinecone
+
+        return pinecone.Pinecone(
+            api_key=settings.pinecone_api_key,
+            timeout=settings.pinecone_timeout,
+            connection_pool_maxsize=settings.pinecone_pool_maxsize,
+        )
+
+    @property
+    def groq(self) -> Groq:
+        return self._get("groq", lambda: self._build_groq(False))
+
+    @property
+    def agroq(self) -> AsyncGroq:
+        return self._get("agroq", lambda: self._build_groq(True))
+
+    @property
+    def pinecone(self) -> Pinecone:
+        return self._get("pinecone", self._build_pinecone)
+
+    @property
+    def pinecone_index(self) -> Any:
+        # PINECONE_HOST skips the describe_index lookup the SDK otherwise makes to find the host
+        return self._get("pinecone_index", lambda: self.pinecone.Index(
+            name=settings.pinecone_index_name, host=settings.pinecone_host or ""
+        ))
+
+    @property
+    def redis(self) -> redis.Redis:
+        """Sync client returning ``str``."""
+        return self._get("redis", lambda: redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+            settings.redis_url, decode_responses=True, **_redis_pool_options()
+        )))
+
+    @property
+    def redis_bytes(self) -> redis.Redis:
+        """Sync client returning ``bytes`` (embedding and chunk-text caches)."""
+        return self._get("redis_bytes", lambda: redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+            settings.redis_url, **_redis_pool_options()
+        )))
+
+    @property
+    def aredis(self) -> aioredis.Redis:
+        """asyncio client returning ``str``."""
+        return self._get("aredis", lambda: aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool.from_url(
+            settings.redis_url, decode_responses=True, **_redis_pool_options()
+        )))
+
+    engine = engine
+    async_engine = async_engine
+
+    # --- readiness and pools ---------------------------------------------------------------------
+
+    async def _check_database(self) -> None:
+        async with self.async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check_redis(self) -> None:
+        await self.aredis.ping()
+
+    async def _check_groq(self) -> None:
+        await self.agroq.models.list()
+
+    async def _check_pinecone(self) -> None:
+        def probe() -> None:
+            if settings.pinecone_embedding_model:
+                self.pinecone.inference.get_model(model=settings.pinecone_embedding_model)
+            if settings.vector_store.lower() == "pinecone":
+                self.pinecone_index.describe_index_stats()
+
+        await asyncio.to_thread(probe)
+
+    async def _probe(self, check: Callable[[], Awaitable[None]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), settings.health_check_timeout)
+        except Exception as e:
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+            return {"ready": False, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+        return {"ready": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def readiness(self, max_age: float | None = None) -> Dict[str, Any]:
+        """Probe every dependency concurrently; results younger than ``max_age`` seconds
+        (HEALTH_CACHE_TTL by default) are reused."""
+        max_age = settings.health_cache_ttl if max_age is None else max_age
+        cached = self._readiness
+        if cached is not None and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        if "agroq" not in self._clients:
+            # building a client imports its SDK and loads TLS certificates: keep that off the event loop
+            await asyncio.to_thread(lambda: self.agroq)
+        checks = {
+            "database": self._check_database,
+            "redis": self._check_redis,
+            "groq": self._check_groq,
+            "pinecone": self._check_pinecone,
+        }
+        results = await asyncio.gather(*(self._probe(c) for c in checks.values()))
+        deps = dict(zip(checks, results))
+        report = {"ready": all(r["ready"] for r in results), "dependencies": deps}
+        self._readiness = (time.monotonic(), report)
+        return report
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection-pool usage of the clients built so far."""
+        out: Dict[str, Any] = {
+            "database": _sqlalchemy_pool_stats(self.engine.pool),
+            "database_async": _sqlalchemy_pool_stats(self.async_engine.sync_engine.pool),
+        }
+        for name in ("redis", "redis_bytes", "aredis"):
+            if name in self._clients:
+                out[name] = _redis_pool_stats(self._clients[name].connection_pool)
+        for name in ("groq", "agroq"):
+            if name in self._clients:
+                out[name] = _httpx_pool_stats(self._clients[name])
+        if "pinecone" in self._clients:
+            out["pinecone"] = {"max": settings.pinecone_pool_maxsize}
+        return out
+
+    # --- lifecycle -------------------------------------------------------------------------------
+
+    def _warm_sync(self) -> None:
+        # clients used from worker threads: open one pooled connection each
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        self.redis.ping()
+        self.redis_bytes.ping()
+        self.groq  # noqa: B018 - builds the client and its HTTP pool
+
+    async def warm_up(self) -> Dict[str, Any]:
+        """Build every client and open a first connection to each dependency; failures are logged
+        (and reported by ``/health``) but do not stop startup."""
+        started = time.perf_counter()
+
+        async def warm_sync() -> None:
+            try:
+                await asyncio.to_thread(self._warm_sync)
+            except Exception as e:
+                logger.warning(f"Client warm-up (sync clients) failed: {type(e).__name__}: {e}")
+
+        # sync clients warm in a thread while the async probes run
+        _, report = await asyncio.gather(warm_sync(), self.readiness(max_age=0))
+        for name, r in report["dependencies"].items():
+            if not r["ready"]:
+                logger.warning(f"{name} is not ready after warm-up: {r.get('error')}")
+        logger.info(f"Clients warmed in {(time.perf_counter() - started) * 1000:.0f} ms; ready={report['ready']}")
+        return report
+
+    async def aclose(self) -> None:
+        with self._lock:
+            built, self._clients = self._clients, {}
+            # Redis pools reconnect on demand: keep the same client objects for module references
+            for name in ("redis", "redis_bytes", "aredis"):
+                if name in built:
+                    self._clients[name] = built[name]
+            self._readiness = None
+        for name in ("redis", "redis_bytes"):
+            if name in built:
+                # worker threads may still be mid-command (e.g. a blocking reserve); close idle ones only
+                built[name].connection_pool.disconnect(inuse_connections=False)
+        if "aredis" in built:
+            await built["aredis"].connection_pool.disconnect()
+        if "agroq" in built:
+            await built["agroq"].close()
+        if "groq" in built:
+            built["groq"].close()
+        if "pinecone" in built and hasattr(built["pinecone"], "close"):
+            await asyncio.to_thread(built["pinecone"].close)
+        engine.dispose()
+        await async_engine.dispose()
+
+
+clients = ClientRegistry()
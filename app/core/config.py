@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from datetime import time
 from functools import lru_cache
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -17,15 +18,159 @@ class Settings(BaseSettings):
 
     groq_api_key: str = Field("", alias="GROQ_API_KEY")
     groq_model: str = Field("llama-3.3-70b-versatile", alias="GROQ_MODEL")
+    # Shared keep-alive HTTP pool for Groq (see app.core.clients)
+    groq_max_connections: int = Field(100, alias="GROQ_MAX_CONNECTIONS")
+    groq_max_keepalive: int = Field(20, alias="GROQ_MAX_KEEPALIVE")
+    groq_keepalive_expiry: float = Field(30.0, alias="GROQ_KEEPALIVE_EXPIRY")
+    groq_timeout: float = Field(60.0, alias="GROQ_TIMEOUT")
+    groq_max_retries: int = Field(2, alias="GROQ_MAX_RETRIES")
 
     pinecone_api_key: str = Field("", alias="PINECONE_API_KEY")
     pinecone_index_name: str = Field("", alias="PINECONE_INDEX_NAME")
     pinecone_host: str | None = Field(None, alias="PINECONE_HOST")
     pinecone_embedding_model: str | None = Field(None, alias="PINECONE_EMBEDDING_MODEL")
+    pinecone_embed_concurrency: int = Field(4, alias="PINECONE_EMBED_CONCURRENCY")
+    pinecone_upsert_batch_size: int = Field(100, alias="PINECONE_UPSERT_BATCH_SIZE")
+    pinecone_upsert_concurrency: int = Field(4, alias="PINECONE_UPSERT_CONCURRENCY")
+    pinecone_max_retries: int = Field(5, alias="PINECONE_MAX_RETRIES")
+    pinecone_backoff_base: float = Field(0.5, alias="PINECONE_BACKOFF_BASE")
+    pinecone_backoff_max: float = Field(20.0, alias="PINECONE_BACKOFF_MAX")
+    pinecone_pool_maxsize: int = Field(32, alias="PINECONE_POOL_MAXSIZE")  # HTTP connections per host
+    pinecone_timeout: float = Field(30.0, alias="PINECONE_TIMEOUT")
+
+    # Where vectors live: "pinecone" (hosted index) or "local" (memory-mapped matrices on disk).
+    # Embeddings always come from Pinecone inference.
+    vector_store: str = Field("pinecone", alias="VECTOR_STORE")
+    local_vector_dir: str = Field("./data/vectors", alias="LOCAL_VECTOR_DIR")
+    local_vector_dtype: str = Field("float32", alias="LOCAL_VECTOR_DTYPE")  # float32 | float16
+    # Namespaces with at least this many vectors are searched through an IVF index (0 disables it)
+    local_ivf_min_vectors: int = Field(50_000, alias="LOCAL_IVF_MIN_VECTORS")
+    local_ivf_nprobe: int = Field(8, alias="LOCAL_IVF_NPROBE")
+
+    # Retrieval: vector | lexical (BM25 over Chunk.text) | hybrid (both, fused with reciprocal rank fusion)
+    retrieval_mode: str = Field("vector", alias="RETRIEVAL_MODE")
+    hybrid_vector_weight: float = Field(1.0, alias="HYBRID_VECTOR_WEIGHT")
+    hybrid_lexical_weight: float = Field(1.0, alias="HYBRID_LEXICAL_WEIGHT")
+    hybrid_rrf_k: int = Field(60, alias="HYBRID_RRF_K")
+    hybrid_candidates: int = Field(4, alias="HYBRID_CANDIDATES")  # each path fetches top_k * this
+    lexical_refresh_interval: float = Field(30.0, alias="LEXICAL_REFRESH_INTERVAL")
+
+    # Local booking-intent fast path; the LLM is only consulted for ambiguous messages
+    intent_fastpath_enabled: bool = Field(True, alias="INTENT_FASTPATH_ENABLED")
+    intent_fastpath_threshold: float = Field(0.85, alias="INTENT_FASTPATH_THRESHOLD")
+    intent_model_path: str | None = Field(None, alias="INTENT_MODEL_PATH")
+    # JSONL of ambiguous turns and the LLM's verdict, for train_intent_model. Holds user messages:
+    # emails, phone numbers and introduced names are redacted, but treat the file as personal data
+    intent_training_log: str | None = Field(None, alias="INTENT_TRAINING_LOG")
 
     redis_url: str = Field("redis://localhost:6379/0", alias="REDIS_URL")
+    # Blocking connection pools: callers wait up to REDIS_POOL_TIMEOUT for a free connection.
+    # REDIS_SOCKET_TIMEOUT must exceed the job queue's blocking reserve timeout.
+    redis_max_connections: int = Field(64, alias="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout: float = Field(5.0, alias="REDIS_POOL_TIMEOUT")
+    redis_socket_timeout: float = Field(10.0, alias="REDIS_SOCKET_TIMEOUT")
+    redis_connect_timeout: float = Field(2.0, alias="REDIS_CONNECT_TIMEOUT")
+    redis_health_check_interval: int = Field(30, alias="REDIS_HEALTH_CHECK_INTERVAL")
+
+    # Embedding cache: in-process LRU in front of a shared Redis tier
+    embedding_cache_enabled: bool = Field(True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_size: int = Field(10_000, alias="EMBEDDING_CACHE_SIZE")
+    embedding_cache_redis: bool = Field(True, alias="EMBEDDING_CACHE_REDIS")
+    embedding_cache_ttl: int = Field(7 * 24 * 3600, alias="EMBEDDING_CACHE_TTL")
+
+    # Chunk text is not stored in vector metadata; it is read from the Chunk table through this cache
+    chunk_text_cache_size: int = Field(20_000, alias="CHUNK_TEXT_CACHE_SIZE")
+    chunk_text_cache_redis: bool = Field(True, alias="CHUNK_TEXT_CACHE_REDIS")
+    chunk_text_cache_ttl: int = Field(24 * 3600, alias="CHUNK_TEXT_CACHE_TTL")
+
+    # Interview slots: BOOKING_SLOT_MINUTES-long slots from BOOKING_DAY_START to BOOKING_DAY_END; one
+    # booking per slot. Per-day availability bitmaps and per-email lookups are kept in Redis.
+    booking_slot_minutes: int = Field(30, alias="BOOKING_SLOT_MINUTES")
+    booking_day_start: time = Field(time(9, 0), alias="BOOKING_DAY_START")
+    booking_day_end: time = Field(time(18, 0), alias="BOOKING_DAY_END")
+    booking_index_redis: bool = Field(True, alias="BOOKING_INDEX_REDIS")
+    booking_index_ttl: int = Field(24 * 3600, alias="BOOKING_INDEX_TTL")
+    booking_availability_max_days: int = Field(31, alias="BOOKING_AVAILABILITY_MAX_DAYS")
+    # Chat bookings in progress: partial slots per session in Redis, and the small LLM call that
+    # reads follow-up replies the local parser cannot (model defaults to GROQ_MODEL)
+    booking_draft_ttl: int = Field(1800, alias="BOOKING_DRAFT_TTL")
+    booking_followup_model: str | None = Field(None, alias="BOOKING_FOLLOWUP_MODEL")
+    booking_followup_max_tokens: int = Field(80, alias="BOOKING_FOLLOWUP_MAX_TOKENS")
+
+    # Opt-in semantic cache of RAG answers, invalidated per namespace on ingestion
+    semantic_cache_enabled: bool = Field(False, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(0.95, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_min_chunk_overlap: float = Field(0.6, alias="SEMANTIC_CACHE_MIN_CHUNK_OVERLAP")
+    semantic_cache_max_entries: int = Field(1000, alias="SEMANTIC_CACHE_MAX_ENTRIES")
+    semantic_cache_max_namespaces: int = Field(64, alias="SEMANTIC_CACHE_MAX_NAMESPACES")
+
+    # Background ingestion: uploads are spooled here and processed by app.workers.ingest_worker
+    ingest_spool_dir: str = Field("./data/ingest_spool", alias="INGEST_SPOOL_DIR")
+    ingest_worker_concurrency: int = Field(2, alias="INGEST_WORKER_CONCURRENCY")
+    ingest_max_attempts: int = Field(3, alias="INGEST_MAX_ATTEMPTS")
+    ingest_worker_metrics_port: int | None = Field(None, alias="INGEST_WORKER_METRICS_PORT")
+    # a worker silent for this long is presumed dead; its in-flight jobs are re-queued by the others
+    ingest_worker_heartbeat_ttl: int = Field(30, alias="INGEST_WORKER_HEARTBEAT_TTL")
+    # Bulk jobs (/ingest/bulk): files per job, size cap per archive member, parse processes and
+    # chunks per embed+upsert flush (packed across documents)
+    ingest_bulk_max_files: int = Field(10_000, alias="INGEST_BULK_MAX_FILES")
+    ingest_bulk_max_file_bytes: int = Field(200 * 1024 * 1024, alias="INGEST_BULK_MAX_FILE_BYTES")
+    ingest_bulk_parse_workers: int | None = Field(None, alias="INGEST_BULK_PARSE_WORKERS")  # default: os.cpu_count()
+    ingest_bulk_embed_batch: int = Field(384, alias="INGEST_BULK_EMBED_BATCH")
+
+    # Instrumentation: Prometheus metrics at /metrics; DEBUG_TIMINGS adds a per-request Server-Timing header
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    debug_timings: bool = Field(False, alias="DEBUG_TIMINGS")
+    # Chunk.embedding storage: float16 | int8 | float32 | none (don't keep vectors in Postgres)
+    embedding_storage: str = Field("float16", alias="EMBEDDING_STORAGE")
+    # Local tokenizer for token-sized chunks and prompt budgets: regex | tiktoken:<encoding> | hf:<name-or-path>
+    tokenizer: str = Field("regex", alias="TOKENIZER")
+    # PDFs with at least this many pages are extracted across a process pool
+    pdf_parallel_min_pages: int = Field(50, alias="PDF_PARALLEL_MIN_PAGES")
+    pdf_parse_workers: int | None = Field(None, alias="PDF_PARSE_WORKERS")  # default: os.cpu_count()
+    pdf_pages_per_task: int = Field(25, alias="PDF_PAGES_PER_TASK")
+
+    # Prompt assembly: total input-token budget (counted with TOKENIZER) and the share for history
+    prompt_token_budget: int = Field(3000, alias="PROMPT_TOKEN_BUDGET")
+    prompt_history_token_budget: int = Field(800, alias="PROMPT_HISTORY_TOKEN_BUDGET")
+    prompt_min_chunk_tokens: int = Field(48, alias="PROMPT_MIN_CHUNK_TOKENS")
+    # Older turns are folded into a rolling Redis summary every N turns (0 disables), keeping the last K raw
+    history_summary_every: int = Field(4, alias="HISTORY_SUMMARY_EVERY")
+    history_keep_turns: int = Field(3, alias="HISTORY_KEEP_TURNS")
+
+    # session_id -> chatsession.id cache (in-process LRU in front of Redis)
+    chat_session_cache_size: int = Field(100_000, alias="CHAT_SESSION_CACHE_SIZE")
+    chat_session_cache_ttl: int = Field(30 * 24 * 3600, alias="CHAT_SESSION_CACHE_TTL")
+
+    # Chat messages are written to Postgres by a background write-behind buffer
+    chat_write_behind_enabled: bool = Field(True, alias="CHAT_WRITE_BEHIND_ENABLED")
+    chat_write_behind_max_queue: int = Field(10_000, alias="CHAT_WRITE_BEHIND_MAX_QUEUE")  # turns
+    chat_write_behind_batch_size: int = Field(500, alias="CHAT_WRITE_BEHIND_BATCH_SIZE")  # rows per INSERT
+    chat_write_behind_flush_interval: float = Field(0.05, alias="CHAT_WRITE_BEHIND_FLUSH_INTERVAL")
+
+    # /chat/batch: questions per request, and concurrent vector/lexical searches and LLM calls per batch
+    chat_batch_max_items: int = Field(256, alias="CHAT_BATCH_MAX_ITEMS")
+    chat_batch_retrieval_concurrency: int = Field(16, alias="CHAT_BATCH_RETRIEVAL_CONCURRENCY")
+    chat_batch_generate_concurrency: int = Field(8, alias="CHAT_BATCH_GENERATE_CONCURRENCY")
 
     database_url: str = Field("sqlite:///./app.db", alias="DATABASE_URL")
+    # Optional override; derived from DATABASE_URL (psycopg2 -> asyncpg, sqlite -> aiosqlite) when unset
+    async_database_url: str | None = Field(None, alias="ASYNC_DATABASE_URL")
+    # Per engine (sync and async each have their own pool)
+    db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(10.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, alias="DB_POOL_RECYCLE")
+
+    # Startup warm-up of every client, and /health dependency probes (results cached for HEALTH_CACHE_TTL)
+    client_warmup: bool = Field(True, alias="CLIENT_WARMUP")
+    # Run warm-up as a background task so the server accepts requests immediately (fast cold start);
+    # /health reports not-ready until the dependencies answer
+    client_warmup_background: bool = Field(False, alias="CLIENT_WARMUP_BACKGROUND")
+    # Heavy modules imported lazily on the request path, loaded during warm-up instead (comma-separated)
+    startup_preload_modules: str = Field("pypdf,langchain_text_splitters", alias="STARTUP_PRELOAD_MODULES")
+    health_check_timeout: float = Field(2.0, alias="HEALTH_CHECK_TIMEOUT")
+    health_cache_ttl: float = Field(10.0, alias="HEALTH_CACHE_TTL")
 
     class Config:
         env_file = ".env"
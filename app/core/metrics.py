@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from loguru import logger
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 1 ms .. 60 s; covers cache lookups through LLM generation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (labels, value) pairs produced by a collector for one metric family
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, Iterable[Sample]]  # name, type, help, samples
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(c.value)}" for k, c in list(self._children.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label set."""
+        out = {}
+        for k, c in list(self._children.items()):
+            with c._lock:
+                out[k] = (sum(c.counts), c.sum)
+        return out
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for k, c in list(self._children.items()):
+            with c._lock:
+                counts, total = list(c.counts), c.sum
+            running = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                running += n
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, k)} {running}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by this process plus collectors that report existing stats at scrape time.
+
+    Collectors cost nothing on the request path: caches keep their own counters and are read only
+    when ``/metrics`` is scraped. A failing collector is logged and skipped.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in list(self._metrics.values()):
+            lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} {m.kind}", *m.render()]
+        for collector in list(self._collectors):
+            try:
+                families = list(collector())
+            except Exception:
+                logger.exception("metrics collector failed")
+                continue
+            for name, kind, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_duration_seconds", "Latency of one pipeline stage", ("pipeline", "stage")
+)
+STAGE_ERRORS = registry.counter("rag_stage_errors_total", "Pipeline stages that raised", ("pipeline", "stage"))
+BATCH_SECONDS = registry.histogram(
+    "rag_batch_duration_seconds", "Latency of one embedding/upsert batch against the provider", ("op",)
+)
+BATCH_ITEMS = registry.counter("rag_batch_items_total", "Items sent in embedding/upsert batches", ("op",))
+LLM_TOKENS = registry.counter("rag_llm_tokens_total", "LLM tokens reported by the provider", ("model", "kind"))
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts", ("method", "route", "status")
+)
+
+# Observers receive (pipeline, stage, seconds, failed) for every stage; use them to forward timings
+# to another backend (StatsD, OpenTelemetry, ...) without touching the call sites.
+_observers: List[Callable[[str, str, float, bool], None]] = []
+
+# stage -> accumulated milliseconds for the current request; None outside a timed request.
+# to_thread() and create_task() copy the context, so work they run adds to the same dict.
+_request_timings: ContextVar[Dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def add_observer(fn: Callable[[str, str, float, bool], None]) -> None:
+    _observers.append(fn)
+
+
+def observe(stage: str, seconds: float, pipeline: str = "chat", failed: bool = False) -> None:
+    """Record a stage duration measured by the caller."""
+    if settings.metrics_enabled:
+        STAGE_SECONDS.labels(pipeline, stage).observe(seconds)
+        if failed:
+            STAGE_ERRORS.labels(pipeline, stage).inc()
+        for fn in _observers:
+            try:
+                fn(pipeline, stage, seconds, failed)
+            except Exception:
+                logger.exception("metrics observer failed")
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+
+@contextmanager
+def stage(name: str, pipeline: str = "chat") -> Iterator[None]:
+    """Time a block (sync or around awaits) as one stage; exceptions are counted and re-raised."""
+    t0 = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        observe(name, time.perf_counter() - t0, pipeline, failed)
+
+
+def timed(name: str, pipeline: str = "chat") -> Callable:
+    """Decorator form of :func:`stage` for plain and ``async`` functions."""
+
+    def wrap(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with stage(name, pipeline):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name, pipeline):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return wrap
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Count prompt/completion tokens from a Groq/OpenAI ``usage`` object or dict."""
+    if usage is None or not settings.metrics_enabled:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = get(kind)
+        if n:
+            LLM_TOKENS.labels(model, kind.split("_")[0]).inc(n)
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware: HTTP latency histogram, plus (with ``expose``) a ``Server-Timing`` header
+    listing the stages that ran before the response started, e.g. ``intent;dur=212.4``.
+
+    Streaming responses send headers first, so only the pre-stream stages appear for them.
+    """
+
+    def __init__(self, app: Any, expose: bool = False) -> None:
+        self.app = app
+        self.expose = expose
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - t0
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                if settings.metrics_enabled:
+                    HTTP_SECONDS.labels(scope["method"], route, message["status"]).observe(elapsed)
+                if self.expose:
+                    parts = [f"{k};dur={v:.1f}" for k, v in timings.items()]
+                    parts.append(f"total;dur={elapsed * 1000:.1f}")
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"server-timing", ", ".join(parts).encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose ``registry`` on ``http://host:port/metrics`` from a daemon thread (for non-API processes)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from sqlmodel import SQLModel
 from app.db.session import engine
-from app.models.db_models import Document, Chunk, ChatSession, ChatMessage, InterviewBooking  # noqa: F401
+from app.models.db_models import Document, Chunk, ChatSession, ChatMessage, InterviewBooking, IngestionJob  # noqa: F401
 
 
 def init_db() -> None:
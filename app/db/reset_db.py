@@ -2,7 +2,7 @@
 from sqlmodel import SQLModel
 from app.db.session import engine
 # IMPORTANT: importing models registers the tables with SQLModel.metadata
-from app.models.db_models import Document, Chunk, ChatSession, ChatMessage, InterviewBooking  # noqa: F401
+from app.models.db_models import Document, Chunk, ChatSession, ChatMessage, InterviewBooking, IngestionJob  # noqa: F401
 
 def reset_db() -> None:
     SQLModel.metadata.drop_all(engine)   # 🔥 drops all tables known to this metadata
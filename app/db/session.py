@@ -1,27 +1,50 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import get_settings
 
 settings = get_settings()
 
-# For Postgres; tweak pool sizes as needed
-engine = create_engine(
-    settings.database_url,
-    echo=False,
+# Pool limits are shared by both engines (DB_POOL_*); see app.core.clients for warm-up and pool stats
+_pool_options = dict(
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    future=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+)
+
+engine = create_engine(settings.database_url, echo=False, future=True, **_pool_options)
+
+
+def _async_database_url(url: str) -> str:
+    # Map the sync driver in DATABASE_URL to its asyncio counterpart
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+async_engine = create_async_engine(
+    settings.async_database_url or _async_database_url(settings.database_url), echo=False, **_pool_options
 )
 
 def get_session() -> Iterator[Session]:
     with Session(engine) as session:
         yield session
 
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
 @contextmanager
 def session_scope() -> Iterator[Session]:
     session = Session(engine)
@@ -32,4 +55,4 @@ def session_scope() -> Iterator[Session]:
         session.rollback()
         raise
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
@@ -1,17 +1,70 @@
 from __future__ import annotations
 
+import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from loguru import logger
+from app.core.clients import clients
 from app.core.config import get_settings
+from app.core.metrics import RequestTimingMiddleware
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
 from app.api.ingestion import router as ingestion_router
 from app.api.chat import router as chat_router
 from app.api.booking import router as booking_router
+from app.services.write_behind import chat_messages_buffer
+
+
+def _preload_modules(names: str) -> None:
+    # modules the request path imports on first use (PDF parsing, text splitting); loading them here
+    # keeps that cost off the first upload without putting it back on `import app.main`
+    for name in filter(None, (n.strip() for n in names.split(","))):
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+
+
+async def _warm_up() -> None:
+    started = time.perf_counter()
+    await asyncio.gather(
+        clients.warm_up(), asyncio.to_thread(_preload_modules, get_settings().startup_preload_modules)
+    )
+    logger.info(f"Startup warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = get_settings()
+    warmup: asyncio.Task | None = None
+    if settings.client_warmup:
+        warmup = asyncio.create_task(_warm_up())
+        if not settings.client_warmup_background:
+            await warmup
+    if chat_messages_buffer is not None:
+        chat_messages_buffer.start()
+    try:
+        yield
+    finally:
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmup
+        # flush buffered chat messages before the process exits, then close the shared clients
+        if chat_messages_buffer is not None:
+            await chat_messages_buffer.stop()
+        await clients.aclose()
 
 
 def create_app() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(title=settings.app_name)
-    app = FastAPI(title=settings.app_name)
+    app = FastAPI(title=settings.app_name, lifespan=lifespan)
+    app.add_middleware(RequestTimingMiddleware, expose=settings.debug_timings)
+    app.include_router(metrics_router)  # unprefixed: Prometheus scrapes /metrics
     app.include_router(health_router, prefix=settings.api_prefix)
     app.include_router(ingestion_router, prefix=settings.api_prefix)
     app.include_router(chat_router, prefix=settings.api_prefix)
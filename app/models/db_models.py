@@ -1,6 +1,7 @@
 from datetime import datetime, date as date_type, time as time_type
 from typing import Optional, Any
 
+from sqlalchemy import LargeBinary, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import SQLModel, Field, Relationship
 
@@ -11,7 +12,14 @@ class Chunk(SQLModel, table=True):
     document_id: int = Field(foreign_key="document.id", index=True)
     chunk_index: int = Field(index=True)
     text: str
-    embedding: Optional[list[float]] = Field(default=None, sa_type=JSONB)
+    content_hash: Optional[str] = Field(default=None, index=True)  # sha256 of text
+    vector_id: Optional[str] = Field(default=None, index=True)
+    page_start: Optional[int] = Field(default=None)
+    page_end: Optional[int] = Field(default=None)
+    start_char: Optional[int] = Field(default=None)  # offsets into the document text
+    end_char: Optional[int] = Field(default=None)
+    # packed by app.services.vector_codec (float16 by default; see EMBEDDING_STORAGE)
+    embedding: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # forward ref is fine here
@@ -24,6 +32,8 @@ class Document(SQLModel, table=True):
     filetype: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     source: Optional[str] = Field(default=None)
+    namespace: Optional[str] = Field(default=None, index=True)
+    content_hash: Optional[str] = Field(default=None, index=True)  # sha256 of the uploaded bytes
     meta: Optional[dict[str, Any]] = Field(default=None, sa_type=JSONB)
 
     # now that Chunk is defined above, we can use list[Chunk] (NOT quoted)
@@ -55,15 +65,37 @@ class ChatMessage(SQLModel, table=True):
     session_id: int = Field(foreign_key="chatsession.id", index=True)
     sender: str
     message: str
+    prompt_tokens: Optional[int] = Field(default=None)  # assistant rows: locally counted prompt size
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
     session: Optional["ChatSession"] = Relationship(back_populates="messages")
 
 
 class InterviewBooking(SQLModel, table=True):
+    # one booking per slot: concurrent reservations of the same slot fail here (see booking_engine)
+    __table_args__ = (UniqueConstraint("date", "time", name="uq_interviewbooking_slot"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     email: str = Field(index=True)
     date: date_type
     time: time_type
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IngestionJob(SQLModel, table=True):
+    id: str = Field(primary_key=True)  # uuid4 hex, handed to clients for polling
+    status: str = Field(default="queued", index=True)  # queued | running | retrying | succeeded | failed
+    stage: Optional[str] = Field(default=None)
+    progress: Optional[dict[str, Any]] = Field(default=None, sa_type=JSONB)
+    filename: str
+    content_type: Optional[str] = Field(default=None)
+    file_path: str
+    params: Optional[dict[str, Any]] = Field(default=None, sa_type=JSONB)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    error: Optional[str] = Field(default=None)
+    result: Optional[dict[str, Any]] = Field(default=None, sa_type=JSONB)
+    document_id: Optional[int] = Field(default=None, foreign_key="document.id")
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import date, time
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, Field, EmailStr
 
 class ChatQuery(BaseModel):
@@ -8,11 +8,42 @@ class ChatQuery(BaseModel):
     question: str = Field(..., min_length=1)
     top_k: int = Field(5, ge=1, le=20)
     namespace: str = Field("__default__")
+    # retrieval overrides; unset fields fall back to RETRIEVAL_MODE / HYBRID_*_WEIGHT
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    vector_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
 
 class ChatAnswer(BaseModel):
     session_id: str
     answer: str
     sources: List[Dict[str, Any]]
+    retrieval: Optional[Dict[str, Any]] = None  # mode and per-path latency (ms)
+    prompt: Optional[Dict[str, Any]] = None  # token accounting of the generated prompt
+
+class ChatBatchQuery(BaseModel):
+    # independent, stateless questions: no session history, booking detection or persistence
+    questions: List[str] = Field(..., min_length=1)
+    top_k: int = Field(5, ge=1, le=20)
+    namespace: str = Field("__default__")
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    vector_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
+    use_cache: bool = True  # look up and populate the semantic answer cache
+
+class ChatBatchItem(BaseModel):
+    index: int  # position in the request
+    question: str
+    answer: Optional[str] = None  # None when the item failed; see ``error``
+    sources: List[Dict[str, Any]] = Field(default_factory=list)
+    cached: bool = False  # answered from the semantic cache
+    error: Optional[str] = None
+    retrieval: Optional[Dict[str, Any]] = None
+    prompt: Optional[Dict[str, Any]] = None
+
+class ChatBatchAnswer(BaseModel):
+    results: List[ChatBatchItem]  # same order as the request's questions
+    failed: int
+    timings_ms: Dict[str, float]
 
 class BookingCreate(BaseModel):
     name: str = Field(..., min_length=2)
@@ -25,4 +56,10 @@ class BookingResponse(BaseModel):
     name: str
     email: EmailStr
     date: date
-    time: time
\ No newline at end of file
+    time: time
+
+class BookingAvailability(BaseModel):
+    date: date
+    slot_minutes: int
+    available: List[time]  # slot start times
+    booked: List[time]
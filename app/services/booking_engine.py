@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import threading
+from typing import Any, Dict, List, Sequence, Set
+
+import redis
+from loguru import logger
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.clients import clients
+from app.core.config import get_settings
+from app.core.metrics import registry
+from app.db.session import engine
+from app.models.db_models import InterviewBooking
+from app.models.schemas import BookingCreate
+
+settings = get_settings()
+
+CONFLICTS = registry.counter(
+    "rag_booking_conflicts_total", "Reservations rejected because the slot was taken", ("source",)
+)
+
+# bit 0 of a day bitmap marks it as loaded from the database, so a day without bookings is
+# told apart from one that is not cached; slot i is bit i + 1
+_LOADED_BIT = 0
+_LOADED_FIELD = "_"  # same marker for the per-email hashes
+
+
+def _day_key(day: dt.date) -> str:
+    return f"booking:slots:{day.isoformat()}"
+
+
+def _email_key(email: str) -> str:
+    return f"booking:email:{email}"
+
+
+def booking_dict(booking: InterviewBooking) -> Dict[str, Any]:
+    return {"id": booking.id, "name": booking.name, "email": booking.email,
+            "date": str(booking.date), "time": str(booking.time)}
+
+
+class InvalidSlot(ValueError):
+    """The requested time is not the start of a bookable slot."""
+
+
+class SlotUnavailable(Exception):
+    def __init__(self, day: dt.date, at: dt.time) -> None:
+        super().__init__(f"{day} {at} is already booked")
+        self.day = day
+        self.time = at
+
+
+class BookingIndex:
+    """Which interview slots are taken, per day, and the bookings of each email address.
+
+    The ``InterviewBooking`` unique (date, time) constraint is the source of truth; Redis holds a
+    bitmap per day (one bit per slot) and a hash per email, both filled from the database on a
+    miss and updated on every reservation, so availability and by-email lookups cost one Redis
+    round-trip regardless of table size. ``claim`` sets a slot's bit atomically (SETBIT returns the
+    old bit), which turns concurrent reservations of one slot into a single database insert; the
+    unique constraint still catches anything the bitmap misses (expired keys, Redis outages).
+
+    Entries expire after ``ttl_seconds``, which also bounds how long a bit claimed by a process
+    that died before committing keeps the slot looking taken. Without Redis, or when it errors,
+    lookups read the database.
+    """
+
+    def __init__(
+        self,
+        redis_client: "redis.Redis | None",
+        ttl_seconds: int,
+        day_start: dt.time,
+        day_end: dt.time,
+        slot_minutes: int,
+        db_engine: Engine = engine,
+    ) -> None:
+        if slot_minutes <= 0:
+            raise ValueError("BOOKING_SLOT_MINUTES must be positive")
+        self.redis = redis_client
+        self.ttl = ttl_seconds
+        self.slot_minutes = slot_minutes
+        self._start = day_start.hour * 60 + day_start.minute
+        self.n_slots = max(0, (day_end.hour * 60 + day_end.minute - self._start) // slot_minutes)
+        self.engine = db_engine
+        self._lock = threading.Lock()
+        self.hits = {"redis": 0, "db": 0, "claims": 0, "conflicts": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.hits[key] += n
+
+    # --- slot grid -------------------------------------------------------------------------------
+
+    def slot_of(self, at: dt.time) -> int:
+        minutes, rem = divmod(at.hour * 60 + at.minute - self._start, self.slot_minutes)
+        if rem or at.second or at.microsecond or not 0 <= minutes < self.n_slots:
+            raise InvalidSlot(
+                f"{at} is not a bookable slot: slots are {self.slot_minutes} minutes from "
+                f"{self.time_of(0)} to {self.time_of(self.n_slots)}"
+            )
+        return minutes
+
+    def time_of(self, slot: int) -> dt.time:
+        minutes = self._start + slot * self.slot_minutes
+        return dt.time(minutes // 60 % 24, minutes % 60)
+
+    # --- database --------------------------------------------------------------------------------
+
+    def _load_days(self, days: Sequence[dt.date]) -> Dict[dt.date, Set[int]]:
+        self._count("db", len(days))
+        out: Dict[dt.date, Set[int]] = {d: set() for d in days}
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(InterviewBooking.date, InterviewBooking.time).where(InterviewBooking.date.in_(list(days)))
+            )
+            for day, at in rows:
+                try:
+                    out[day].add(self.slot_of(at))
+                except InvalidSlot:
+                    continue  # booked before the current slot grid; it cannot collide with a slot
+        return out
+
+    def _load_email(self, email: str) -> List[Dict[str, Any]]:
+        self._count("db")
+        with Session(self.engine) as session:
+            rows = session.exec(select(InterviewBooking).where(InterviewBooking.email == email))
+            return [booking_dict(b) for b in rows]
+
+    # --- availability ----------------------------------------------------------------------------
+
+    def _decode(self, raw: bytes | None) -> Set[int] | None:
+        if not raw:
+            return None
+        bits = int.from_bytes(raw, "big")
+        width = len(raw) * 8
+        if not (bits >> (width - 1 - _LOADED_BIT)) & 1:
+            return None  # only claimed bits: the day was never loaded, or expired before a claim
+        return {i - 1 for i in range(1, min(width, self.n_slots + 1)) if (bits >> (width - 1 - i)) & 1}
+
+    def booked(self, days: Sequence[dt.date]) -> Dict[dt.date, Set[int]]:
+        """Taken slot indexes for each day."""
+        if self.redis is None:
+            return self._load_days(days)
+        try:
+            raws = self.redis.mget([_day_key(d) for d in days])
+        except redis.RedisError:
+            logger.exception("Booking index: Redis read failed")
+            return self._load_days(days)
+        out: Dict[dt.date, Set[int]] = {}
+        for day, raw in zip(days, raws):
+            slots = self._decode(raw)
+            if slots is not None:
+                out[day] = slots
+        self._count("redis", len(out))
+        missing = [d for d in days if d not in out]
+        if missing:
+            loaded = self._load_days(missing)
+            try:
+                # only ever sets bits, so claims made meanwhile survive the rebuild
+                pipe = self.redis.pipeline(transaction=True)
+                for day, slots in loaded.items():
+                    key = _day_key(day)
+                    pipe.setbit(key, _LOADED_BIT, 1)
+                    for slot in slots:
+                        pipe.setbit(key, slot + 1, 1)
+                    pipe.expire(key, self.ttl)
+                pipe.execute()
+            except redis.RedisError:
+                logger.exception("Booking index: Redis write failed")
+            out.update(loaded)
+        return out
+
+    def availability(self, days: Sequence[dt.date]) -> Dict[dt.date, Dict[str, List[dt.time]]]:
+        taken = self.booked(days)
+        return {
+            day: {
+                "available": [self.time_of(i) for i in range(self.n_slots) if i not in taken[day]],
+                "booked": [self.time_of(i) for i in sorted(taken[day])],
+            }
+            for day in days
+        }
+
+    def claim(self, day: dt.date, slot: int) -> bool:
+        """Mark ``slot`` taken; False if it already was. Only one of several concurrent claims of
+        the same slot succeeds. Without Redis every claim succeeds and the database decides."""
+        if slot in self.booked([day])[day]:
+            self._count("conflicts")
+            return False
+        if self.redis is None:
+            return True
+        try:
+            won = self.redis.setbit(_day_key(day), slot + 1, 1) == 0
+        except redis.RedisError:
+            logger.exception("Booking index: Redis claim failed")
+            return True
+        self._count("claims" if won else "conflicts")
+        return won
+
+    def release(self, day: dt.date, slot: int) -> None:
+        """Undo a ``claim`` whose booking was not committed."""
+        if self.redis is None:
+            return
+        try:
+            self.redis.setbit(_day_key(day), slot + 1, 0)
+        except redis.RedisError:
+            logger.exception("Booking index: Redis release failed")
+
+    # --- bookings by email -----------------------------------------------------------------------
+
+    def record(self, booking: InterviewBooking) -> None:
+        """Add a committed booking to its email's entry."""
+        if self.redis is None:
+            return
+        try:
+            # without the loaded marker the next lookup rebuilds the entry from the database
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(_email_key(booking.email), str(booking.id), json.dumps(booking_dict(booking)))
+            pipe.expire(_email_key(booking.email), self.ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception("Booking index: Redis write failed")
+
+    def by_email(self, email: str) -> List[Dict[str, Any]]:
+        """Bookings made with ``email``, oldest first."""
+        if self.redis is None:
+            return self._load_email(email)
+        key = _email_key(email)
+        try:
+            entry = self.redis.hgetall(key)
+        except redis.RedisError:
+            logger.exception("Booking index: Redis read failed")
+            return self._load_email(email)
+        entry = {k.decode() if isinstance(k, bytes) else k: v for k, v in entry.items()}
+        if _LOADED_FIELD in entry:
+            self._count("redis")
+            rows = [json.loads(v) for k, v in entry.items() if k != _LOADED_FIELD]
+            return sorted(rows, key=lambda b: b["id"])
+        rows = self._load_email(email)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(key, mapping={_LOADED_FIELD: "", **{str(b["id"]): json.dumps(b) for b in rows}})
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception("Booking index: Redis write failed")
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"slots_per_day": self.n_slots, "slot_minutes": self.slot_minutes,
+                    "backend": "redis" if self.redis is not None else "database", **self.hits}
+
+
+def _build_index() -> BookingIndex:
+    client = clients.redis_bytes if settings.booking_index_redis else None
+    return BookingIndex(
+        client,
+        settings.booking_index_ttl,
+        settings.booking_day_start,
+        settings.booking_day_end,
+        settings.booking_slot_minutes,
+    )
+
+
+booking_index = _build_index()
+
+
+def _new_booking(payload: BookingCreate) -> InterviewBooking:
+    return InterviewBooking(name=payload.name, email=payload.email, date=payload.date, time=payload.time)
+
+
+def reserve(session: Session, payload: BookingCreate) -> InterviewBooking:
+    """Book ``payload``'s slot. Raises ``InvalidSlot`` for a time off the slot grid and
+    ``SlotUnavailable`` when the slot is taken, including by a concurrent reservation."""
+    slot = booking_index.slot_of(payload.time)
+    if not booking_index.claim(payload.date, slot):
+        CONFLICTS.labels("index").inc()
+        raise SlotUnavailable(payload.date, payload.time)
+    booking = _new_booking(payload)
+    session.add(booking)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        CONFLICTS.labels("database").inc()
+        raise SlotUnavailable(payload.date, payload.time) from None
+    except Exception:
+        session.rollback()
+        booking_index.release(payload.date, slot)
+        raise
+    session.refresh(booking)
+    booking_index.record(booking)
+    return booking
+
+
+async def areserve(session: AsyncSession, payload: BookingCreate) -> InterviewBooking:
+    """``reserve`` for the async chat pipeline; index calls run in a worker thread."""
+    slot = booking_index.slot_of(payload.time)
+    if not await asyncio.to_thread(booking_index.claim, payload.date, slot):
+        CONFLICTS.labels("index").inc()
+        raise SlotUnavailable(payload.date, payload.time)
+    booking = _new_booking(payload)
+    session.add(booking)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        CONFLICTS.labels("database").inc()
+        raise SlotUnavailable(payload.date, payload.time) from None
+    except Exception:
+        await session.rollback()
+        await asyncio.to_thread(booking_index.release, payload.date, slot)
+        raise
+    await session.refresh(booking)
+    await asyncio.to_thread(booking_index.record, booking)
+    return booking
+
+
+def free_times(day: dt.date, limit: int | None = None) -> List[dt.time]:
+    free = booking_index.availability([day])[day]["available"]
+    return free[:limit] if limit is not None else free
+
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from loguru import logger
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import stage
+from app.models.schemas import BookingCreate
+from app.services.booking_engine import InvalidSlot, SlotUnavailable, areserve, booking_index, free_times
+from app.services.booking_llm import aextract_booking_followup
+from app.services.intent import SLOTS, extract_slots, unmatched_words
+from app.services.redis_memory import aclear_booking_draft, acommit_booking, aset_booking_draft
+
+_JSON_RE = re.compile(r"\{.*\}", re.S)
+_CANCEL_RE = re.compile(
+    r"\b(cancel|never\s*mind|forget (?:about )?it|no longer (?:want|need)|don'?t want to book)\b", re.I
+)
+# a reply that is only a name ("Jane Doe"), accepted when the last turn asked for the name
+_BARE_NAME_RE = re.compile(r"^\s*([A-Za-z][A-Za-z'-]+(?:\s+[A-Za-z][A-Za-z'-]+){0,3})\s*[.!]?\s*$")
+_NOT_NAMES = {"yes", "no", "ok", "okay", "sure", "thanks", "thank you", "hi", "hello", "fine"}
+# words a reply that only gives booking details may contain ("my email is ...", "friday at 3pm works")
+_FILLER = {
+    "my", "email", "e-mail", "mail", "address", "name", "full", "is", "it", "it's", "its", "i'm", "i",
+    "me", "at", "on", "for", "the", "a", "an", "and", "or", "please", "ok", "okay", "yes", "sure",
+    "works", "work", "fine", "good", "great", "perfect", "then", "instead", "let's", "lets", "say",
+    "how", "about", "use", "time", "date", "day", "would", "be", "can", "do", "that", "with", "next", "this",
+}
+_EMAIL = TypeAdapter(EmailStr)
+
+CANCELLED = "Okay, I've cancelled the booking request. Let me know if you'd like to book another time."
+
+
+def _parse_slots(text: str) -> Dict[str, str]:
+    """Slots from the JSON object in an LLM reply (``BOOKING_READY: {...}``, ``BOOKING_PARTIAL: {...}``
+    or a bare object); blank and unknown fields are dropped."""
+    m = _JSON_RE.search(text or "")
+    if not m:
+        return {}
+    try:
+        data = json.loads(m.group(0))
+    except ValueError:
+        logger.debug(f"Unparseable booking slots: {text!r}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {k: str(v).strip() for k, v in data.items() if k in SLOTS and v not in (None, "") and str(v).strip()}
+
+
+def is_booking(verdict: str) -> bool:
+    """Whether the booking classifier's reply opens a booking: an explicit ``BOOKING_READY`` or
+    ``BOOKING_PARTIAL``, or a JSON object carrying slots. Anything else, including stray quotes or
+    unexpected wording, counts as ``NO_BOOKING``."""
+    head = (verdict or "").strip().lstrip("\"'`*").upper()
+    return head.startswith(("BOOKING_READY", "BOOKING_PARTIAL")) or bool(_parse_slots(verdict))
+
+
+def _slot_only(message: str) -> bool:
+    """Whether ``message`` only gives booking details, so the regex slots can be trusted. A
+    question or sentence that merely mentions a date, time or email ("Is the office open at 9am?")
+    is not: the follow-up LLM decides whether it belongs to the booking.
+
+    >>> _slot_only("my email is jane@example.com"), _slot_only("Friday at 3pm works")
+    (True, True)
+    >>> _slot_only("What does the policy say about leave on Friday?"), _slot_only("Is the office open at 9am")
+    (False, False)
+    >>> _slot_only("Who is john@x.com in the docs?")
+    False
+    """
+    if message.rstrip().endswith("?"):
+        return False
+    return all(w.lower() in _FILLER for w in unmatched_words(message))
+
+
+def _validate(found: Dict[str, str], today: dt.date) -> Tuple[Dict[str, str], List[str]]:
+    """Normalized slots that are valid, and a note for each rejected one (rejected slots are asked again)."""
+    valid: Dict[str, str] = {}
+    problems: List[str] = []
+    if "name" in found:
+        if len(found["name"]) >= 2:
+            valid["name"] = found["name"]
+        else:
+            problems.append("I didn't catch your name")
+    if "email" in found:
+        try:
+            valid["email"] = str(_EMAIL.validate_python(found["email"]))
+        except ValidationError:
+            problems.append(f"{found['email']} doesn't look like a valid email address")
+    if "date" in found:
+        try:
+            day = dt.date.fromisoformat(found["date"])
+        except ValueError:
+            problems.append(f"I couldn't read the date {found['date']!r}")
+        else:
+            if day < today:
+                problems.append(f"{day} is in the past")
+            else:
+                valid["date"] = day.isoformat()
+    if "time" in found:
+        try:
+            at = dt.time.fromisoformat(found["time"])
+            booking_index.slot_of(at)
+            valid["time"] = at.strftime("%H:%M:%S")
+        except ValueError as e:  # InvalidSlot is a ValueError
+            problems.append(str(e) if isinstance(e, InvalidSlot) else f"I couldn't read the time {found['time']!r}")
+    return valid, problems
+
+
+async def _ask(slots: Dict[str, str], missing: List[str], problems: List[str]) -> str:
+    labels = {
+        "name": "your full name",
+        "email": "your email address",
+        "date": "the date (YYYY-MM-DD)",
+        "time": f"the time (HH:MM, on the {booking_index.slot_minutes}-minute grid from "
+                f"{booking_index.time_of(0):%H:%M} to {booking_index.time_of(booking_index.n_slots):%H:%M})",
+    }
+    parts = [p[0].upper() + p[1:] + "." for p in problems]
+    asks = [labels[k] for k in missing]
+    parts.append(
+        "To book your interview I still need "
+        + (asks[0] if len(asks) == 1 else ", ".join(asks[:-1]) + " and " + asks[-1]) + "."
+    )
+    if "time" in missing and "date" in slots:
+        free = await asyncio.to_thread(free_times, dt.date.fromisoformat(slots["date"]), 6)
+        parts.append(
+            f"Free times on {slots['date']}: {', '.join(f'{t:%H:%M}' for t in free)}." if free
+            else f"{slots['date']} is fully booked; please pick another date."
+        )
+    return " ".join(parts)
+
+
+async def _advance(
+    session: AsyncSession, session_id: str, slots: Dict[str, str], found: Dict[str, str]
+) -> str:
+    """Merge ``found`` into the draft; book as soon as every slot is valid, otherwise save the
+    draft and ask for what is still missing."""
+    valid, problems = _validate(found, dt.date.today())
+    slots = {**slots, **valid}
+    missing = [k for k in SLOTS if k not in slots]
+    if not missing:
+        try:
+            with stage("booking"):
+                booking = await areserve(session, BookingCreate(**slots))
+        except SlotUnavailable as e:
+            problems.append(f"{e.day} at {e.time:%H:%M} is already booked")
+            slots.pop("time")
+            missing = ["time"]
+        else:
+            await acommit_booking(session_id, {
+                "name": booking.name,
+                "email": booking.email,
+                "date": str(booking.date),
+                "time": str(booking.time),
+            })
+            return f"Booking confirmed for {booking.name} on {booking.date} at {booking.time}."
+    await aset_booking_draft(session_id, {"slots": slots, "asked": missing})
+    return await _ask(slots, missing, problems)
+
+
+async def astart(session: AsyncSession, session_id: str, message: str, verdict: str) -> str:
+    """First turn of a booking. ``verdict`` is the booking classifier's reply, one that
+    ``is_booking`` accepted: ``BOOKING_READY`` or ``BOOKING_PARTIAL`` with the slots it found."""
+    # slots the LLM extracted win; the local extractor fills anything it left out
+    found = {**extract_slots(message), **_parse_slots(verdict)}
+    return await _advance(session, session_id, {}, found)
+
+
+async def acontinue(session: AsyncSession, session_id: str, message: str, draft: Dict[str, Any]) -> str | None:
+    """A turn while a booking draft is open. Replies that only give booking details are read
+    locally and cost no LLM call; anything else, including a question that mentions a date, time
+    or email, costs one small one. Returns ``None`` when the message is not about the booking (it
+    is answered normally and the draft is kept)."""
+    slots: Dict[str, str] = dict(draft.get("slots") or {})
+    if _CANCEL_RE.search(message):
+        await aclear_booking_draft(session_id)
+        return CANCELLED
+    found = extract_slots(message)
+    mentions_slots = bool(found)
+    if found and not _slot_only(message):
+        found = {}
+    if not mentions_slots and "name" in (draft.get("asked") or []):
+        m = _BARE_NAME_RE.match(message)
+        if m and m.group(1).lower() not in _NOT_NAMES:
+            found = {"name": m.group(1)}
+    if not found:
+        if message.rstrip().endswith("?") and not mentions_slots:
+            return None
+        missing = [k for k in SLOTS if k not in slots]
+        verdict = await aextract_booking_followup(message, slots, missing)
+        logger.debug(f"Booking follow-up extraction: {verdict}")
+        head = verdict.strip().lstrip("\"'`*").upper()
+        if head.startswith("CANCEL"):
+            await aclear_booking_draft(session_id)
+            return CANCELLED
+        if head.startswith("OTHER"):
+            return None
+        found = _parse_slots(verdict)
+    return await _advance(session, session_id, slots, found)
@@ -1,26 +1,74 @@
-from app.services.groq_llm import chat_completion
-import datetime 
-today_date = datetime.date.today()
-print(today_date)
-BOOKING_EXTRACTION_PROMPT = f"""
+from app.core.config import get_settings
+from app.core.metrics import timed
+from app.services.groq_llm import chat_completion, achat_completion
+from app.services.intent import alog_llm_verdict, fast_path, log_llm_verdict
+import datetime
+import json
+
+settings = get_settings()
+
+# Formatted per call with today's date, so a long-running worker resolves "tomorrow" correctly
+BOOKING_EXTRACTION_PROMPT = """
  Detect if the user wants to book an interview.
 If yes, extract name, email, date, and time. The time must be in 24-hour HH:MM:SS format (e.g., 15:00:00).
 If the time and date are not in HH:MM:SS format, try to normalize it to that format. For example, "tomorrow 3pm". the date becomes todays YYYY-MM-DD + 1, and time becomes 15:00:00.
-Today's date is {today_date}.
+Today's date is {today}.
 Rules:
 - If all fields are present and valid, respond exactly:
   BOOKING_READY: {{"name": "...", "email": "...", "date": "YYYY-MM-DD", "time": "HH:MM:SS"}}
-- If booking intent is present but any field is missing or ambiguous, ask a single, clear question for the missing piece(s).
-  Example: "Please provide your email."
+- If booking intent is present but any field is missing or ambiguous, respond exactly with the fields you found, leaving out the others:
+  BOOKING_PARTIAL: {{"name": "..."}}
 - If there is no booking intent, respond exactly: NO_BOOKING
 
 Don't do anyother thing just follow the above rules.
 """
 
-def extract_booking_info(user_message: str) -> dict:
-    messages = [
-        {"role": "system", "content": BOOKING_EXTRACTION_PROMPT},
+# Follow-up turns of a booking in progress: only the reply is sent, with the known slots as context
+BOOKING_FOLLOWUP_PROMPT = """You are collecting details to book an interview. Today's date is {today}.
+Already known: {known}. Still missing: {missing}.
+From the user's reply, extract any of: name, email, date (YYYY-MM-DD), time (24-hour HH:MM:SS).
+Respond with only a JSON object of the fields found, e.g. {{"email": "jane@example.com"}}, or {{}} if none.
+If the user no longer wants to book, respond exactly: CANCEL
+If the reply is about something else entirely, respond exactly: OTHER
+"""
+
+
+def _booking_messages(user_message: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": BOOKING_EXTRACTION_PROMPT.format(today=datetime.date.today())},
         {"role": "user", "content": user_message},
     ]
-    response = chat_completion(messages)
-    return response
\ No newline at end of file
+
+def _followup_messages(user_message: str, known: dict[str, str], missing: list[str]) -> list[dict[str, str]]:
+    prompt = BOOKING_FOLLOWUP_PROMPT.format(
+        today=datetime.date.today(), known=json.dumps(known), missing=", ".join(missing)
+    )
+    return [{"role": "system", "content": prompt}, {"role": "user", "content": user_message}]
+
+def extract_booking_info(user_message: str) -> str:
+    local = fast_path(user_message)
+    if local is not None:
+        return local
+    response = chat_completion(_booking_messages(user_message))
+    log_llm_verdict(user_message, response)
+    return response
+
+@timed("intent")
+async def aextract_booking_info(user_message: str) -> str:
+    local = fast_path(user_message)
+    if local is not None:
+        return local
+    response = await achat_completion(_booking_messages(user_message))
+    await alog_llm_verdict(user_message, response)
+    return response
+
+@timed("booking_followup")
+async def aextract_booking_followup(user_message: str, known: dict[str, str], missing: list[str]) -> str:
+    """One small LLM call for a reply the local parser could not read: a JSON object of slots,
+    ``CANCEL`` or ``OTHER``."""
+    return await achat_completion(
+        _followup_messages(user_message, known, missing),
+        temperature=0.0,
+        model=settings.booking_followup_model,
+        max_tokens=settings.booking_followup_max_tokens,
+    )
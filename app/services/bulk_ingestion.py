@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+from loguru import logger
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.metrics import add_observer, observe, stage
+from app.models.db_models import Chunk, Document
+from app.services.chunking import ChunkUnit, TextChunk
+from app.services.ingestion_pipeline import (
+    ChunkerName,
+    DocumentPlan,
+    IngestionError,
+    Progress,
+    _find_identical,
+    abort_document,
+    cleanup_vectors,
+    detect_filetype,
+    discard_vectors,
+    file_sha256,
+    parse_and_chunk,
+    persist_document,
+    plan_document,
+    unchanged_result,
+)
+from app.services.pinecone_service import PineconeService
+from app.services.semantic_cache import bump_namespace_version
+from app.services.vector_store import VectorStore, get_vector_store
+
+settings = get_settings()
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+MANIFEST = "manifest.json"
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+@dataclass
+class BulkSource:
+    filename: str  # reported and stored on the Document; the member path for archive entries
+    path: str  # spooled copy on disk
+    content_type: str = ""
+
+
+# --- spooling and archive expansion -------------------------------------------------------------
+
+def write_manifest(job_dir: str, uploads: List[Dict[str, str]]) -> str:
+    path = os.path.join(job_dir, MANIFEST)
+    with open(path, "w") as f:
+        json.dump({"uploads": uploads}, f)
+    return path
+
+
+def _skip_member(name: str) -> bool:
+    base = os.path.basename(name.rstrip("/"))
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def _failed(filename: str, error: str) -> Dict[str, Any]:
+    return {"filename": filename, "status": "failed", "error": error}
+
+
+def _parse_error(e: Exception) -> str:
+    return str(e) if isinstance(e, IngestionError) else f"{type(e).__name__}: {e}"
+
+
+def expand_manifest(manifest_path: str) -> Tuple[List[BulkSource], List[Dict[str, Any]]]:
+    """Spooled uploads as a flat list of sources, archives expanded next to the manifest.
+
+    Members are written under numbered names (never their archive path), so archives cannot
+    write outside the job directory. Members that are too large are reported, not extracted;
+    unsupported types are rejected later like any other file.
+    """
+    job_dir = os.path.dirname(manifest_path)
+    with open(manifest_path) as f:
+        uploads = json.load(f)["uploads"]
+    members_dir = os.path.join(job_dir, "members")
+    os.makedirs(members_dir, exist_ok=True)
+
+    sources: List[BulkSource] = []
+    rejected: List[Dict[str, Any]] = []
+
+    def add_member(name: str, size: int, open_member) -> None:
+        if _skip_member(name):
+            return
+        if len(sources) + len(rejected) >= settings.ingest_bulk_max_files:
+            raise IngestionError(f"More than {settings.ingest_bulk_max_files} files in one bulk job")
+        if size > settings.ingest_bulk_max_file_bytes:
+            rejected.append(_failed(name, f"File exceeds {settings.ingest_bulk_max_file_bytes} bytes"))
+            return
+        path = os.path.join(members_dir, f"{len(sources):06d}")
+        with open_member() as src, open(path, "wb") as out:
+            shutil.copyfileobj(src, out, length=1024 * 1024)
+        sources.append(BulkSource(name, path))
+
+    for up in uploads:
+        filename, path = up["filename"], up["path"]
+        try:
+            if filename.lower().endswith(".zip"):
+                with zipfile.ZipFile(path) as zf:
+                    for info in zf.infolist():
+                        if not info.is_dir():
+                            add_member(info.filename, info.file_size, lambda info=info: zf.open(info))
+            elif is_archive(filename):
+                # streaming mode reads each member once, in archive order, even when compressed
+                with tarfile.open(path, "r|*") as tf:
+                    for member in tf:
+                        if member.isfile():
+                            add_member(member.name, member.size, lambda member=member: tf.extractfile(member))
+            else:
+                sources.append(BulkSource(filename, path, up.get("content_type") or ""))
+        except IngestionError:
+            raise
+        except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+            rejected.append(_failed(filename, f"Unreadable archive: {e}"))
+    return sources, rejected
+
+
+# --- parsing (process pool) ---------------------------------------------------------------------
+
+_known_hashes: Set[str] = set()
+_observed: List[Tuple[str, str, float, bool]] = []
+
+
+def _record(pipeline: str, name: str, seconds: float, failed: bool) -> None:
+    _observed.append((pipeline, name, seconds, failed))
+
+
+def _init_parse_worker(known_hashes: Set[str]) -> None:
+    # runs once in each pool process: stage timings are collected and replayed by the parent
+    global _known_hashes
+    _known_hashes = known_hashes
+    add_observer(_record)
+
+
+def _parse(path: str, filetype: str, params: Dict[str, Any], known: Set[str]) -> Tuple[str, List[TextChunk] | None]:
+    with open(path, "rb") as f:
+        content_hash = file_sha256(f)
+        if content_hash in known:
+            return content_hash, None  # identical to an ingested document; not worth parsing
+        # one process per document already; don't nest a page-range pool inside it
+        return content_hash, parse_and_chunk(f, filetype, pdf_workers=1, **params)
+
+
+def _parse_in_worker(
+    path: str, filetype: str, params: Dict[str, Any]
+) -> Tuple[str, List[TextChunk] | None, List[Tuple[str, str, float, bool]]]:
+    _observed.clear()
+    content_hash, pieces = _parse(path, filetype, params, _known_hashes)
+    return content_hash, pieces, list(_observed)
+
+
+def _parse_in_thread(
+    path: str, filetype: str, params: Dict[str, Any], known: Set[str]
+) -> Tuple[str, List[TextChunk] | None, List[Tuple[str, str, float, bool]]]:
+    # same process: stage timings are already recorded
+    return (*_parse(path, filetype, params, known), [])
+
+
+# --- embedding, upsert and persistence ----------------------------------------------------------
+
+@dataclass
+class _DocState:
+    index: int  # position in the job's source list
+    plan: DocumentPlan
+    remaining: int  # pieces still to embed
+    rows: List[Chunk] = field(default_factory=list)
+    vector_ids: List[str] = field(default_factory=list)
+    failed: bool = False
+
+
+class _BulkWriter:
+    """Packs chunks of many documents into embedding batches and commits each document once all
+    of its chunks are upserted. A failure fails only the documents in the affected batch."""
+
+    def __init__(
+        self,
+        session: Session,
+        namespace: str | None,
+        pc: PineconeService,
+        store: VectorStore,
+        progress: Progress,
+        results: List[Dict[str, Any] | None],
+        batch_size: int,
+    ) -> None:
+        self.session = session
+        self.namespace = namespace
+        self.pc = pc
+        self.store = store
+        self.progress = progress
+        self.results = results
+        self.batch_size = max(1, batch_size)
+        self.buffer: List[Tuple[_DocState, int]] = []
+        self.flushes = 0
+        self.changed = False
+
+    def add(self, index: int, plan: DocumentPlan) -> None:
+        doc = _DocState(index, plan, remaining=len(plan.todo))
+        if not plan.todo:
+            self._persist([doc])
+            return
+        self.buffer.extend((doc, i) for i in plan.todo)
+        while len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        batch = [(doc, i) for doc, i in self.buffer[: self.batch_size] if not doc.failed]
+        del self.buffer[: self.batch_size]
+        if not batch:
+            return
+        self.flushes += 1
+        per_doc: Dict[int, Tuple[_DocState, List[int], List[List[float]]]] = {}
+        try:
+            with stage("embed", "ingest"):
+                embeddings = self.pc.embed_texts([doc.plan.pieces[i].text for doc, i in batch], input_type="passage")
+            for (doc, i), emb in zip(batch, embeddings):
+                entry = per_doc.setdefault(doc.index, (doc, [], []))
+                entry[1].append(i)
+                entry[2].append(emb)
+            items: List[Dict[str, Any]] = []
+            for doc, indices, embs in per_doc.values():
+                doc_items, rows = doc.plan.new_chunks(indices, embs)
+                doc.rows.extend(rows)
+                doc.vector_ids.extend(item["id"] for item in doc_items)
+                items.extend(doc_items)
+            with stage("upsert", "ingest"):
+                self.store.upsert(items, namespace=self.namespace)
+        except Exception as e:
+            logger.exception(f"bulk ingest: embedding batch of {len(batch)} chunks failed")
+            for doc in {id(d): d for d, _ in batch}.values():
+                self._fail(doc, e)
+            return
+        self.progress.advance("embed", len(batch))
+        self.progress.advance("upsert", len(items))
+        done = []
+        for doc, indices, _ in per_doc.values():
+            doc.remaining -= len(indices)
+            if doc.remaining == 0:
+                done.append(doc)
+        self._persist(done)
+
+    def close(self) -> None:
+        while self.buffer:
+            self.flush()
+
+    def _persist(self, docs: List[_DocState]) -> None:
+        # one transaction per document, so a failure never leaves a document half-written
+        for doc in docs:
+            plan = doc.plan
+            try:
+                with stage("persist", "ingest"):
+                    persist_document(self.session, plan, doc.rows)
+            except Exception as e:
+                logger.exception(f"bulk ingest: persisting {plan.filename} failed")
+                self._fail(doc, e)
+                continue
+            cleanup_vectors(plan, self.store, self.namespace)
+            self.changed = self.changed or plan.changed
+            self.results[doc.index] = plan.result(self.namespace)
+            self.progress.advance("persist")
+            doc.rows = []
+
+    def _fail(self, doc: _DocState, error: Exception) -> None:
+        if doc.failed:
+            return
+        doc.failed = True
+        try:
+            abort_document(self.session, doc.plan)
+        except Exception:
+            logger.exception(f"bulk ingest: rolling back {doc.plan.filename} failed")
+        discard_vectors(doc.plan, doc.vector_ids, self.store, self.namespace)
+        self.results[doc.index] = _failed(doc.plan.filename, f"{type(error).__name__}: {error}")
+
+
+def _known_content_hashes(session: Session, namespace: str | None, meta: Dict[str, Any]) -> Set[str]:
+    rows = session.exec(
+        select(Document.content_hash, Document.meta).where(Document.namespace == namespace)
+    ).all()
+    return {h for h, m in rows if h and (m or {}) == meta}
+
+
+def run_bulk_ingestion(
+    sources: List[BulkSource],
+    session: Session,
+    chunker: ChunkerName = "recursive",
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    chunk_unit: ChunkUnit = "chars",
+    namespace: str | None = None,
+    progress: Progress | None = None,
+    pc: PineconeService | None = None,
+    store: VectorStore | None = None,
+    workers: int | None = None,
+) -> Dict[str, Any]:
+    """Ingest many documents with the same settings as ``run_ingestion``, but pipelined.
+
+    Files are hashed, parsed and chunked across a process pool while the main thread embeds:
+    chunks from different documents are packed into INGEST_BULK_EMBED_BATCH-sized flushes, each
+    flush is one ``embed_texts`` call (full inference batches) and one upsert, and a document's
+    ``Chunk`` rows are committed as soon as its last chunk is upserted. Per-document failures are
+    reported in ``documents`` (input order) and do not stop the job.
+    """
+    progress = progress or Progress()
+    started = time.perf_counter()
+    if chunk_overlap >= chunk_size:
+        raise IngestionError("chunk_overlap must be < chunk_size")
+    meta = {"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunk_unit": chunk_unit}
+    params = {"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunk_unit": chunk_unit}
+
+    results: List[Dict[str, Any] | None] = [None] * len(sources)
+    todo: List[Tuple[int, str]] = []
+    seen: Set[str] = set()
+    for idx, src in enumerate(sources):
+        try:
+            filetype = detect_filetype(src.filename, src.content_type)
+        except IngestionError as e:
+            results[idx] = _failed(src.filename, str(e))
+            continue
+        if src.filename in seen:
+            # documents are keyed by filename; a second copy would overwrite the first mid-job
+            results[idx] = _failed(src.filename, "Duplicate filename in this job")
+            continue
+        seen.add(src.filename)
+        todo.append((idx, filetype))
+
+    pc = pc or PineconeService()
+    store = store or get_vector_store()
+    writer = _BulkWriter(session, namespace, pc, store, progress, results, settings.ingest_bulk_embed_batch)
+    known = _known_content_hashes(session, namespace, meta)
+    workers = workers or settings.ingest_bulk_parse_workers or os.cpu_count() or 1
+    use_processes = workers > 1 and len(todo) > 1
+    pool: Executor = (
+        ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker, initargs=(known,))
+        if use_processes else ThreadPoolExecutor(max_workers=1)
+    )
+
+    def submit(path: str, filetype: str) -> Future:
+        if use_processes:
+            return pool.submit(_parse_in_worker, path, filetype, params)
+        return pool.submit(_parse_in_thread, path, filetype, params, known)
+
+    for name, total in (("parse", len(todo)), ("chunk", 0), ("embed", 0), ("upsert", 0), ("persist", len(todo))):
+        progress.start(name, total=total)
+    with pool:
+        # at most two files per worker are parsed ahead of the embedder, so memory stays bounded
+        window = 2 * workers
+        in_flight: Dict[Future, Tuple[int, str]] = {}
+        next_todo = 0
+        while next_todo < len(todo) or in_flight:
+            while next_todo < len(todo) and len(in_flight) < window:
+                idx, filetype = todo[next_todo]
+                in_flight[submit(sources[idx].path, filetype)] = (idx, filetype)
+                next_todo += 1
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx, filetype = in_flight.pop(fut)
+                filename = sources[idx].filename
+                progress.advance("parse")
+                try:
+                    content_hash, pieces, observed = fut.result()
+                except Exception as e:
+                    results[idx] = _failed(filename, _parse_error(e))
+                    continue
+                for pipeline, name, seconds, failed in observed:
+                    observe(name, seconds, pipeline, failed)
+                if pieces is None:
+                    same = _find_identical(session, content_hash, namespace, meta)
+                    if same is not None:
+                        results[idx] = unchanged_result(session, same, filename, namespace)
+                        progress.advance("persist")
+                        continue
+                    # the hash was known but the document is gone (deleted mid-job): parse it now
+                    try:
+                        with open(sources[idx].path, "rb") as f:
+                            pieces = parse_and_chunk(f, filetype, **params)
+                    except Exception as e:
+                        results[idx] = _failed(filename, _parse_error(e))
+                        continue
+                progress.advance("chunk", len(pieces))
+                try:
+                    plan = plan_document(session, filename, filetype, content_hash, meta, pieces, namespace)
+                except Exception as e:
+                    session.rollback()
+                    results[idx] = _failed(filename, f"{type(e).__name__}: {e}")
+                    continue
+                writer.add(idx, plan)
+        writer.close()
+    for name in ("parse", "chunk", "embed", "upsert", "persist"):
+        progress.finish(name)
+
+    # new content in this namespace makes cached RAG answers stale
+    if writer.changed:
+        bump_namespace_version(namespace or "__default__")
+
+    documents = [r or _failed(src.filename, "Not processed") for r, src in zip(results, sources)]
+    counts: Dict[str, int] = defaultdict(int)
+    for r in documents:
+        counts[r["status"]] += 1
+    chunks = sum(r.get("chunks", 0) for r in documents if r["status"] != "failed")
+    embedded = sum(r.get("embedded", 0) for r in documents if r["status"] != "failed")
+    elapsed = time.perf_counter() - started
+    return {
+        "namespace": namespace,
+        "files": len(documents),
+        "succeeded": len(documents) - counts.get("failed", 0),
+        "failed": counts.get("failed", 0),
+        "statuses": dict(counts),
+        "chunks": chunks,
+        "embedded": embedded,
+        "embed_flushes": writer.flushes,
+        "elapsed_s": round(elapsed, 3),
+        "chunks_per_second": round(chunks / elapsed, 1) if elapsed > 0 else None,
+        "embedded_per_second": round(embedded / elapsed, 1) if elapsed > 0 else None,
+        "documents": documents,
+    }
+
+
+def run_bulk_job(manifest_path: str, session: Session, **kwargs: Any) -> Dict[str, Any]:
+    """Expand a bulk job's spooled uploads and ingest them; see ``run_bulk_ingestion``."""
+    sources, rejected = expand_manifest(manifest_path)
+    result = run_bulk_ingestion(sources, session, **kwargs)
+    if rejected:
+        result["documents"].extend(rejected)
+        result["files"] += len(rejected)
+        result["failed"] += len(rejected)
+        result["statuses"]["failed"] = result["statuses"].get("failed", 0) + len(rejected)
+    return result
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from loguru import logger
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import get_settings
+from app.core.metrics import timed
+from app.models.db_models import ChatSession
+from app.services import redis_memory
+
+settings = get_settings()
+
+
+def _pk_key(session_id: str) -> str:
+    return f"chat:{session_id}:pk"
+
+
+class ChatSessionResolver:
+    """Maps a client ``session_id`` to its ``chatsession.id``, creating the row on first use.
+
+    Lookups go in-process LRU -> Redis -> database. The database step is a single
+    ``INSERT ... ON CONFLICT DO NOTHING RETURNING id``, so concurrent first messages for the same
+    session cannot race on the unique index; the loser of the race reads the winner's id.
+    Known sessions cost no database round-trip.
+    """
+
+    def __init__(self, max_items: int = 100_000, ttl: int = 30 * 24 * 3600) -> None:
+        self.max_items = max_items
+        self.ttl = ttl
+        self._local: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"local": 0, "redis": 0, "db": 0}
+
+    def _remember(self, session_id: str, pk: int) -> None:
+        with self._lock:
+            self._local[session_id] = pk
+            self._local.move_to_end(session_id)
+            while len(self._local) > self.max_items:
+                self._local.popitem(last=False)
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._local.pop(session_id, None)
+
+    @timed("session_resolve")
+    async def resolve(self, session: AsyncSession, session_id: str) -> int:
+        with self._lock:
+            pk = self._local.get(session_id)
+            if pk is not None:
+                self._local.move_to_end(session_id)
+                self.hits["local"] += 1
+                return pk
+
+        try:
+            raw = await redis_memory.ar.get(_pk_key(session_id))
+        except Exception:
+            logger.exception("chat session cache: Redis read failed")
+            raw = None
+        if raw:
+            self.hits["redis"] += 1
+            self._remember(session_id, int(raw))
+            return int(raw)
+
+        pk = await self._upsert(session, session_id)
+        self.hits["db"] += 1
+        self._remember(session_id, pk)
+        try:
+            await redis_memory.ar.set(_pk_key(session_id), pk, ex=self.ttl)
+        except Exception:
+            logger.exception("chat session cache: Redis write failed")
+        return pk
+
+    async def _upsert(self, session: AsyncSession, session_id: str) -> int:
+        table = ChatSession.__table__
+        dialect = session.bind.dialect.name if session.bind is not None else "postgresql"
+        insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+        if insert is None:
+            raise RuntimeError(f"ON CONFLICT upsert is not supported on {dialect}")
+        stmt = (
+            insert(table)
+            .values(session_id=session_id)
+            .on_conflict_do_nothing(index_elements=[table.c.session_id])
+            .returning(table.c.id)
+        )
+        pk = (await session.execute(stmt)).scalar_one_or_none()
+        await session.commit()
+        if pk is None:
+            # row already existed (or a concurrent request just created it)
+            pk = (await session.exec(select(ChatSession.id).where(ChatSession.session_id == session_id))).one()
+        return pk
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._local), **self.hits}
+
+
+chat_session_resolver = ChatSessionResolver(
+    max_items=settings.chat_session_cache_size, ttl=settings.chat_session_cache_ttl
+)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+
+import redis
+from loguru import logger
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.clients import clients
+from app.core.config import get_settings
+from app.db.session import engine
+from app.models.db_models import Chunk
+
+settings = get_settings()
+
+_LEXICAL_PREFIX = "chunk:"  # ids of chunks that have no vector (see LexicalRetriever)
+
+
+def _redis_key(chunk_id: str) -> str:
+    return f"chunktext:{chunk_id}"
+
+
+class ChunkTextStore:
+    """Chunk text by vector id, for matches whose index metadata carries no ``text``.
+
+    Lookups go in-process LRU -> Redis -> one ``SELECT ... WHERE vector_id IN (...)`` for whatever
+    is left. A vector id always names the same text (changed content gets a new id at ingestion),
+    so entries never need invalidating; ids of deleted chunks simply stop being asked for.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        redis_client: "redis.Redis | None",
+        ttl_seconds: int,
+        db_engine: Engine = engine,
+    ) -> None:
+        self.max_items = max_items
+        self.redis = redis_client
+        self.ttl = ttl_seconds
+        self.engine = db_engine
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"lru": 0, "redis": 0, "db": 0, "missing": 0}
+
+    def _lru_put(self, chunk_id: str, text: str) -> None:
+        self._lru[chunk_id] = text
+        self._lru.move_to_end(chunk_id)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def _load(self, ids: List[str]) -> Dict[str, str]:
+        vector_ids = [i for i in ids if not i.startswith(_LEXICAL_PREFIX)]
+        pks = [int(i[len(_LEXICAL_PREFIX):]) for i in ids if i.startswith(_LEXICAL_PREFIX)]
+        found: Dict[str, str] = {}
+        with Session(self.engine) as session:
+            if vector_ids:
+                for vid, text in session.exec(select(Chunk.vector_id, Chunk.text).where(Chunk.vector_id.in_(vector_ids))):
+                    found[vid] = text
+            if pks:
+                for pk, text in session.exec(select(Chunk.id, Chunk.text).where(Chunk.id.in_(pks))):
+                    found[f"{_LEXICAL_PREFIX}{pk}"] = text
+        return found
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, str]:
+        ids = list(dict.fromkeys(ids))
+        out: Dict[str, str] = {}
+        missing: List[str] = []
+        with self._lock:
+            for i in ids:
+                text = self._lru.get(i)
+                if text is not None:
+                    self._lru.move_to_end(i)
+                    out[i] = text
+                    self.hits["lru"] += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.redis is not None:
+            try:
+                raws = self.redis.mget([_redis_key(i) for i in missing])
+            except redis.RedisError:
+                logger.exception("Chunk text cache: Redis read failed")
+                raws = [None] * len(missing)
+            still: List[str] = []
+            with self._lock:
+                for i, raw in zip(missing, raws):
+                    if raw is not None:
+                        text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                        out[i] = text
+                        self._lru_put(i, text)
+                        self.hits["redis"] += 1
+                    else:
+                        still.append(i)
+            missing = still
+
+        if missing:
+            found = self._load(missing)
+            with self._lock:
+                for i, text in found.items():
+                    self._lru_put(i, text)
+                self.hits["db"] += len(found)
+                self.hits["missing"] += len(missing) - len(found)
+            out.update(found)
+            if found and self.redis is not None:
+                try:
+                    pipe = self.redis.pipeline(transaction=False)
+                    for i, text in found.items():
+                        pipe.set(_redis_key(i), text, ex=self.ttl)
+                    pipe.execute()
+                except redis.RedisError:
+                    logger.exception("Chunk text cache: Redis write failed")
+        return out
+
+    def hydrate(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill ``metadata["text"]`` in place for matches that lack it; returns ``docs``.
+
+        Vectors written before metadata was slimmed still carry their text and are left alone.
+        """
+        need = [d for d in docs if not (d.get("metadata") or {}).get("text")]
+        if not need:
+            return docs
+        texts = self.get_many(d["id"] for d in need)
+        for d in need:
+            text = texts.get(d["id"])
+            if text is not None:
+                d["metadata"] = {**(d.get("metadata") or {}), "text": text}
+        return docs
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._lru), "max_items": self.max_items, **self.hits}
+
+
+def _build_store() -> ChunkTextStore:
+    client = clients.redis_bytes if settings.chunk_text_cache_redis else None
+    return ChunkTextStore(settings.chunk_text_cache_size, client, settings.chunk_text_cache_ttl)
+
+
+chunk_text_store = _build_store()
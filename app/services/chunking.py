@@ -1,31 +1,207 @@
 from __future__ import annotations
-from typing import List
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Literal
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.services.parsers import PageText
+from app.services.tokenizer import get_tokenizer
 
-def chunk_recursive(
-    text: str, chunk_size: int = 800, chunk_overlap: int = 100
-) -> List[str]:
-    splitter = RecursiveCharacterTextSplitter(
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+ChunkUnit = Literal["chars", "tokens"]
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+@dataclass(slots=True)
+class TextChunk:
+    text: str
+    start: int  # character offsets into the document (pages joined with "\n")
+    end: int
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+@lru_cache(maxsize=32)
+def _recursive_splitter(chunk_size: int, chunk_overlap: int, unit: ChunkUnit) -> RecursiveCharacterTextSplitter:
+    # langchain is slow to import; load it with the first splitter rather than at app startup
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    length_function: Callable[[str], int] = get_tokenizer().count if unit == "tokens" else len
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ". ", " ", ""],
+        separators=SEPARATORS,
+        length_function=length_function,
     )
-    return splitter.split_text(text)
+
+
+def _find(text: str, piece: str, pos: int) -> int:
+    # str.find pays a setup cost proportional to the needle; locate a short prefix, then verify
+    probe = piece[:32]
+    start = text.find(probe, pos)
+    while start >= 0 and not text.startswith(piece, start):
+        start = text.find(probe, start + 1)
+    return start
+
+
+class ChunkingEngine:
+    """Splits text into offset-tracked chunks sized in characters or tokens.
+
+    Chunks are cut from the source string by offset; nothing is exploded into per-character lists.
+    Engines are cached per configuration by ``get_engine``, so the recursive splitter is built once.
+    """
+
+    def __init__(
+        self,
+        chunker: str = "recursive",
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        unit: ChunkUnit = "chars",
+    ) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be < chunk_size")
+        self.chunker = chunker
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+
+    # --- single string -------------------------------------------------------
+
+    def split(self, text: str, base: int = 0) -> List[TextChunk]:
+        if self.chunker == "recursive":
+            return self._split_recursive(text, base)
+        if self.unit == "tokens":
+            return self._window_tokens(text, base)
+        return self._window_chars(text, base)
+
+    def _split_recursive(self, text: str, base: int) -> List[TextChunk]:
+        splitter = _recursive_splitter(self.chunk_size, self.chunk_overlap, self.unit)
+        out: List[TextChunk] = []
+        prev, prev_end = -1, 0
+        for piece in splitter.split_text(text):
+            # Chunks come back in document order. With character sizing the next one starts at most
+            # chunk_overlap chars before the previous end, which keeps the search window short.
+            # add_start_index isn't used: it assumes overlap is measured in characters.
+            hint = max(prev_end - self.chunk_overlap, prev + 1) if self.unit == "chars" else prev + 1
+            start = _find(text, piece, hint)
+            if start < 0:
+                start = _find(text, piece, max(prev, 0))
+            out.append(TextChunk(piece, base + start, base + start + len(piece)))
+            prev, prev_end = start, start + len(piece)
+        return out
+
+    def _window_chars(self, text: str, base: int) -> List[TextChunk]:
+        out: List[TextChunk] = []
+        step = self.chunk_size - self.chunk_overlap
+        n = len(text)
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_size, n)
+            out.append(TextChunk(text[start:end], base + start, base + end))
+            if end == n:
+                break
+            start += step
+        return out
+
+    def _window_tokens(self, text: str, base: int) -> List[TextChunk]:
+        starts = get_tokenizer().starts(text)
+        n = len(starts)
+        out: List[TextChunk] = []
+        step = self.chunk_size - self.chunk_overlap
+        i = 0
+        while i < n:
+            j = min(i + self.chunk_size, n)
+            # cut at the next token's start so whitespace between tokens stays with the chunk
+            start, end = starts[i], (starts[j] if j < n else len(text))
+            out.append(TextChunk(text[start:end], base + start, base + end))
+            if j == n:
+                break
+            i += step
+        return out
+
+    # --- page stream ---------------------------------------------------------
+
+    def stream(self, pages: Iterable[PageText], window: int = 16) -> Iterator[TextChunk]:
+        """Chunk a page stream without joining the whole document.
+
+        Text accumulates in a buffer of roughly ``window`` chunks; once full, every chunk except
+        the last is emitted and the buffer restarts at the last chunk's start, so chunks never
+        straddle a flush boundary. Offsets and page numbers are document-global.
+        """
+        parts: List[str] = []
+        buf_len = 0
+        buf_base = 0                 # document offset of the buffer's first character
+        marks: List[int] = []        # document offsets where a page starts...
+        mark_pages: List[int] = []   # ...and that page's number
+        last_page: int | None = None
+        # token sizes are roughly 4 chars each; this only decides when to flush
+        flush_at = max(window, 4) * self.chunk_size * (4 if self.unit == "tokens" else 1)
+
+        def page_of(offset: int) -> int:
+            return mark_pages[max(bisect_right(marks, offset) - 1, 0)]
+
+        def emit(final: bool) -> Iterator[TextChunk]:
+            nonlocal parts, buf_len, buf_base, marks, mark_pages
+            buf = "".join(parts)
+            chunks = self.split(buf, buf_base)
+            if not final and len(chunks) > 1:
+                keep_from = chunks[-1].start - buf_base
+                chunks = chunks[:-1]
+            else:
+                keep_from = len(buf)
+            for c in chunks:
+                if c.text.strip():
+                    c.page_start, c.page_end = page_of(c.start), page_of(max(c.end - 1, c.start))
+                    yield c
+            rest = buf[keep_from:]
+            parts, buf_len = ([rest] if rest else []), len(rest)
+            buf_base += keep_from
+            # keep only the page mark covering the new buffer start and those after it
+            first = max(bisect_right(marks, buf_base) - 1, 0)
+            marks, mark_pages = marks[first:], mark_pages[first:]
+
+        for page in pages:
+            if not page.text:
+                continue
+            if page.page_number != last_page:
+                if last_page is not None:
+                    parts.append("\n")  # pages are separated by a newline, as read_pdf joins them
+                    buf_len += 1
+                marks.append(buf_base + buf_len)
+                mark_pages.append(page.page_number)
+                last_page = page.page_number
+            parts.append(page.text)
+            buf_len += len(page.text)
+            if buf_len >= flush_at:
+                yield from emit(final=False)
+        if buf_len:
+            yield from emit(final=True)
+
+
+@lru_cache(maxsize=32)
+def get_engine(
+    chunker: str = "recursive", chunk_size: int = 800, chunk_overlap: int = 100, unit: ChunkUnit = "chars"
+) -> ChunkingEngine:
+    return ChunkingEngine(chunker, chunk_size, chunk_overlap, unit)
+
+
+def chunk_recursive(
+    text: str, chunk_size: int = 800, chunk_overlap: int = 100
+) -> List[str]:
+    return [c.text for c in get_engine("recursive", chunk_size, chunk_overlap).split(text)]
 
 def chunk_sliding_window(
     text: str, chunk_size: int = 800, chunk_overlap: int = 100
 ) -> List[str]:
-    if chunk_overlap >= chunk_size:
-        raise ValueError("chunk_overlap must be < chunk_size")
-    tokens = list(text)
-    chunks: List[str] = []
-    start = 0
-    n = len(tokens)
-    while start < n:
-        end = min(start + chunk_size, n)
-        chunks.append("".join(tokens[start:end]))
-        if end == n:
-            break
-        start = end - chunk_overlap
-    return chunks
\ No newline at end of file
+    return [c.text for c in get_engine("sliding", chunk_size, chunk_overlap).split(text)]
+
+def chunk_pages(
+    pages: Iterable[PageText],
+    chunker: str = "recursive",
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    unit: ChunkUnit = "chars",
+) -> Iterator[TextChunk]:
+    return get_engine(chunker, chunk_size, chunk_overlap, unit).stream(pages)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import redis
+from loguru import logger
+from app.core.clients import clients
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace-only normalization: anything stronger (case folding, punctuation) changes the embedding
+    return _WS_RE.sub(" ", text).strip()
+
+
+def cache_key(model: str, input_type: str, truncate: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"emb:{model}:{input_type}:{truncate}:{digest}"
+
+
+def _pack(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _unpack(raw: bytes) -> List[float]:
+    a = array("f")
+    a.frombytes(raw)
+    return a.tolist()
+
+
+class _TierStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0}
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: bounded in-process LRU in front of a shared Redis tier with TTL.
+
+    Vectors are stored in Redis as packed float32 so a 1024-d embedding costs 4 KB instead of JSON text.
+    Redis errors are logged and treated as misses; the cache never fails an embedding call.
+    """
+
+    def __init__(self, max_items: int, redis_client: "redis.Redis | None", ttl_seconds: int) -> None:
+        self.max_items = max_items
+        self.redis = redis_client
+        self.ttl = ttl_seconds
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lru_stats = _TierStats()
+        self.redis_stats = _TierStats()
+
+    def _lru_put(self, key: str, vec: List[float]) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        out: List[Optional[List[float]]] = [None] * len(keys)
+        missing: List[int] = []
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    out[i] = vec
+                    self.lru_stats.hits += 1
+                else:
+                    missing.append(i)
+                    self.lru_stats.misses += 1
+
+        if missing and self.redis is not None:
+            try:
+                raws = self.redis.mget([keys[i] for i in missing])
+            except redis.RedisError:
+                logger.exception("Embedding cache: Redis read failed")
+                raws = [None] * len(missing)
+            with self._lock:
+                for i, raw in zip(missing, raws):
+                    if raw:
+                        vec = _unpack(raw)
+                        out[i] = vec
+                        self._lru_put(keys[i], vec)
+                        self.redis_stats.hits += 1
+                    else:
+                        self.redis_stats.misses += 1
+        return out
+
+    def set_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        with self._lock:
+            for k, v in zip(keys, vectors):
+                self._lru_put(k, v)
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for k, v in zip(keys, vectors):
+                pipe.set(k, _pack(v), ex=self.ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception("Embedding cache: Redis write failed")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                "lru": {**self.lru_stats.as_dict(), "size": len(self._lru), "max_items": self.max_items},
+                "redis": self.redis_stats.as_dict(),
+            }
+
+
+def _build_cache() -> EmbeddingCache | None:
+    if not settings.embedding_cache_enabled:
+        return None
+    client = clients.redis_bytes if settings.embedding_cache_redis else None
+    return EmbeddingCache(settings.embedding_cache_size, client, settings.embedding_cache_ttl)
+
+
+embedding_cache = _build_cache()
@@ -1,15 +1,57 @@
 from __future__ import annotations
-from typing import List, Dict
-from groq import Groq
+from typing import Any, AsyncIterator, List, Dict
+from app.core.clients import clients
 from app.core.config import get_settings
+from app.core.metrics import record_usage
 
 settings = get_settings()
-client = Groq(api_key=settings.groq_api_key)
 
-def chat_completion(messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
-    resp = client.chat.completions.create(
+def _options(max_tokens: int | None) -> Dict[str, Any]:
+    return {"max_tokens": max_tokens} if max_tokens else {}
+
+def chat_completion(
+    messages: List[Dict[str, str]], temperature: float = 0.2, model: str | None = None, max_tokens: int | None = None
+) -> str:
+    model = model or settings.groq_model
+    resp = clients.groq.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        **_options(max_tokens),
+    )
+    record_usage(model, resp.usage)
+    return resp.choices[0].message.content or ""
+
+async def achat_completion(
+    messages: List[Dict[str, str]], temperature: float = 0.2, model: str | None = None, max_tokens: int | None = None
+) -> str:
+    model = model or settings.groq_model
+    resp = await clients.agroq.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        **_options(max_tokens),
+    )
+    record_usage(model, resp.usage)
+    return resp.choices[0].message.content or ""
+
+async def astream_chat_completion(
+    messages: List[Dict[str, str]], temperature: float = 0.2
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield ``{"type": "token", "content": ...}`` per delta and a final ``{"type": "usage", ...}``."""
+    stream = await clients.agroq.chat.completions.create(
         model=settings.groq_model,
         messages=messages,
         temperature=temperature,
+        stream=True,
     )
-    return resp.choices[0].message.content or ""
\ No newline at end of file
+    async for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield {"type": "token", "content": delta}
+        # Groq reports usage on the last chunk under x_groq
+        usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+        if usage is not None:
+            record_usage(settings.groq_model, usage)
+            yield {"type": "usage", "usage": usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)}
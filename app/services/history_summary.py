@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import timed
+from app.services import redis_memory
+from app.services.groq_llm import achat_completion
+
+settings = get_settings()
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the previous summary with the new messages into one updated summary of at most 120 words. "
+    "Keep names, emails, dates, times, booking details, open questions and facts the user stated; "
+    "drop pleasantries. Reply with the summary only."
+)
+
+
+def _lock_key(session_id: str) -> str:
+    return f"chat:{session_id}:summary:lock"
+
+
+@timed("summarize")
+async def asummarize(previous: str | None, messages: List[Dict[str, Any]]) -> str:
+    transcript = "\n".join(f"{m.get('role')}: {m.get('content')}" for m in messages)
+    return (await achat_completion([
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Previous summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+    ], temperature=0.0)).strip()
+
+
+async def amaybe_update_summary(session_id: str, turns: int) -> None:
+    """Every HISTORY_SUMMARY_EVERY turns, fold all but the last HISTORY_KEEP_TURNS turns into the summary.
+
+    Runs after the reply has been sent; a Redis lock keeps concurrent requests from summarizing twice.
+    """
+    every, keep = settings.history_summary_every, settings.history_keep_turns
+    if every <= 0 or turns % every:
+        return
+    if not await redis_memory.ar.set(_lock_key(session_id), "1", nx=True, ex=120):
+        return
+    try:
+        ctx = await redis_memory.aget_context(session_id, limit=20)
+        target = ctx.turns - keep
+        if target <= ctx.summary_turns:
+            return
+        # the list holds the newest len/2 turns as user/assistant pairs
+        first_turn = ctx.turns - len(ctx.messages) // 2 + 1
+        start = max(ctx.summary_turns + 1, first_turn)
+        fold = ctx.messages[2 * (start - first_turn): 2 * (target - first_turn + 1)]
+        if not fold:
+            return
+        text = await asummarize(ctx.summary, fold)
+        if text:
+            await redis_memory.aset_summary(session_id, text, target)
+            logger.debug(f"Summarized session {session_id} through turn {target} ({len(fold)} new messages)")
+    except Exception:
+        logger.exception(f"History summarization failed for session {session_id}")
+    finally:
+        await redis_memory.ar.delete(_lock_key(session_id))
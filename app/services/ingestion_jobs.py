@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Tuple
+
+from loguru import logger
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.core.metrics import registry
+from app.db.session import engine
+from app.models.db_models import IngestionJob
+from app.services.bulk_ingestion import is_archive, run_bulk_job, write_manifest
+from app.services.ingestion_pipeline import IngestionError, Progress, STAGES, detect_filetype, run_ingestion
+from app.services.job_queue import JobQueue
+
+settings = get_settings()
+
+JOBS = registry.counter("rag_ingest_jobs_total", "Ingestion job attempts by outcome", ("status",))
+
+
+def create_job(
+    session: Session,
+    queue: JobQueue,
+    file_obj: BinaryIO,
+    filename: str,
+    content_type: str,
+    params: Dict[str, Any],
+) -> IngestionJob:
+    """Spool the upload to disk, persist a queued job row and enqueue its id."""
+    detect_filetype(filename, content_type)  # reject unsupported types before accepting the job
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(settings.ingest_spool_dir, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    file_path = os.path.join(job_dir, os.path.basename(filename) or "upload")
+    file_obj.seek(0)
+    with open(file_path, "wb") as out:
+        shutil.copyfileobj(file_obj, out, length=1024 * 1024)
+
+    job = IngestionJob(
+        id=job_id,
+        filename=filename,
+        content_type=content_type,
+        file_path=file_path,
+        params=params,
+        max_attempts=settings.ingest_max_attempts,
+        progress={s: {"done": 0, "total": None} for s in STAGES},
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    queue.enqueue(job_id)
+    return job
+
+
+def create_bulk_job(
+    session: Session,
+    queue: JobQueue,
+    files: List[Tuple[BinaryIO, str, str]],
+    params: Dict[str, Any],
+) -> IngestionJob:
+    """Spool several uploads (documents and/or zip/tar archives) as one job; see ``run_bulk_job``."""
+    if not files:
+        raise IngestionError("No files uploaded")
+    if len(files) > settings.ingest_bulk_max_files:
+        raise IngestionError(f"More than {settings.ingest_bulk_max_files} files in one bulk job")
+    for _, filename, content_type in files:
+        if not is_archive(filename):
+            detect_filetype(filename, content_type)
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(settings.ingest_spool_dir, job_id)
+    upload_dir = os.path.join(job_dir, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    uploads = []
+    for n, (file_obj, filename, content_type) in enumerate(files):
+        # numbered so two uploads with the same basename don't overwrite each other
+        file_path = os.path.join(upload_dir, f"{n:05d}-{os.path.basename(filename) or 'upload'}")
+        file_obj.seek(0)
+        with open(file_path, "wb") as out:
+            shutil.copyfileobj(file_obj, out, length=1024 * 1024)
+        uploads.append({"filename": filename, "content_type": content_type, "path": file_path})
+
+    job = IngestionJob(
+        id=job_id,
+        filename=files[0][1] if len(files) == 1 else f"{len(files)} files",
+        content_type="multipart/mixed",
+        file_path=write_manifest(job_dir, uploads),
+        params={**params, "bulk": True},
+        max_attempts=settings.ingest_max_attempts,
+        progress={s: {"done": 0, "total": None} for s in STAGES},
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    queue.enqueue(job_id)
+    return job
+
+
+def _update_job(job_id: str, **fields: Any) -> None:
+    with Session(engine) as session:
+        job = session.get(IngestionJob, job_id)
+        if job is None:
+            return
+        for k, v in fields.items():
+            setattr(job, k, v)
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+
+
+class JobProgress(Progress):
+    """Writes per-stage progress onto the job row, at most every ``min_interval`` seconds."""
+
+    def __init__(self, job_id: str, min_interval: float = 0.5) -> None:
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.state: Dict[str, Dict[str, Any]] = {s: {"done": 0, "total": None} for s in STAGES}
+        self.stage: str | None = None
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def _flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.min_interval:
+            return
+        self._last_flush = now
+        # assign a fresh dict so the JSONB change is detected
+        _update_job(self.job_id, stage=self.stage, progress={k: dict(v) for k, v in self.state.items()})
+
+    def start(self, stage: str, total: int = 1) -> None:
+        with self._lock:
+            self.stage = stage
+            self.state[stage] = {"done": 0, "total": total}
+            self._flush(force=True)
+
+    def advance(self, stage: str, n: int = 1) -> None:
+        with self._lock:
+            self.state[stage]["done"] += n
+            self._flush()
+
+    def finish(self, stage: str) -> None:
+        with self._lock:
+            st = self.state[stage]
+            # streamed stages (parse) learn their total only at the end
+            st["total"] = max(st["total"] or 0, st["done"])
+            st["done"] = st["total"]
+            self._flush(force=True)
+
+
+def process_job(job_id: str, queue: JobQueue) -> None:
+    """Run one job attempt; on transient failure schedule a retry with exponential backoff."""
+    with Session(engine) as session:
+        job = session.get(IngestionJob, job_id)
+        if job is None or job.status in ("succeeded", "failed"):
+            return
+        job.status = "running"
+        job.attempts += 1
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        attempt, max_attempts = job.attempts, job.max_attempts
+        file_path, filename, content_type = job.file_path, job.filename, job.content_type or ""
+        params = dict(job.params or {})
+
+    logger.info(f"ingest job {job_id}: attempt {attempt}/{max_attempts} for {filename}")
+    bulk = params.pop("bulk", False)
+    try:
+        if bulk:
+            with Session(engine) as session:
+                result = run_bulk_job(file_path, session, progress=JobProgress(job_id), **params)
+        else:
+            with open(file_path, "rb") as f, Session(engine) as session:
+                result = run_ingestion(
+                    f, filename, session, content_type=content_type, progress=JobProgress(job_id), **params
+                )
+    except IngestionError as e:
+        logger.warning(f"ingest job {job_id} failed permanently: {e}")
+        JOBS.labels("failed").inc()
+        _update_job(job_id, status="failed", error=str(e))
+        _cleanup(file_path)
+        return
+    except Exception as e:
+        logger.exception(f"ingest job {job_id} attempt {attempt} failed")
+        JOBS.labels("failed" if attempt >= max_attempts else "retrying").inc()
+        if attempt >= max_attempts:
+            _update_job(job_id, status="failed", error=f"{type(e).__name__}: {e}")
+            _cleanup(file_path)
+        else:
+            delay = queue.enqueue_retry(job_id, attempt)
+            _update_job(job_id, status="retrying", error=f"{type(e).__name__}: {e} (retry in {delay:.0f}s)")
+        return
+
+    JOBS.labels("succeeded").inc()
+    _update_job(job_id, status="succeeded", error=None, result=result, document_id=result.get("document_id"))
+    _cleanup(file_path)
+
+
+def _cleanup(file_path: str) -> None:
+    shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, List, Literal, Sequence, Tuple
+
+from loguru import logger
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.metrics import observe, stage
+from app.models.db_models import Document, Chunk
+from app.services.parsers import iter_pages, iter_pdf_pages
+from app.services.chunking import ChunkUnit, TextChunk, chunk_pages
+from app.services.pinecone_service import PineconeService
+from app.services.semantic_cache import bump_namespace_version
+from app.services.vector_store import VectorStore, get_vector_store
+from app.services import vector_codec
+
+settings = get_settings()
+
+ChunkerName = Literal["recursive", "sliding"]
+STAGES = ("parse", "chunk", "embed", "upsert", "persist")
+
+
+class IngestionError(Exception):
+    """Input problem (unsupported type, no text); retrying the job will not help."""
+
+
+class Progress:
+    """Per-stage progress sink; the default implementation only logs."""
+
+    def start(self, stage: str, total: int = 1) -> None:
+        logger.debug(f"ingest stage={stage} total={total}")
+
+    def advance(self, stage: str, n: int = 1) -> None:
+        pass
+
+    def finish(self, stage: str) -> None:
+        pass
+
+
+def detect_filetype(filename: str, content_type: str = "") -> str:
+    name = filename.lower()
+    if name.endswith(".pdf") or "pdf" in content_type:
+        return "pdf"
+    if name.endswith(".txt") or "text" in content_type:
+        return "txt"
+    raise IngestionError("Only .pdf or .txt supported")
+
+
+def file_sha256(file_obj: BinaryIO, block_size: int = 1 << 20) -> str:
+    file_obj.seek(0)
+    h = hashlib.sha256()
+    for block in iter(lambda: file_obj.read(block_size), b""):
+        h.update(block)
+    file_obj.seek(0)
+    return h.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _find_identical(session: Session, content_hash: str, namespace: str | None, meta: Dict[str, Any]) -> Document | None:
+    candidates = session.exec(
+        select(Document).where(Document.content_hash == content_hash, Document.namespace == namespace)
+    ).all()
+    # same bytes chunked with different settings is a different index entry
+    return next((d for d in candidates if (d.meta or {}) == meta), None)
+
+
+def _find_previous(session: Session, filename: str, namespace: str | None) -> Document | None:
+    return session.exec(
+        select(Document)
+        .where(Document.filename == filename, Document.namespace == namespace)
+        .order_by(Document.uploaded_at.desc())
+    ).first()
+
+
+def vector_metadata(doc_id: int, filename: str, idx: int, piece: TextChunk) -> Dict[str, Any]:
+    # ids and citation fields only: the text lives in the Chunk table (see chunk_text.ChunkTextStore),
+    # which keeps index storage and every include_metadata query response small
+    return {
+        "document_id": doc_id,
+        "filename": filename,
+        "chunk_index": idx,
+        "page_start": piece.page_start,
+        "page_end": piece.page_end,
+    }
+
+
+@dataclass
+class DocumentPlan:
+    """What ingesting one parsed document changes, decided before anything is embedded.
+
+    ``todo`` indexes the pieces that need a new vector; ``kept`` holds, per piece, the previous
+    upload's row that is re-used as is (or None); ``stale`` rows are deleted on persist and
+    ``moved`` are kept rows whose position changed, with their refreshed vector metadata.
+    """
+
+    doc: Document
+    is_new: bool
+    filename: str
+    filetype: str
+    content_hash: str
+    meta: Dict[str, Any]
+    pieces: List[TextChunk]
+    hashes: List[str]
+    kept: List[Chunk | None]
+    stale: List[Chunk]
+    todo: List[int]
+    moved: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    moved_rows: List[Tuple[Chunk, int]] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.todo or self.stale or self.moved)
+
+    def new_chunks(
+        self, indices: Sequence[int], embeddings: Sequence[List[float]]
+    ) -> Tuple[List[Dict[str, Any]], List[Chunk]]:
+        """Vector upsert items and ``Chunk`` rows for the pieces at ``indices``."""
+        items: List[Dict[str, Any]] = []
+        rows: List[Chunk] = []
+        store_embeddings = settings.embedding_storage in vector_codec.FORMATS
+        for i, emb in zip(indices, embeddings):
+            piece = self.pieces[i]
+            vector_id = str(uuid.uuid4())
+            items.append({"id": vector_id, "values": emb, "metadata": vector_metadata(self.doc.id, self.filename, i, piece)})
+            rows.append(Chunk(
+                document_id=self.doc.id,
+                chunk_index=i,
+                text=piece.text,
+                content_hash=self.hashes[i],
+                vector_id=vector_id,
+                page_start=piece.page_start,
+                page_end=piece.page_end,
+                start_char=piece.start,
+                end_char=piece.end,
+                # a compact local copy lets us re-rank or rebuild an index without re-embedding
+                embedding=vector_codec.encode(emb, settings.embedding_storage) if store_embeddings else None,
+            ))
+        return items, rows
+
+    def result(self, namespace: str | None) -> Dict[str, Any]:
+        return {
+            "document_id": self.doc.id,
+            "filename": self.filename,
+            "chunks": len(self.pieces),
+            "namespace": namespace,
+            "status": "created" if self.is_new else "updated",
+            "embedded": len(self.todo),
+            "reused": len(self.pieces) - len(self.todo),
+            "deleted": len(self.stale),
+        }
+
+
+def unchanged_result(session: Session, doc: Document, filename: str, namespace: str | None) -> Dict[str, Any]:
+    n = len(session.exec(select(Chunk.id).where(Chunk.document_id == doc.id)).all())
+    logger.info(f"{filename}: identical to document {doc.id}; skipping ingestion")
+    return {
+        "document_id": doc.id,
+        "filename": filename,
+        "chunks": n,
+        "namespace": namespace,
+        "status": "unchanged",
+        "embedded": 0,
+        "reused": n,
+        "deleted": 0,
+    }
+
+
+def parse_and_chunk(
+    file_obj: BinaryIO,
+    filetype: str,
+    chunker: ChunkerName = "recursive",
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    chunk_unit: ChunkUnit = "chars",
+    progress: Progress | None = None,
+    pdf_workers: int | None = None,
+) -> List[TextChunk]:
+    """Parse and chunk as a stream: pages feed the chunker as they are extracted, so the full
+    document text is never materialized. Parse and chunk time are recorded separately."""
+    progress = progress or Progress()
+    progress.start("parse", total=0)  # page count is unknown until the stream ends
+    progress.start("chunk")
+    pages_seen = 0
+    parse_s = 0.0  # time spent pulling pages; the rest of the streamed stage is chunking
+
+    def counted(pages):
+        nonlocal pages_seen, parse_s
+        it = iter(pages)
+        while True:
+            t0 = time.perf_counter()
+            page = next(it, None)
+            parse_s += time.perf_counter() - t0
+            if page is None:
+                return
+            if page.page_number > pages_seen:
+                progress.advance("parse", page.page_number - pages_seen)
+                pages_seen = page.page_number
+            yield page
+
+    pages = iter_pdf_pages(file_obj, pdf_workers) if filetype == "pdf" else iter_pages(file_obj, filetype)
+    started = time.perf_counter()
+    try:
+        pieces = list(chunk_pages(
+            counted(pages), chunker=chunker, chunk_size=chunk_size, chunk_overlap=chunk_overlap, unit=chunk_unit,
+        ))
+    except Exception as e:
+        observe("parse", parse_s, "ingest", failed=True)
+        raise IngestionError(f"Failed to parse file: {e}") from e
+    observe("parse", parse_s, "ingest")
+    observe("chunk", time.perf_counter() - started - parse_s, "ingest")
+    if not pieces:
+        raise IngestionError("No extractable text found")
+    progress.finish("parse")
+    progress.finish("chunk")
+    return pieces
+
+
+def plan_document(
+    session: Session,
+    filename: str,
+    filetype: str,
+    content_hash: str,
+    meta: Dict[str, Any],
+    pieces: List[TextChunk],
+    namespace: str | None,
+) -> DocumentPlan:
+    """Diff parsed pieces against the previous upload of ``filename`` (creating the Document row
+    for a first upload). Nothing but the new Document row is written here."""
+    hashes = [chunk_sha256(p.text) for p in pieces]
+    doc = _find_previous(session, filename, namespace)
+    is_new = doc is None
+    old_rows: List[Chunk] = []
+    if is_new:
+        doc = Document(filename=filename, filetype=filetype, source="upload", namespace=namespace, meta=meta)
+        session.add(doc)
+        session.commit()
+        session.refresh(doc)
+    else:
+        old_rows = list(session.exec(select(Chunk).where(Chunk.document_id == doc.id)).all())
+
+    # unchanged chunks keep their row and vector; duplicates within a document match one-to-one
+    reusable: Dict[str, List[Chunk]] = defaultdict(list)
+    for row in old_rows:
+        if row.content_hash and row.vector_id:
+            reusable[row.content_hash].append(row)
+    kept: List[Chunk | None] = [reusable[h].pop() if reusable.get(h) else None for h in hashes]
+    kept_ids = {row.id for row in kept if row is not None}
+    plan = DocumentPlan(
+        doc=doc,
+        is_new=is_new,
+        filename=filename,
+        filetype=filetype,
+        content_hash=content_hash,
+        meta=meta,
+        pieces=pieces,
+        hashes=hashes,
+        kept=kept,
+        stale=[row for row in old_rows if row.id not in kept_ids],
+        todo=[i for i, row in enumerate(kept) if row is None],
+    )
+
+    # unchanged chunks that moved (index/page/offsets) keep their vector; refresh its metadata
+    for i, row in enumerate(kept):
+        piece = pieces[i]
+        if row is None:
+            continue
+        if (row.chunk_index, row.page_start, row.page_end, row.start_char, row.end_char) != (
+            i, piece.page_start, piece.page_end, piece.start, piece.end
+        ):
+            plan.moved[row.vector_id] = vector_metadata(doc.id, filename, i, piece)
+            plan.moved_rows.append((row, i))
+    return plan
+
+
+def persist_document(session: Session, plan: DocumentPlan, new_rows: Iterable[Chunk]) -> None:
+    """Write new chunks, moved-row positions, stale-row deletes and the document fingerprint in
+    one transaction."""
+    for row, i in plan.moved_rows:
+        piece = plan.pieces[i]
+        row.chunk_index, row.page_start, row.page_end = i, piece.page_start, piece.page_end
+        row.start_char, row.end_char = piece.start, piece.end
+        session.add(row)
+    session.add_all(new_rows)
+    for row in plan.stale:
+        session.delete(row)
+    doc = plan.doc
+    doc.content_hash = plan.content_hash
+    doc.meta = plan.meta
+    doc.filetype = plan.filetype
+    session.add(doc)
+    session.commit()
+
+
+def abort_document(session: Session, plan: DocumentPlan) -> None:
+    session.rollback()
+    if plan.is_new:
+        # leave no half-ingested Document behind so a retry starts clean
+        session.delete(plan.doc)
+        session.commit()
+
+
+def discard_vectors(plan: DocumentPlan, vector_ids: List[str], store: VectorStore, namespace: str | None) -> None:
+    """Delete the vectors upserted by an ingestion attempt that was aborted."""
+    if not vector_ids:
+        return
+    try:
+        store.delete(vector_ids, namespace=namespace)
+    except Exception:
+        logger.exception(f"{plan.filename}: {len(vector_ids)} vectors left orphaned in namespace {namespace}")
+
+
+def cleanup_vectors(plan: DocumentPlan, store: VectorStore, namespace: str | None) -> None:
+    # the DB no longer references these; a failure here leaves orphans in the index, not broken rows
+    try:
+        with stage("cleanup", "ingest"):
+            store.delete([row.vector_id for row in plan.stale if row.vector_id], namespace=namespace)
+            store.update_metadata(plan.moved, namespace=namespace)
+    except Exception:
+        logger.exception(f"{plan.filename}: failed to clean up stale/moved vectors in namespace {namespace}")
+    if any(row.vector_id is None for row in plan.stale):
+        logger.warning(f"{plan.filename}: some replaced chunks predate vector-id tracking; their vectors were not deleted")
+
+
+def run_ingestion(
+    file_obj: BinaryIO,
+    filename: str,
+    session: Session,
+    content_type: str = "",
+    chunker: ChunkerName = "recursive",
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    chunk_unit: ChunkUnit = "chars",
+    namespace: str | None = None,
+    progress: Progress | None = None,
+    pc: PineconeService | None = None,
+    store: VectorStore | None = None,
+) -> Dict[str, Any]:
+    """Parse, chunk, embed, upsert and persist one document.
+
+    Ingestion is incremental: a file whose bytes (and chunk settings) match a document already in
+    the namespace is skipped before parsing, and a re-upload of a known filename only embeds the
+    chunks whose content hash is new, re-uses the vectors of unchanged chunks and deletes the rest.
+    """
+    progress = progress or Progress()
+
+    filetype = detect_filetype(filename, content_type)
+    if chunk_overlap >= chunk_size:
+        raise IngestionError("chunk_overlap must be < chunk_size")
+    meta = {"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunk_unit": chunk_unit}
+
+    # 0) Identical file already ingested? Decide before any parsing.
+    content_hash = file_sha256(file_obj)
+    same = _find_identical(session, content_hash, namespace, meta)
+    if same is not None:
+        for name in STAGES:
+            progress.start(name, total=0)
+            progress.finish(name)
+        return unchanged_result(session, same, filename, namespace)
+
+    # 1+2) Parse and chunk
+    pieces = parse_and_chunk(file_obj, filetype, chunker, chunk_size, chunk_overlap, chunk_unit, progress)
+
+    # 3) Document record (re-using the previous upload of this filename, if any) and chunk diff
+    plan = plan_document(session, filename, filetype, content_hash, meta, pieces, namespace)
+
+    pc = pc or PineconeService()
+    store = store or get_vector_store()
+    items: List[Dict[str, Any]] = []
+    try:
+        # 4) Embed and upsert only new/changed chunks
+        progress.start("embed", total=len(plan.todo))
+        with stage("embed", "ingest"):
+            embeddings = pc.embed_texts(
+                [pieces[i].text for i in plan.todo], input_type="passage",
+                on_progress=lambda n: progress.advance("embed", n),
+            )
+        progress.finish("embed")
+        items, new_rows = plan.new_chunks(plan.todo, embeddings)
+
+        progress.start("upsert", total=len(items))
+        with stage("upsert", "ingest"):
+            store.upsert(items, namespace=namespace, on_progress=lambda n: progress.advance("upsert", n))
+        progress.finish("upsert")
+
+        # 5) Persist chunks and the new document fingerprint in one transaction
+        progress.start("persist", total=len(new_rows) + len(plan.stale))
+        with stage("persist", "ingest"):
+            persist_document(session, plan, new_rows)
+        progress.advance("persist", len(new_rows) + len(plan.stale))
+        progress.finish("persist")
+    except Exception:
+        abort_document(session, plan)
+        # vector ids are minted per attempt, so anything already upserted would stay orphaned
+        # (and retrievable) after every retry
+        discard_vectors(plan, [i["id"] for i in items], store, namespace)
+        raise
+
+    cleanup_vectors(plan, store, namespace)
+    # new content in this namespace makes cached RAG answers stale
+    if plan.changed:
+        bump_namespace_version(namespace or "__default__")
+
+    return {**plan.result(namespace), "stats": {"embed": pc.last_embed_stats, "upsert": store.last_upsert_stats}}
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal
+
+from loguru import logger
+from app.core.config import get_settings
+
+settings = get_settings()
+
+Intent = Literal["booking", "no_booking", "ambiguous"]
+SLOTS = ("name", "email", "date", "time")
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_REL_DATE_RE = re.compile(r"\b(today|tomorrow|day after tomorrow)\b", re.I)
+_WEEKDAY_RE = re.compile(r"\b(?:next\s+|this\s+|on\s+)?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.I)
+_MONTH_DAY_RE = re.compile(
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b", re.I
+)
+_HMS_RE = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)(?::([0-5]\d))?\s*(am|pm)?\b", re.I)
+_AMPM_RE = re.compile(r"\b(1[0-2]|0?[1-9])\s*(am|pm|a\.m\.|p\.m\.)", re.I)
+# the prefix matches in any case ("My name is", "I AM"); the name itself must be capitalized
+_NAME_RE = re.compile(
+    r"\b(?i:my name is|i am|i'm|this is|name\s*[:=])\s+([A-Z][a-zA-Z'-]+(?:\s+[A-Z][a-zA-Z'-]+){0,3})"
+)
+_PHONE_RE = re.compile(r"(?<!\w)(?!\d{4}-\d{1,2}-\d{1,2}\b)\+?\d[\d\s().-]{6,}\d(?!\w)")
+_BOOK_PHRASE_RE = re.compile(
+    r"\b(book|schedule|reschedule|reserve|arrange|set up|setup)\b.{0,40}?\b(interview|appointment|meeting|call|slot)s?\b",
+    re.I,
+)
+_BOOK_VERB_RE = re.compile(r"\b(book|schedule|reschedule|reserve)\b", re.I)
+_INTERVIEW_RE = re.compile(r"\binterview", re.I)
+_QUESTION_RE = re.compile(
+    r"^\s*(what|how|why|who|which|where|when|explain|describe|summari[sz]e|list|tell me about|define|compare|does|do|is|are|can)\b",
+    re.I,
+)
+
+_MONTHS = {m: i for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+@dataclass
+class IntentResult:
+    intent: Intent
+    confidence: float
+    slots: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return all(self.slots.get(k) for k in SLOTS)
+
+
+def _extract_date(text: str, today: datetime.date) -> str | None:
+    m = _ISO_DATE_RE.search(text)
+    if m:
+        try:
+            return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3))).isoformat()
+        except ValueError:
+            return None
+    m = _REL_DATE_RE.search(text)
+    if m:
+        offset = {"today": 0, "tomorrow": 1, "day after tomorrow": 2}[m.group(1).lower()]
+        return (today + datetime.timedelta(days=offset)).isoformat()
+    m = _MONTH_DAY_RE.search(text)
+    if m:
+        month = _MONTHS[m.group(1).lower()[:3]]
+        year = int(m.group(3)) if m.group(3) else today.year
+        try:
+            d = datetime.date(year, month, int(m.group(2)))
+        except ValueError:
+            return None
+        if not m.group(3) and d < today:
+            d = d.replace(year=year + 1)
+        return d.isoformat()
+    m = _WEEKDAY_RE.search(text)
+    if m:
+        target = _WEEKDAYS.index(m.group(1).lower())
+        days = (target - today.weekday()) % 7 or 7
+        return (today + datetime.timedelta(days=days)).isoformat()
+    return None
+
+
+def _extract_time(text: str) -> str | None:
+    m = _HMS_RE.search(text)
+    if m:
+        hour, minute, second = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+        ampm = (m.group(4) or "").lower()
+        if ampm == "pm" and hour < 12:
+            hour += 12
+        elif ampm == "am" and hour == 12:
+            hour = 0
+        return f"{hour:02d}:{minute:02d}:{second:02d}"
+    m = _AMPM_RE.search(text)
+    if m:
+        hour = int(m.group(1)) % 12
+        if m.group(2).lower().startswith("p"):
+            hour += 12
+        return f"{hour:02d}:00:00"
+    return None
+
+
+def extract_slots(text: str, today: datetime.date | None = None) -> Dict[str, str]:
+    """Pull the obvious booking slots out of a message with regexes; missing slots are omitted.
+
+    >>> extract_slots("My name is John Smith, book me tomorrow at 10am, john@x.com", datetime.date(2030, 1, 1))
+    {'email': 'john@x.com', 'date': '2030-01-02', 'time': '10:00:00', 'name': 'John Smith'}
+    >>> extract_slots("I am Alice")
+    {'name': 'Alice'}
+    >>> extract_slots("i am free on friday", datetime.date(2030, 1, 1))
+    {'date': '2030-01-04'}
+    """
+    today = today or datetime.date.today()
+    slots: Dict[str, str] = {}
+    m = _EMAIL_RE.search(text)
+    if m:
+        slots["email"] = m.group(0).rstrip(".")
+    date = _extract_date(text, today)
+    if date:
+        slots["date"] = date
+    time = _extract_time(text)
+    if time:
+        slots["time"] = time
+    m = _NAME_RE.search(text)
+    if m:
+        slots["name"] = m.group(1).strip()
+    return slots
+
+
+def unmatched_words(text: str) -> List[str]:
+    """Words of ``text`` outside everything ``extract_slots`` reads (emails, dates, times, introduced names).
+
+    >>> unmatched_words("my email is jane@x.com, friday at 3pm")
+    ['my', 'email', 'is', 'at']
+    """
+    for rx in (_EMAIL_RE, _NAME_RE, _ISO_DATE_RE, _REL_DATE_RE, _MONTH_DAY_RE, _WEEKDAY_RE, _HMS_RE, _AMPM_RE):
+        text = rx.sub(" ", text)
+    return re.findall(r"[A-Za-z][A-Za-z'-]*", text)
+
+
+def _rule_score(text: str, slots: Dict[str, str]) -> float:
+    score = 0.0
+    if _BOOK_PHRASE_RE.search(text):
+        score += 0.6
+    elif _BOOK_VERB_RE.search(text):
+        score += 0.35
+    elif _INTERVIEW_RE.search(text):
+        score += 0.15
+    score += 0.2 if "email" in slots else 0.0
+    score += 0.15 if "date" in slots else 0.0
+    score += 0.15 if "time" in slots else 0.0
+    score += 0.1 if "name" in slots else 0.0
+    # "Can I get an interview?" is a question too; only penalize questions with no booking cue
+    if score < 0.35 and not _INTERVIEW_RE.search(text) and _QUESTION_RE.search(text):
+        score -= 0.2
+    return min(max(score, 0.0), 1.0)
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"fast_no_booking": 0, "fast_booking": 0, "llm_fallback": 0}
+
+    def incr(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        hits = counts["fast_no_booking"] + counts["fast_booking"]
+        return {**counts, "total": total, "fast_path_hit_rate": (hits / total) if total else 0.0}
+
+
+stats = _Stats()
+
+
+class IntentClassifier:
+    """Rules + regex booking-intent classifier, optionally blended with a scikit-learn model.
+
+    The model is any pickled estimator exposing ``predict_proba`` over raw strings (e.g. a
+    TfidfVectorizer + LogisticRegression pipeline built by ``train_intent_model``) whose
+    positive class means "booking".
+    """
+
+    def __init__(self, threshold: float = 0.85, model_path: str | None = None) -> None:
+        self.threshold = threshold
+        self.model = None
+        if model_path:
+            try:
+                import joblib
+                self.model = joblib.load(model_path)
+            except Exception:
+                logger.exception(f"Failed to load intent model from {model_path}; using rules only")
+
+    def booking_probability(self, text: str, slots: Dict[str, str]) -> float:
+        p = _rule_score(text, slots)
+        if self.model is not None:
+            p_model = float(self.model.predict_proba([text])[0][1])
+            p = (p + p_model) / 2
+        return p
+
+    def classify(self, text: str, today: datetime.date | None = None) -> IntentResult:
+        """``no_booking`` is only answered for messages without a booking verb or interview noun;
+        those at worst fall in the ambiguous band, where the LLM decides.
+
+        >>> c = IntentClassifier(0.85)
+        >>> c.classify("I'd like an interview please").intent
+        'ambiguous'
+        >>> c.classify("Can I get an interview?").intent
+        'ambiguous'
+        >>> c.classify("What is the refund policy?").intent
+        'no_booking'
+        """
+        slots = extract_slots(text, today)
+        p = self.booking_probability(text, slots)
+        cue = _BOOK_VERB_RE.search(text) or _INTERVIEW_RE.search(text)
+        if p <= 1 - self.threshold and not cue:
+            return IntentResult("no_booking", 1 - p, slots)
+        if p >= self.threshold:
+            return IntentResult("booking", p, slots)
+        return IntentResult("ambiguous", max(p, 1 - p), slots)
+
+
+_classifier = IntentClassifier(settings.intent_fastpath_threshold, settings.intent_model_path)
+
+
+def fast_path(text: str) -> str | None:
+    """Answer the booking classifier locally when the message is unambiguous.
+
+    Returns ``NO_BOOKING``, or a ``BOOKING_READY: {...}`` / ``BOOKING_PARTIAL: {...}`` line in the
+    same format the booking LLM produces, or ``None`` when the LLM has to decide. A partial booking
+    carries the slots found so far; the booking flow asks for the rest.
+    """
+    if not settings.intent_fastpath_enabled:
+        return None
+    result = _classifier.classify(text)
+    if result.intent == "no_booking":
+        stats.incr("fast_no_booking")
+        return "NO_BOOKING"
+    if result.intent == "booking":
+        stats.incr("fast_booking")
+        verdict = "BOOKING_READY: " if result.complete else "BOOKING_PARTIAL: "
+        return verdict + json.dumps({k: result.slots[k] for k in SLOTS if k in result.slots})
+    stats.incr("llm_fallback")
+    return None
+
+
+def classify(text: str, today: datetime.date | None = None) -> IntentResult:
+    return _classifier.classify(text, today)
+
+
+def redact(text: str) -> str:
+    """``text`` with emails, phone numbers and introduced names replaced by placeholders.
+
+    >>> redact("My name is Jane Doe, jane@x.com, +1 (555) 010-2030, 2030-01-02 at 10am")
+    'My name is <name>, <email>, <phone>, 2030-01-02 at 10am'
+    """
+    text = _EMAIL_RE.sub("<email>", text)
+    text = _NAME_RE.sub(lambda m: m.group(0)[:m.start(1) - m.start(0)] + "<name>", text)
+    return _PHONE_RE.sub("<phone>", text)
+
+
+_log_lock = threading.Lock()
+
+
+def log_llm_verdict(text: str, verdict: str) -> None:
+    """Append the LLM's decision for an ambiguous turn to the training log, if configured.
+
+    Emails, phone numbers and names are redacted first; the rest of the message is kept as is.
+    Blocking file I/O: async callers use ``alog_llm_verdict``.
+    """
+    if not settings.intent_training_log:
+        return
+    label = 1 if verdict.strip().lstrip("\"'`*").upper().startswith(("BOOKING_READY", "BOOKING_PARTIAL")) else 0
+    line = json.dumps({"text": redact(text), "label": label}) + "\n"
+    try:
+        with _log_lock, open(settings.intent_training_log, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        logger.exception("Failed to append intent training log")
+
+
+async def alog_llm_verdict(text: str, verdict: str) -> None:
+    if settings.intent_training_log:
+        await asyncio.to_thread(log_llm_verdict, text, verdict)
+
+
+def train_intent_model(log_path: str, out_path: str) -> None:
+    """Fit a TF-IDF + logistic regression model on logged turns and pickle it for INTENT_MODEL_PATH."""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    texts: List[str] = []
+    labels: List[int] = []
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            texts.append(row["text"])
+            labels.append(int(row["label"]))
+    model = make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), min_df=1, sublinear_tf=True),
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+    )
+    model.fit(texts, labels)
+    joblib.dump(model, out_path)
+
+
+if __name__ == "__main__":
+    # python -m app.services.intent <training_log.jsonl> <model.joblib>
+    train_intent_model(sys.argv[1], sys.argv[2])
+    print(f"Intent model written to {sys.argv[2]}")
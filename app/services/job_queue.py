@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import random
+import time
+from functools import lru_cache
+from typing import List
+
+import redis
+from app.core.clients import clients
+from app.core.config import get_settings
+
+settings = get_settings()
+
+QUEUE_KEY = "ingest:queue"
+DELAYED_KEY = "ingest:delayed"
+WORKERS_KEY = "ingest:workers"
+
+
+def _processing_key(worker_id: str) -> str:
+    return f"ingest:processing:{worker_id}"
+
+
+def _heartbeat_key(worker_id: str) -> str:
+    return f"ingest:heartbeat:{worker_id}"
+
+
+class WorkerIdInUse(RuntimeError):
+    """Another live worker holds this worker id."""
+
+
+class JobQueue:
+    """Reliable job-id queue on plain Redis lists (no broker).
+
+    Workers atomically move an id from the queue to their own processing list (BLMOVE) and remove
+    it once the job is settled. Each worker keeps a heartbeat key alive while it runs; the
+    processing list of a worker whose heartbeat has expired is re-queued by any other worker
+    (at-least-once delivery), never the list of one that is still alive. Retries wait in a sorted
+    set scored by their due time.
+    """
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.r = client
+
+    def enqueue(self, job_id: str) -> None:
+        self.r.lpush(QUEUE_KEY, job_id)
+
+    def enqueue_retry(self, job_id: str, attempt: int, base_delay: float = 2.0, max_delay: float = 300.0) -> float:
+        delay = min(max_delay, base_delay * (2 ** max(attempt - 1, 0))) * random.uniform(0.5, 1.0)
+        self.r.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+        return delay
+
+    def promote_due(self) -> int:
+        """Move retries whose delay has elapsed back onto the main queue."""
+        due: List[str] = self.r.zrangebyscore(DELAYED_KEY, 0, time.time())
+        moved = 0
+        for job_id in due:
+            # zrem is the claim: with several workers only one of them re-queues each id
+            if self.r.zrem(DELAYED_KEY, job_id):
+                self.r.lpush(QUEUE_KEY, job_id)
+                moved += 1
+        return moved
+
+    def reserve(self, worker_id: str, timeout: float = 5.0) -> str | None:
+        return self.r.blmove(QUEUE_KEY, _processing_key(worker_id), timeout, "RIGHT", "LEFT")
+
+    def ack(self, worker_id: str, job_id: str) -> None:
+        self.r.lrem(_processing_key(worker_id), 1, job_id)
+
+    def register(self, worker_id: str, ttl: int) -> None:
+        """Start ``worker_id``'s heartbeat. Raises ``WorkerIdInUse`` if a live worker already has it."""
+        if not self.r.set(_heartbeat_key(worker_id), "1", nx=True, ex=ttl):
+            raise WorkerIdInUse(f"ingest worker id {worker_id!r} is held by a live worker")
+        self.r.sadd(WORKERS_KEY, worker_id)
+
+    def heartbeat(self, worker_id: str, ttl: int) -> None:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.set(_heartbeat_key(worker_id), "1", ex=ttl)
+        pipe.sadd(WORKERS_KEY, worker_id)  # in case a recovery raced a restart under the same id
+        pipe.execute()
+
+    def unregister(self, worker_id: str) -> None:
+        """Stop the heartbeat after a clean shutdown (nothing is left in flight)."""
+        self.r.delete(_heartbeat_key(worker_id))
+        self.r.srem(WORKERS_KEY, worker_id)
+
+    def recover(self) -> int:
+        """Re-queue the in-flight jobs of every worker whose heartbeat has expired."""
+        moved = 0
+        for worker_id in self.r.smembers(WORKERS_KEY):
+            if self.r.exists(_heartbeat_key(worker_id)):
+                continue
+            # lmove is atomic per item, so workers recovering the same list concurrently never
+            # re-queue one job twice
+            while self.r.lmove(_processing_key(worker_id), QUEUE_KEY, "RIGHT", "LEFT"):
+                moved += 1
+            self.r.srem(WORKERS_KEY, worker_id)
+        return moved
+
+    def depth(self) -> int:
+        return int(self.r.llen(QUEUE_KEY))
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> JobQueue:
+    return JobQueue(clients.redis)
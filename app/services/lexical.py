@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.session import engine
+from app.models.db_models import Chunk, Document
+from app.services.semantic_cache import get_namespace_version
+
+settings = get_settings()
+
+DEFAULT_NAMESPACE = "__default__"
+
+# words, plus identifiers that keep their inner punctuation (SKU-4821, v2.3.1, ERR_TIMEOUT, a/b)
+_TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)+|\w+", re.UNICODE)
+_PART_RE = re.compile(r"[-./:]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or so that the "
+    "their then there these they this to was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for m in _TOKEN_RE.finditer(text.lower()):
+        tok = m.group()
+        if tok in _STOPWORDS:
+            continue
+        out.append(tok)
+        parts = _PART_RE.split(tok)
+        if len(parts) > 1:
+            # also index the parts so "4821" finds "SKU-4821"
+            out.extend(p for p in parts if p and p not in _STOPWORDS)
+    return out
+
+
+class BM25Index:
+    """Incrementally maintained in-memory inverted index scored with Okapi BM25.
+
+    Postings are compact int32 arrays per term. Removal only clears the slot's live flag (document
+    frequencies are counted over live slots at query time); ``compact`` drops dead postings once
+    they outnumber live ones.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.keys: List[int] = []
+        self.slot_of: Dict[int, int] = {}
+        self.lengths = array("i")
+        self.alive = np.zeros(0, dtype=bool)
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+    def add(self, key: int, text: str) -> None:
+        if key in self.slot_of:
+            self.remove(key)
+        slot = len(self.keys)
+        tokens = tokenize(text)
+        tf: Dict[str, int] = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, n in tf.items():
+            post = self.postings.get(t)
+            if post is None:
+                post = self.postings[t] = (array("i"), array("i"))
+            post[0].append(slot)
+            post[1].append(n)
+        self.keys.append(key)
+        self.slot_of[key] = slot
+        self.lengths.append(len(tokens))
+        self.total_len += len(tokens)
+        if slot >= len(self.alive):
+            alive = np.zeros(max(1024, 2 * len(self.alive)), dtype=bool)
+            alive[: len(self.alive)] = self.alive
+            self.alive = alive
+        self.alive[slot] = True
+
+    def remove(self, key: int) -> None:
+        slot = self.slot_of.pop(key, None)
+        if slot is None:
+            return
+        self.alive[slot] = False
+        self.total_len -= self.lengths[slot]
+        if len(self.keys) - len(self.slot_of) > max(1024, len(self.slot_of)):
+            self.compact()
+
+    def compact(self) -> None:
+        live = [(self.keys[s], s) for s in range(len(self.keys)) if self.alive[s]]
+        remap = np.full(len(self.keys), -1, dtype=np.int64)
+        for new, (_, old) in enumerate(live):
+            remap[old] = new
+        postings: Dict[str, Tuple[array, array]] = {}
+        for t, (slots, tfs) in self.postings.items():
+            s = remap[np.frombuffer(slots, dtype=np.int32)]
+            keep = s >= 0
+            if keep.any():
+                postings[t] = (array("i", s[keep].astype(np.int32).tobytes()),
+                               array("i", np.frombuffer(tfs, dtype=np.int32)[keep].tobytes()))
+        self.postings = postings
+        self.lengths = array("i", (self.lengths[old] for _, old in live))
+        self.keys = [k for k, _ in live]
+        self.slot_of = {k: i for i, k in enumerate(self.keys)}
+        self.alive = np.zeros(max(1024, len(self.keys)), dtype=bool)
+        self.alive[: len(self.keys)] = True
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        n_live = len(self.slot_of)
+        if not n_live:
+            return []
+        n = len(self.keys)
+        alive = self.alive[:n]
+        lengths = np.frombuffer(self.lengths, dtype=np.int32)
+        avgdl = self.total_len / n_live or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+        for t in set(tokenize(query)):
+            post = self.postings.get(t)
+            if post is None:
+                continue
+            slots = np.frombuffer(post[0], dtype=np.int32)
+            live = alive[slots]
+            df = int(live.sum())
+            if not df:
+                continue
+            slots = slots[live]
+            tf = np.frombuffer(post[1], dtype=np.int32)[live].astype(np.float32)
+            idf = math.log(1.0 + (n_live - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[slots] / avgdl)
+            scores[slots] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[i], float(scores[i])) for i in top]
+
+
+class _Namespace:
+    def __init__(self) -> None:
+        self.index = BM25Index()
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.version: int | None = None
+        self.checked_at = 0.0
+
+
+def _in_namespace(stmt, namespace: str):
+    # chat defaults to "__default__" while ingestion stores the default namespace as NULL
+    if namespace == DEFAULT_NAMESPACE:
+        return stmt.where((Document.namespace == None) | (Document.namespace == namespace))  # noqa: E711
+    return stmt.where(Document.namespace == namespace)
+
+
+class LexicalRetriever:
+    """BM25 over ``Chunk.text``, one in-memory index per namespace, kept in sync with the DB.
+
+    Ingestion bumps the namespace version in Redis; a search that sees a new version (or finds the
+    index older than LEXICAL_REFRESH_INTERVAL) loads chunks added since the last refresh and drops
+    chunks that no longer exist. Results have the same shape as vector matches and use the chunk's
+    vector id, so both lists can be fused.
+    """
+
+    def __init__(self, refresh_interval: float | None = None) -> None:
+        self.refresh_interval = settings.lexical_refresh_interval if refresh_interval is None else refresh_interval
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _ns(self, namespace: str) -> _Namespace:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = self._namespaces[namespace] = _Namespace()
+            return ns
+
+    def refresh(self, namespace: str, force: bool = False) -> None:
+        ns = self._ns(namespace)
+        with ns.lock:
+            try:
+                version = get_namespace_version(namespace)
+            except Exception:
+                version = None  # Redis down: fall back to the refresh interval
+            first = ns.checked_at == 0.0
+            changed = version is not None and version != ns.version
+            stale = time.monotonic() - ns.checked_at > self.refresh_interval
+            if not (force or first or changed or stale):
+                return
+            t0 = time.perf_counter()
+            with Session(engine) as session:
+                stmt = _in_namespace(
+                    select(Chunk.id, Chunk.text).join(Document, Chunk.document_id == Document.id), namespace
+                ).where(Chunk.id > ns.last_id).order_by(Chunk.id)
+                added = 0
+                for cid, text in session.exec(stmt.execution_options(yield_per=2000)):
+                    ns.index.add(cid, text)
+                    ns.last_id = max(ns.last_id, cid)
+                    added += 1
+                removed = 0
+                if not first:
+                    live = set(session.exec(
+                        _in_namespace(select(Chunk.id).join(Document, Chunk.document_id == Document.id), namespace)
+                    ).all())
+                    for cid in [k for k in ns.index.slot_of if k not in live]:
+                        ns.index.remove(cid)
+                        removed += 1
+            if version is not None:
+                ns.version = version
+            ns.checked_at = time.monotonic()
+            if added or removed:
+                logger.debug(
+                    f"lexical index {namespace}: +{added} -{removed} -> {len(ns.index)} chunks "
+                    f"in {(time.perf_counter() - t0) * 1000:.1f}ms"
+                )
+
+    def search(self, query: str, top_k: int = 5, namespace: str | None = None) -> List[Dict[str, Any]]:
+        key = namespace or DEFAULT_NAMESPACE
+        self.refresh(key)
+        ns = self._ns(key)
+        with ns.lock:
+            hits = ns.index.search(query, top_k)
+        return self._hydrate(hits)
+
+    def _hydrate(self, hits: Iterable[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        hits = list(hits)
+        if not hits:
+            return []
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Chunk, Document.filename)
+                .join(Document, Chunk.document_id == Document.id)
+                .where(Chunk.id.in_([cid for cid, _ in hits]))
+            ).all()
+        by_id = {c.id: (c, filename) for c, filename in rows}
+        out: List[Dict[str, Any]] = []
+        for cid, score in hits:
+            if cid not in by_id:
+                continue  # deleted since the last refresh
+            c, filename = by_id[cid]
+            out.append({
+                "id": c.vector_id or f"chunk:{c.id}",
+                "score": score,
+                "metadata": {
+                    "document_id": c.document_id,
+                    "filename": filename,
+                    "chunk_index": c.chunk_index,
+                    "page_start": c.page_start,
+                    "page_end": c.page_end,
+                    "start_char": c.start_char,
+                    "end_char": c.end_char,
+                    "text": c.text,
+                },
+            })
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {k: {"chunks": len(ns.index), "terms": len(ns.index.postings), "version": ns.version}
+                for k, ns in list(self._namespaces.items())}
+
+
+lexical_retriever = LexicalRetriever()
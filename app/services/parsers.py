@@ -1,19 +1,122 @@
 from __future__ import annotations
 
-from typing import BinaryIO
-from pypdf import PdfReader
+import codecs
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Tuple
 
-def read_txt(file_obj: BinaryIO) -> str:
-    file_obj.seek(0)
-    return file_obj.read().decode("utf-8", errors="ignore")
+from app.core.config import get_settings
 
-def read_pdf(file_obj: BinaryIO) -> str:
+settings = get_settings()
+
+
+@dataclass
+class PageText:
+    page_number: int  # 1-based
+    text: str
+
+
+def iter_txt_pages(file_obj: BinaryIO, block_size: int = 1 << 20) -> Iterator[PageText]:
+    """Decode a text upload incrementally, ``block_size`` bytes at a time.
+
+    Form feeds start a new page; a long page is yielded as several pieces with the same page number.
+    """
     file_obj.seek(0)
-    reader = PdfReader(file_obj)
-    texts = []
-    for page in reader.pages:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    page = 1
+    while True:
+        raw = file_obj.read(block_size)
+        text = decoder.decode(raw, final=not raw)
+        if text:
+            parts = text.split("\f")
+            for i, part in enumerate(parts):
+                if i:
+                    page += 1
+                if part:
+                    yield PageText(page, part)
+        if not raw:
+            break
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    # runs in a worker process; each worker opens its own reader
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    out: List[Tuple[int, str]] = []
+    for i in range(start, end):
         try:
-            texts.append(page.extract_text() or "")
+            out.append((i + 1, reader.pages[i].extract_text() or ""))
         except Exception:
-            continue
-    return "\n".join(texts).strip()
\ No newline at end of file
+            out.append((i + 1, ""))
+    return out
+
+
+def iter_pdf_pages(file_obj: BinaryIO, workers: int | None = None) -> Iterator[PageText]:
+    """Yield extracted page text in page order.
+
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into page ranges and extracted across
+    a process pool; at most two ranges per worker are in flight, so memory stays bounded.
+    """
+    from pypdf import PdfReader  # imported on first PDF, not at app startup
+
+    file_obj.seek(0)
+    reader = PdfReader(file_obj)
+    n = len(reader.pages)
+    workers = workers or settings.pdf_parse_workers or os.cpu_count() or 1
+    if workers <= 1 or n < settings.pdf_parallel_min_pages:
+        for i, page in enumerate(reader.pages):
+            try:
+                yield PageText(i + 1, page.extract_text() or "")
+            except Exception:
+                continue
+        return
+
+    del reader
+    path = getattr(file_obj, "name", None)
+    tmp_path = None
+    if not isinstance(path, str) or not os.path.exists(path):
+        # in-memory/spooled uploads have no path the worker processes can open
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as out:
+            file_obj.seek(0)
+            shutil.copyfileobj(file_obj, out, length=1024 * 1024)
+        path = tmp_path
+
+    span = max(1, min(settings.pdf_pages_per_task, -(-n // workers)))
+    ranges = [(s, min(s + span, n)) for s in range(0, n, span)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            window = 2 * workers
+            futures = [pool.submit(_extract_page_range, path, s, e) for s, e in ranges[:window]]
+            next_range = len(futures)
+            while futures:
+                fut = futures.pop(0)
+                if next_range < len(ranges):
+                    s, e = ranges[next_range]
+                    futures.append(pool.submit(_extract_page_range, path, s, e))
+                    next_range += 1
+                for page_number, text in fut.result():
+                    yield PageText(page_number, text)
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+def iter_pages(file_obj: BinaryIO, filetype: str) -> Iterator[PageText]:
+    return iter_pdf_pages(file_obj) if filetype == "pdf" else iter_txt_pages(file_obj)
+
+
+def read_txt(file_obj: BinaryIO) -> str:
+    parts: List[str] = []
+    page = 1
+    for p in iter_txt_pages(file_obj):
+        parts.append("\f" * (p.page_number - page) + p.text)
+        page = p.page_number
+    return "".join(parts)
+
+def read_pdf(file_obj: BinaryIO) -> str:
+    return "\n".join(p.text for p in iter_pdf_pages(file_obj)).strip()
@@ -1,68 +1,342 @@
 # app/services/pinecone_service.py
 from __future__ import annotations
-from typing import List, Dict, Any, Iterable
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from typing import TYPE_CHECKING, Callable, Deque, List, Dict, Any, Iterable, Sequence, Tuple, TypeVar
 from loguru import logger
-from pinecone import Pinecone
+from app.core.clients import clients
 from app.core.config import get_settings
+from app.core.metrics import BATCH_ITEMS, BATCH_SECONDS, registry
+from app.services.embedding_cache import cache_key, embedding_cache
+
+if TYPE_CHECKING:
+    from pinecone import Pinecone
 
 settings = get_settings()
 
-def _batched(seq: List[str], n: int) -> Iterable[List[str]]:
+T = TypeVar("T")
+
+RETRIES = registry.counter("rag_provider_retries_total", "Pinecone calls retried after 429/5xx/transport errors", ("op",))
+
+def _batched(seq: Sequence[T], n: int) -> Iterable[Sequence[T]]:
     for i in range(0, len(seq), n):
         yield seq[i:i+n]
 
+
+def _status_of(e: Exception) -> int | None:
+    for obj in (e, getattr(e, "response", None)):
+        for attr in ("status", "status_code"):
+            v = getattr(obj, attr, None)
+            if isinstance(v, int):
+                return v
+    return None
+
+
+def _is_retryable(e: Exception) -> bool:
+    status = _status_of(e)
+    if status is not None:
+        return status == 429 or status >= 500
+    # transport-level failures carry no status
+    return isinstance(e, (ConnectionError, TimeoutError)) or "timeout" in type(e).__name__.lower()
+
+
+def _is_too_large(e: Exception) -> bool:
+    status = _status_of(e)
+    msg = str(e).lower()
+    return status == 413 or (status == 400 and any(k in msg for k in ("too large", "exceed", "maximum", "max ")))
+
+
+def _with_backoff(fn: Callable[[], T], what: str) -> T:
+    """Call ``fn``, retrying 429/5xx/transport errors with exponential backoff and full jitter."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            if attempt > settings.pinecone_max_retries or not _is_retryable(e):
+                raise
+            delay = random.uniform(0, min(settings.pinecone_backoff_max, settings.pinecone_backoff_base * 2 ** attempt))
+            RETRIES.labels(what).inc()
+            logger.warning(f"{what} failed with status={_status_of(e)} ({type(e).__name__}); retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+class _AdaptiveBatchSize:
+    def __init__(self, initial: int, grow_after: int = 4) -> None:
+        self.max = initial
+        self.size = initial
+        self.grow_after = grow_after
+        self._streak = 0
+
+    def shrink(self, failed: int) -> None:
+        self.size = max(1, min(self.size, failed // 2))
+        self._streak = 0
+
+    def grow(self) -> None:
+        self._streak += 1
+        if self._streak >= self.grow_after and self.size < self.max:
+            self.size = min(self.max, self.size * 2)
+            self._streak = 0
+
+
+class BatchStats:
+    """Per-batch latency and overall throughput for one embed/upsert call."""
+
+    def __init__(self, op: str) -> None:
+        self.op = op
+        self.started = time.perf_counter()
+        self.batches: List[Tuple[int, float]] = []
+
+    def record(self, size: int, seconds: float) -> None:
+        self.batches.append((size, seconds))  # list.append is atomic under the GIL
+        BATCH_SECONDS.labels(self.op).observe(seconds)
+        BATCH_ITEMS.labels(self.op).inc(size)
+        logger.debug(f"{self.op} batch size={size} latency_ms={seconds * 1000:.1f}")
+
+    def summary(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.started
+        items = sum(n for n, _ in self.batches)
+        lat = sorted(t for _, t in self.batches)
+        return {
+            "items": items,
+            "batches": len(lat),
+            "wall_s": round(wall, 4),
+            "items_per_s": round(items / wall, 1) if wall > 0 else None,
+            "batch_latency_ms_p50": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+            "batch_latency_ms_max": round(lat[-1] * 1000, 1) if lat else None,
+        }
+
+    def log(self) -> None:
+        if len(self.batches) > 1:
+            logger.info(f"{self.op}: {self.summary()}")
+
 class PineconeService:
-    def __init__(self) -> None:
-        self.pc = Pinecone(api_key=settings.pinecone_api_key)
-        self.index = self.pc.Index(settings.pinecone_index_name)
+    """Embedding and index operations with batching, bounded concurrency and retries.
+
+    Cheap to construct: unless a client is passed in, every instance uses the shared, pooled
+    client from ``app.core.clients``; only the ``last_*_stats`` are per instance.
+    """
+
+    def __init__(self, client: Pinecone | None = None) -> None:
+        self._client = client
+        self._index = None
         self.model = getattr(settings, "pinecone_embedding_model", None)
+        self.last_embed_stats: Dict[str, Any] | None = None
+        self.last_upsert_stats: Dict[str, Any] | None = None
         if not self.model:
             logger.warning("PINECONE_EMBEDDING_MODEL not set; set it in .env")
 
+    @property
+    def pc(self) -> Pinecone:
+        return self._client or clients.pinecone
+
+    @property
+    def index(self):
+        # opened on first use: embedding-only callers (local vector store) never touch the index
+        if self._client is None:
+            return clients.pinecone_index
+        if self._index is None:
+            self._index = self._client.Index(name=settings.pinecone_index_name, host=settings.pinecone_host or "")
+        return self._index
+
     def embed_texts(
         self,
         texts: List[str],
         batch_size: int = 96,
         input_type: str = "passage",   # <- REQUIRED for llama-text-embed-v2
         truncate: str = "END",         # optional, prevents token-length rejections
+        on_progress: Callable[[int], None] | None = None,  # called with the number of texts just embedded
     ) -> List[List[float]]:
         if not self.model:
             raise RuntimeError("PINECONE_EMBEDDING_MODEL is required for inference embedding.")
+        self.last_embed_stats = None
+        if embedding_cache is None:
+            return self._embed_uncached(texts, batch_size, input_type, truncate, on_progress)
+
+        keys = [cache_key(self.model, input_type, truncate, t) for t in texts]
+        vectors = embedding_cache.get_many(keys)
+
+        # embed each distinct missing text once, even if it repeats within this call
+        pending: Dict[str, List[int]] = {}
+        for i, (k, v) in enumerate(zip(keys, vectors)):
+            if v is None:
+                pending.setdefault(k, []).append(i)
+        if on_progress:
+            on_progress(len(texts) - sum(len(v) for v in pending.values()))
+        if pending:
+            miss_keys = list(pending)
+            miss_texts = [texts[pending[k][0]] for k in miss_keys]
+            fresh = self._embed_uncached(miss_texts, batch_size, input_type, truncate, on_progress)
+            embedding_cache.set_many(miss_keys, fresh)
+            for k, vec in zip(miss_keys, fresh):
+                for i in pending[k]:
+                    vectors[i] = vec
+            if on_progress:
+                on_progress(sum(len(v) for v in pending.values()) - len(miss_keys))  # in-call duplicates
+        return vectors  # type: ignore[return-value]
+
+    def _embed_batch(self, batch: List[str], input_type: str, truncate: str) -> List[List[float]]:
+        res = self.pc.inference.embed(
+            model=self.model,
+            inputs=batch,
+            parameters={
+                "input_type": input_type,   # "passage" for docs, "query" for queries
+                "truncate": truncate,
+            },
+        )
 
-        all_vectors: List[List[float]] = []
-        for batch in _batched(texts, batch_size):
-            res = self.pc.inference.embed(
-                model=self.model,
-                inputs=batch,
-                parameters={
-                    "input_type": input_type,   # "passage" for docs, "query" for queries
-                    "truncate": truncate,
-                },
-            )
-
-            # normalize response shape
-            if hasattr(res, "data"):
-                data = res.data
-            elif isinstance(res, dict) and "data" in res:
-                data = res["data"]
+        # normalize response shape
+        if hasattr(res, "data"):
+            data = res.data
+        elif isinstance(res, dict) and "data" in res:
+            data = res["data"]
+        else:
+            data = res
+
+        vectors: List[List[float]] = []
+        for item in data:
+            if isinstance(item, dict) and "values" in item:
+                vectors.append(item["values"])
+            elif hasattr(item, "values"):
+                vectors.append(item.values)
             else:
-                data = res
+                vectors.append(item)
+        if len(vectors) != len(batch):
+            raise RuntimeError(f"Embedding count mismatch: got {len(vectors)} for a batch of {len(batch)}")
+        return vectors
+
+    def _embed_uncached(
+        self,
+        texts: List[str],
+        batch_size: int,
+        input_type: str,
+        truncate: str,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> List[List[float]]:
+        """Embed ``texts`` with up to ``embed_concurrency`` batches in flight.
 
-            for item in data:
-                if isinstance(item, dict) and "values" in item:
-                    all_vectors.append(item["values"])
-                elif hasattr(item, "values"):
-                    all_vectors.append(item.values)
-                else:
-                    all_vectors.append(item)
+        Results are written by input offset, so output order always matches input order. A batch
+        rejected as too large is split in half and re-queued, and the batch size for the rest of
+        the call shrinks with it; it grows back after a run of successes.
+        """
+        stats = BatchStats("embed")
+        if len(texts) <= batch_size:
+            # single batch (e.g. a query): no pool, no thread hop
+            t0 = time.perf_counter()
+            vecs = _with_backoff(lambda: self._embed_batch(texts, input_type, truncate), "embed") if texts else []
+            stats.record(len(texts), time.perf_counter() - t0)
+            self.last_embed_stats = stats.summary()
+            if on_progress:
+                on_progress(len(texts))
+            return vecs
 
-        if len(all_vectors) != len(texts):
-            raise RuntimeError(f"Embedding count mismatch: got {len(all_vectors)} for {len(texts)} inputs")
-        return all_vectors
+        results: List[List[float] | None] = [None] * len(texts)
+        sizer = _AdaptiveBatchSize(batch_size)
+        pending: Deque[Tuple[int, int]] = deque()  # (offset, length) ranges to (re)submit
+        pos = 0
+
+        def run(start: int, n: int) -> List[List[float]]:
+            t0 = time.perf_counter()
+            vecs = _with_backoff(lambda: self._embed_batch(texts[start:start + n], input_type, truncate), "embed")
+            stats.record(n, time.perf_counter() - t0)
+            return vecs
+
+        with ThreadPoolExecutor(max_workers=max(1, settings.pinecone_embed_concurrency)) as pool:
+            in_flight: Dict[Future, Tuple[int, int]] = {}
+            while pos < len(texts) or pending or in_flight:
+                while len(in_flight) < settings.pinecone_embed_concurrency and (pending or pos < len(texts)):
+                    if pending:
+                        start, n = pending.popleft()
+                    else:
+                        start, n = pos, min(sizer.size, len(texts) - pos)
+                        pos += n
+                    in_flight[pool.submit(run, start, n)] = (start, n)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    start, n = in_flight.pop(fut)
+                    try:
+                        vecs = fut.result()
+                    except Exception as e:
+                        if n > 1 and _is_too_large(e):
+                            sizer.shrink(n)
+                            half = n // 2
+                            pending.extend([(start, half), (start + half, n - half)])
+                            logger.warning(f"embed batch of {n} rejected as too large; retrying as {half}+{n - half}")
+                            continue
+                        for other in in_flight:
+                            other.cancel()
+                        raise
+                    sizer.grow()
+                    results[start:start + n] = vecs
+                    if on_progress:
+                        on_progress(n)
+
+        stats.log()
+        self.last_embed_stats = stats.summary()
+        if any(v is None for v in results):
+            raise RuntimeError(f"Embedding count mismatch: got {sum(v is not None for v in results)} for {len(texts)} inputs")
+        return results  # type: ignore[return-value]
 
     def embed_query(self, query: str) -> List[float]:
         # convenience helper for queries
         return self.embed_texts([query], input_type="query")[0]
 
-    def upsert(self, items: List[Dict[str, Any]], namespace: str | None = None) -> None:
-        self.index.upsert(vectors=items, namespace=namespace)
+    def upsert(
+        self,
+        items: List[Dict[str, Any]],
+        namespace: str | None = None,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> None:
+        """Upsert in chunks of ``batch_size`` vectors with bounded parallelism and retry on 429/5xx."""
+        batch_size = batch_size or settings.pinecone_upsert_batch_size
+        concurrency = concurrency or settings.pinecone_upsert_concurrency
+        stats = BatchStats("upsert")
+
+        def run(batch: List[Dict[str, Any]]) -> int:
+            t0 = time.perf_counter()
+            _with_backoff(lambda: self.index.upsert(vectors=batch, namespace=namespace), "upsert")
+            stats.record(len(batch), time.perf_counter() - t0)
+            return len(batch)
+
+        batches = list(_batched(items, batch_size))
+        if len(batches) <= 1 or concurrency <= 1:
+            for batch in batches:
+                n = run(batch)
+                if on_progress:
+                    on_progress(n)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                futures = [pool.submit(run, b) for b in batches]
+                try:
+                    for fut in as_completed(futures):
+                        n = fut.result()
+                        if on_progress:
+                            on_progress(n)
+                except Exception:
+                    for fut in futures:
+                        fut.cancel()
+                    raise
+        stats.log()
+        self.last_upsert_stats = stats.summary()
+
+    def delete(self, ids: List[str], namespace: str | None = None, batch_size: int = 1000) -> None:
+        for batch in _batched(ids, batch_size):
+            _with_backoff(lambda: self.index.delete(ids=list(batch), namespace=namespace), "delete")
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: str | None = None) -> None:
+        """Merge ``set_metadata`` into existing vectors (one request per id, run concurrently)."""
+        if not updates:
+            return
+
+        def run(item: Tuple[str, Dict[str, Any]]) -> None:
+            vid, md = item
+            _with_backoff(lambda: self.index.update(id=vid, set_metadata=md, namespace=namespace), "update")
+
+        with ThreadPoolExecutor(max_workers=max(1, settings.pinecone_upsert_concurrency)) as pool:
+            list(pool.map(run, updates.items()))
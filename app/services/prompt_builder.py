@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.services.tokenizer import Tokenizer, get_tokenizer
+
+settings = get_settings()
+
+# chat formats add a few tokens per message for role/separators
+MESSAGE_OVERHEAD = 4
+
+
+def count_message_tokens(messages: Sequence[Dict[str, str]], tokenizer: Tokenizer | None = None) -> int:
+    tok = tokenizer or get_tokenizer()
+    return sum(tok.count(m.get("content") or "") + MESSAGE_OVERHEAD for m in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, tokenizer: Tokenizer | None = None) -> str:
+    starts = (tokenizer or get_tokenizer()).starts(text)
+    if len(starts) <= max_tokens:
+        return text
+    return text[: starts[max_tokens]].rstrip() + " …"
+
+
+@dataclass
+class PromptReport:
+    prompt_tokens: int = 0
+    history_tokens: int = 0
+    history_messages: int = 0
+    history_dropped: int = 0
+    summary_tokens: int = 0
+    context_tokens: int = 0
+    context_chunks: int = 0
+    chunks_trimmed: int = 0
+    chunks_dropped: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PromptBuilder:
+    """Assembles a chat prompt that fits a token budget, counting tokens locally.
+
+    Fixed parts (system prompt, booking info, question) are always kept. History gets at most
+    ``history_budget`` tokens: the rolling summary first, then the newest raw messages that fit.
+    Context chunks fill what is left in retrieval order (best first); duplicates are skipped, the
+    first chunk that does not fit is cut to the remaining budget if at least ``min_chunk_tokens``
+    remain, and lower-ranked chunks are dropped.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        budget: int | None = None,
+        history_budget: int | None = None,
+        min_chunk_tokens: int | None = None,
+        tokenizer: Tokenizer | None = None,
+    ) -> None:
+        self.system_prompt = system_prompt
+        self.budget = budget or settings.prompt_token_budget
+        self.history_budget = settings.prompt_history_token_budget if history_budget is None else history_budget
+        self.min_chunk_tokens = settings.prompt_min_chunk_tokens if min_chunk_tokens is None else min_chunk_tokens
+        self.tok = tokenizer or get_tokenizer()
+
+    def _count(self, text: str) -> int:
+        return self.tok.count(text) + MESSAGE_OVERHEAD
+
+    def build(
+        self,
+        question: str,
+        history: Sequence[Dict[str, str]],
+        docs: Sequence[Dict[str, Any]],
+        last_booking: Dict[str, Any] | None = None,
+        summary: str | None = None,
+    ) -> Tuple[List[Dict[str, str]], PromptReport]:
+        report = PromptReport()
+        system = {"role": "system", "content": self.system_prompt}
+        user = {"role": "user", "content": question}
+        booking_line = ""
+        if last_booking:
+            booking_line = (
+                "SessionInfo: last_booking="
+                f"{last_booking.get('name')} {last_booking.get('email')} "
+                f"on {last_booking.get('date')} at {last_booking.get('time')}"
+            )
+        used = self._count(system["content"]) + self._count(question)
+        if booking_line:
+            used += self.tok.count(booking_line)
+
+        # --- history: summary, then newest messages first --------------------
+        history_msgs: List[Dict[str, str]] = []
+        history_left = min(self.history_budget, max(self.budget - used, 0))
+        if summary:
+            summary_msg = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+            cost = self._count(summary_msg["content"])
+            if cost <= history_left:
+                history_msgs.append(summary_msg)
+                history_left -= cost
+                report.summary_tokens = cost
+        recent: List[Dict[str, str]] = []
+        for m in reversed(history):
+            cost = self._count(m.get("content") or "")
+            if cost > history_left:
+                break
+            recent.append({"role": m["role"], "content": m.get("content") or ""})
+            history_left -= cost
+        recent.reverse()
+        history_msgs.extend(recent)
+        report.history_messages = len(recent)
+        report.history_dropped = len(history) - len(recent)
+        report.history_tokens = sum(self._count(m["content"]) for m in history_msgs)
+        used += report.history_tokens
+
+        # --- context: best-ranked chunks until the budget is spent ------------
+        context_left = self.budget - used - MESSAGE_OVERHEAD - (self.tok.count("Context:") + 1)
+        parts: List[str] = [booking_line] if booking_line else []
+        seen: set[str] = set()
+        for i, d in enumerate(docs):
+            meta = d.get("metadata", {})
+            text = (meta.get("text") or "").strip()
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            header = f"[{report.context_chunks}] file={meta.get('filename')} chunk={meta.get('chunk_index')}\n"
+            cost = self.tok.count(header) + self.tok.count(text) + 2  # blank line between chunks
+            if cost > context_left:
+                room = context_left - self.tok.count(header) - 2
+                if room >= self.min_chunk_tokens:
+                    text = truncate_to_tokens(text, room, self.tok)
+                    cost = self.tok.count(header) + self.tok.count(text) + 2
+                    report.chunks_trimmed += 1
+                else:
+                    report.chunks_dropped += len(docs) - i
+                    break
+            parts.append(header + text)
+            context_left -= cost
+            report.context_chunks += 1
+            report.context_tokens += cost
+
+        messages: List[Dict[str, str]] = [system, *history_msgs]
+        if parts:
+            messages.append({"role": "system", "content": "Context:\n" + "\n\n".join(parts)})
+        messages.append(user)
+        report.prompt_tokens = count_message_tokens(messages, self.tok)
+        return messages, report
@@ -1,11 +1,15 @@
 from __future__ import annotations
+from dataclasses import dataclass
 from typing import List, Dict, Any
 import json
-import redis
+from app.core.clients import clients
 from app.core.config import get_settings
+from app.core.metrics import timed
 
 settings = get_settings()
-r = redis.from_url(settings.redis_url, decode_responses=True)
+# shared pooled clients; they outlive a lifespan shutdown (the pools reconnect on demand)
+r = clients.redis
+ar = clients.aredis
 
 def _key(session_id: str) -> str:
     return f"chat:{session_id}:messages"
@@ -13,6 +17,15 @@ def _key(session_id: str) -> str:
 def _booking_key(session_id: str) -> str:
     return f"chat:{session_id}:booking:last"
 
+def _turns_key(session_id: str) -> str:
+    return f"chat:{session_id}:turns"
+
+def _summary_key(session_id: str) -> str:
+    return f"chat:{session_id}:summary"
+
+def _draft_key(session_id: str) -> str:
+    return f"chat:{session_id}:booking:draft"
+
 def set_last_booking(session_id: str, data: dict) -> None:
     r.set(_booking_key(session_id), json.dumps(data))
 
@@ -20,8 +33,11 @@ def get_last_booking(session_id: str) -> dict | None:
     raw = r.get(_booking_key(session_id))
     return json.loads(raw) if raw else None
 
+def _record(role: str, content: str) -> str:
+    return json.dumps({"role": role, "content": content})
+
 def add_message(session_id: str, role: str, content: str, max_messages: int = 20) -> None:
-    record = json.dumps({"role": role, "content": content})
+    record = _record(role, content)
     r.rpush(_key(session_id), record)
     r.ltrim(_key(session_id), -max_messages, -1)
 
@@ -29,5 +45,94 @@ def get_messages(session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
     items = r.lrange(_key(session_id), -limit, -1)
     return [json.loads(i) for i in items]
 
+def add_turn(session_id: str, user: str, assistant: str, max_messages: int = 20) -> int:
+    """Append a user/assistant pair and trim, in one round-trip. Returns the session's turn count."""
+    pipe = r.pipeline()
+    pipe.rpush(_key(session_id), _record("user", user), _record("assistant", assistant))
+    pipe.ltrim(_key(session_id), -max_messages, -1)
+    pipe.incr(_turns_key(session_id))
+    return int(pipe.execute()[-1])
+
 def clear_session(session_id: str) -> None:
-    r.delete(_key(session_id))
+    r.delete(_key(session_id), _turns_key(session_id), _summary_key(session_id), _draft_key(session_id))
+
+# --- asyncio variants used by the async chat pipeline ---
+
+async def aset_last_booking(session_id: str, data: dict) -> None:
+    await ar.set(_booking_key(session_id), json.dumps(data))
+
+async def aget_last_booking(session_id: str) -> dict | None:
+    raw = await ar.get(_booking_key(session_id))
+    return json.loads(raw) if raw else None
+
+async def aset_booking_draft(session_id: str, draft: dict) -> None:
+    """Partial booking of a session; abandoned drafts expire after BOOKING_DRAFT_TTL."""
+    await ar.set(_draft_key(session_id), json.dumps(draft), ex=settings.booking_draft_ttl)
+
+async def aclear_booking_draft(session_id: str) -> None:
+    await ar.delete(_draft_key(session_id))
+
+async def acommit_booking(session_id: str, booking: dict) -> None:
+    """Record a confirmed booking and drop the session's draft in one round-trip."""
+    pipe = ar.pipeline()
+    pipe.set(_booking_key(session_id), json.dumps(booking))
+    pipe.delete(_draft_key(session_id))
+    await pipe.execute()
+
+async def aadd_message(session_id: str, role: str, content: str, max_messages: int = 20) -> None:
+    record = _record(role, content)
+    await ar.rpush(_key(session_id), record)
+    await ar.ltrim(_key(session_id), -max_messages, -1)
+
+async def aget_messages(session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    items = await ar.lrange(_key(session_id), -limit, -1)
+    return [json.loads(i) for i in items]
+
+@timed("memory_write")
+async def aadd_turn(session_id: str, user: str, assistant: str, max_messages: int = 20) -> int:
+    pipe = ar.pipeline()
+    pipe.rpush(_key(session_id), _record("user", user), _record("assistant", assistant))
+    pipe.ltrim(_key(session_id), -max_messages, -1)
+    pipe.incr(_turns_key(session_id))
+    return int((await pipe.execute())[-1])
+
+
+@dataclass
+class ChatContext:
+    messages: List[Dict[str, Any]]
+    last_booking: dict | None = None
+    booking_draft: dict | None = None  # partial booking being collected (see booking_flow)
+    summary: str | None = None
+    summary_turns: int = 0  # turns folded into the summary
+    turns: int = 0          # turns recorded for the session
+
+    def unsummarized(self) -> List[Dict[str, Any]]:
+        """Messages newer than the summary (the list holds whole user/assistant pairs)."""
+        if not self.summary:
+            return self.messages
+        n = max(self.turns - self.summary_turns, 0)
+        return self.messages[-2 * n:] if n else []
+
+
+@timed("memory_read")
+async def aget_context(session_id: str, limit: int = 20) -> ChatContext:
+    """History, last booking, booking draft and rolling summary for a session in one round-trip."""
+    pipe = ar.pipeline(transaction=False)
+    pipe.lrange(_key(session_id), -limit, -1)
+    pipe.get(_booking_key(session_id))
+    pipe.get(_draft_key(session_id))
+    pipe.get(_summary_key(session_id))
+    pipe.get(_turns_key(session_id))
+    items, raw_booking, raw_draft, raw_summary, turns = await pipe.execute()
+    summary = json.loads(raw_summary) if raw_summary else {}
+    return ChatContext(
+        messages=[json.loads(i) for i in items],
+        last_booking=json.loads(raw_booking) if raw_booking else None,
+        booking_draft=json.loads(raw_draft) if raw_draft else None,
+        summary=summary.get("text"),
+        summary_turns=int(summary.get("turns", 0)),
+        turns=int(turns or 0),
+    )
+
+async def aset_summary(session_id: str, text: str, turns: int) -> None:
+    await ar.set(_summary_key(session_id), json.dumps({"text": text, "turns": turns}))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import uuid
+from typing import Dict, List
+
+from loguru import logger
+from sqlmodel import Session, select
+
+from app.models.db_models import Chunk, Document
+from app.services import vector_codec
+from app.services.chunking import TextChunk
+from app.services.ingestion_pipeline import vector_metadata
+from app.services.semantic_cache import bump_namespace_version
+from app.services.vector_store import VectorStore, get_vector_store
+
+
+def rebuild_vectors(
+    session: Session,
+    namespace: str | None = None,
+    store: VectorStore | None = None,
+    batch_size: int = 500,
+) -> Dict[str, int]:
+    """Upsert every chunk of ``namespace`` into ``store`` from the embeddings kept in Postgres.
+
+    No inference calls are made, so an index can be rebuilt or moved to another backend for free.
+    Chunks stored without an embedding are counted as ``missing`` (re-upload their documents).
+    """
+    store = store or get_vector_store()
+    ns_filter = Document.namespace == None if namespace is None else Document.namespace == namespace  # noqa: E711
+    stmt = (
+        select(Chunk, Document.filename)
+        .join(Document, Chunk.document_id == Document.id)
+        .where(ns_filter)
+        .order_by(Chunk.id)
+    )
+    upserted = missing = 0
+    items: List[Dict] = []
+
+    def flush() -> None:
+        nonlocal upserted
+        if items:
+            store.upsert(items, namespace=namespace)
+            upserted += len(items)
+            items.clear()
+
+    for row, filename in session.exec(stmt.execution_options(yield_per=batch_size)):
+        if row.embedding is None:
+            missing += 1
+            continue
+        if row.vector_id is None:
+            row.vector_id = str(uuid.uuid4())  # legacy row; committed once the scan is done
+        piece = TextChunk(row.text, row.start_char, row.end_char, row.page_start, row.page_end)
+        items.append({
+            "id": row.vector_id,
+            "values": vector_codec.decode(row.embedding).tolist(),
+            "metadata": vector_metadata(row.document_id, filename, row.chunk_index, piece),
+        })
+        if len(items) >= batch_size:
+            flush()
+    flush()
+    session.commit()
+    if upserted:
+        bump_namespace_version(namespace or "__default__")
+    logger.info(f"rebuilt namespace {namespace}: upserted={upserted} missing_embeddings={missing}")
+    return {"upserted": upserted, "missing": missing}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.db.session import engine
+    from app.services.vector_store import LocalVectorStore, PineconeVectorStore
+
+    parser = argparse.ArgumentParser(description="Rebuild a vector index from embeddings stored in Postgres")
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--store", choices=["configured", "local", "pinecone"], default="configured")
+    args = parser.parse_args()
+    target = {"local": LocalVectorStore, "pinecone": PineconeVectorStore}.get(args.store, get_vector_store)()
+    with Session(engine) as session:
+        print(rebuild_vectors(session, args.namespace, target))
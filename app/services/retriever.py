@@ -1,24 +1,206 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Dict, Any, Sequence, Tuple
+from app.core.config import get_settings
+from app.core.metrics import stage, timed
+from app.services.chunk_text import chunk_text_store
+from app.services.lexical import lexical_retriever
 from app.services.pinecone_service import PineconeService
+from app.services.vector_store import get_vector_store
 
-pc = PineconeService()
+settings = get_settings()
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+@lru_cache(maxsize=1)
+def _embedder() -> PineconeService:
+    # embeddings (Pinecone inference); built with the first query rather than at import, as is the
+    # vector store (get_vector_store: Pinecone index or the local memory-mapped store)
+    return PineconeService()
+
+
+def _vector_search(
+    query: str, top_k: int = 5, namespace: str | None = None, emb: List[float] | None = None
+) -> Tuple[List[float], List[Dict[str, Any]]]:
+    # matches carry slim metadata; chunk text is attached afterwards, only for the docs that are kept
+    if emb is None:
+        with stage("embed"):
+            emb = _embedder().embed_texts([query], input_type="query")[0]
+    with stage("vector_query"):
+        docs = get_vector_store().query(emb, top_k=top_k, namespace=namespace, include_metadata=True)
+    return emb, docs
+
+def _lexical_search(query: str, top_k: int = 5, namespace: str | None = None) -> List[Dict[str, Any]]:
+    with stage("lexical"):
+        return lexical_retriever.search(query, top_k, namespace)
+
+def _hydrate(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with stage("hydrate"):
+        return chunk_text_store.hydrate(docs)
+
+def retrieve_with_vector(
+    query: str, top_k: int = 5, namespace: str | None = None
+) -> Tuple[List[float], List[Dict[str, Any]]]:
+    emb, docs = _vector_search(query, top_k, namespace)
+    return emb, _hydrate(docs)
 
 def retrieve(query: str, top_k: int = 5, namespace: str | None = None) -> List[Dict[str, Any]]:
-    emb = pc.embed_texts([query], input_type="query")[0]
-    res = pc.index.query(
-        vector=emb,
-        top_k=top_k,
-        include_metadata=True,
-        namespace=namespace,
+    return retrieve_with_vector(query, top_k, namespace)[1]
+
+async def aretrieve(query: str, top_k: int = 5, namespace: str | None = None) -> List[Dict[str, Any]]:
+    # Embedding and the vector query are blocking; run them off the event loop so they overlap with LLM calls
+    return await asyncio.to_thread(retrieve, query, top_k, namespace)
+
+async def aretrieve_with_vector(
+    query: str, top_k: int = 5, namespace: str | None = None
+) -> Tuple[List[float], List[Dict[str, Any]]]:
+    return await asyncio.to_thread(retrieve_with_vector, query, top_k, namespace)
+
+
+def reciprocal_rank_fusion(
+    ranked: Dict[str, Sequence[Dict[str, Any]]],
+    weights: Dict[str, float],
+    top_k: int,
+    k: int = 60,
+) -> List[Dict[str, Any]]:
+    """Fuse ranked lists by id: score = sum(weight / (k + rank)) over the lists an id appears in.
+
+    Each fused doc keeps the metadata of the first list that returned it and records its
+    1-based rank per list under ``ranks``.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for name, docs in ranked.items():
+        w = weights.get(name, 1.0)
+        for rank, d in enumerate(docs, start=1):
+            entry = fused.get(d["id"])
+            if entry is None:
+                entry = fused[d["id"]] = {"id": d["id"], "score": 0.0, "metadata": d.get("metadata", {}), "ranks": {}}
+            entry["score"] += w / (k + rank)
+            entry["ranks"][name] = rank
+    return sorted(fused.values(), key=lambda d: d["score"], reverse=True)[:top_k]
+
+
+@dataclass
+class Retrieval:
+    docs: List[Dict[str, Any]]
+    vector: List[float] | None = None  # query embedding; None in lexical mode
+    mode: str = "vector"
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    def info(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "timings_ms": self.timings_ms}
+
+
+def _timed(fn, *args) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, round((time.perf_counter() - t0) * 1000, 2)
+
+
+def _embed_queries(queries: List[str]) -> List[List[float]]:
+    with stage("embed"):
+        return _embedder().embed_texts(queries, input_type="query")
+
+
+@timed("retrieve")
+async def aretrieve_hybrid(
+    query: str,
+    top_k: int = 5,
+    namespace: str | None = None,
+    mode: str | None = None,
+    vector_weight: float | None = None,
+    lexical_weight: float | None = None,
+) -> Retrieval:
+    """Vector, lexical (BM25) or hybrid retrieval; in hybrid mode both paths run concurrently
+    and are fused with reciprocal rank fusion. Per-path latency is reported in ``timings_ms``,
+    including ``hydrate`` (fetching chunk text for the final docs)."""
+    mode = mode or settings.retrieval_mode
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"unknown retrieval mode {mode!r}")
+    return await _aretrieve(query, top_k, namespace, mode, vector_weight, lexical_weight)
+
+
+async def aretrieve_many(
+    queries: List[str],
+    top_k: int = 5,
+    namespace: str | None = None,
+    mode: str | None = None,
+    vector_weight: float | None = None,
+    lexical_weight: float | None = None,
+    concurrency: int | None = None,
+) -> List[Retrieval | Exception]:
+    """``aretrieve_hybrid`` for many queries: one batched embedding call for all of them, then the
+    per-query searches concurrently (at most ``concurrency`` at a time).
+
+    Results are in input order; a query whose retrieval failed gets its exception in place of a
+    ``Retrieval``. If the embedding call itself fails, every query that needed it gets that error.
+    """
+    mode = mode or settings.retrieval_mode
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"unknown retrieval mode {mode!r}")
+    vectors: List[List[float] | None] = [None] * len(queries)
+    embed_ms = 0.0
+    if mode != "lexical" and queries:
+        try:
+            vectors, embed_ms = await asyncio.to_thread(_timed, _embed_queries, list(queries))
+        except Exception as e:
+            return [e] * len(queries)
+
+    sem = asyncio.Semaphore(max(1, concurrency or settings.chat_batch_retrieval_concurrency))
+
+    async def one(query: str, emb: List[float] | None) -> Retrieval:
+        async with sem:
+            result = await _aretrieve(query, top_k, namespace, mode, vector_weight, lexical_weight, emb)
+        if emb is not None:
+            result.timings_ms["embed_batch"] = embed_ms  # shared by the whole batch
+        return result
+
+    return list(await asyncio.gather(*(one(q, v) for q, v in zip(queries, vectors)), return_exceptions=True))
+
+
+async def _aretrieve(
+    query: str,
+    top_k: int,
+    namespace: str | None,
+    mode: str,
+    vector_weight: float | None,
+    lexical_weight: float | None,
+    emb: List[float] | None = None,
+) -> Retrieval:
+    # ``emb`` is a precomputed query embedding; when given, the vector path skips its embed call
+    started = time.perf_counter()
+    if mode == "vector":
+        (vec, docs), ms = await asyncio.to_thread(_timed, _vector_search, query, top_k, namespace, emb)
+        docs, hydrate_ms = await asyncio.to_thread(_timed, _hydrate, docs)
+        timings = {"vector": ms, "hydrate": hydrate_ms, "total": round((time.perf_counter() - started) * 1000, 2)}
+        return Retrieval(docs, vec, mode, timings)
+    if mode == "lexical":
+        docs, ms = await asyncio.to_thread(_timed, _lexical_search, query, top_k, namespace)
+        return Retrieval(docs, None, mode, {"lexical": ms, "total": ms})
+
+    fetch_k = top_k * max(1, settings.hybrid_candidates)
+    (vec_res, vec_ms), (lex_docs, lex_ms) = await asyncio.gather(
+        asyncio.to_thread(_timed, _vector_search, query, fetch_k, namespace, emb),
+        asyncio.to_thread(_timed, _lexical_search, query, fetch_k, namespace),
     )
-    # normalize result items
-    matches = getattr(res, "matches", None) or res.get("matches", [])
-    docs: List[Dict[str, Any]] = []
-    for m in matches:
-        docs.append({
-            "id": getattr(m, "id", None) or m.get("id"),
-            "score": getattr(m, "score", None) or m.get("score"),
-            "metadata": getattr(m, "metadata", None) or m.get("metadata", {}),
-        })
-    return docs
\ No newline at end of file
+    vec, vec_docs = vec_res
+    t0 = time.perf_counter()
+    weights = {
+        "vector": settings.hybrid_vector_weight if vector_weight is None else vector_weight,
+        "lexical": settings.hybrid_lexical_weight if lexical_weight is None else lexical_weight,
+    }
+    docs = reciprocal_rank_fusion({"vector": vec_docs, "lexical": lex_docs}, weights, top_k, settings.hybrid_rrf_k)
+    fusion_ms = round((time.perf_counter() - t0) * 1000, 2)
+    docs, hydrate_ms = await asyncio.to_thread(_timed, _hydrate, docs)
+    timings = {
+        "vector": vec_ms,
+        "lexical": lex_ms,
+        "fusion": fusion_ms,
+        "hydrate": hydrate_ms,
+        "total": round((time.perf_counter() - started) * 1000, 2),
+    }
+    return Retrieval(docs, vec, mode, timings)
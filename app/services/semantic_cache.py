@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Sequence
+
+import numpy as np
+from loguru import logger
+from app.core.config import get_settings
+from app.services import redis_memory
+
+settings = get_settings()
+
+
+def _version_key(namespace: str) -> str:
+    return f"rag:ns:{namespace}:version"
+
+
+@dataclass
+class CachedAnswer:
+    chunk_ids: FrozenSet[str]
+    answer: str
+    sources: List[Dict[str, Any]]
+    version: int
+    created_at: float
+
+
+class _NamespaceEntries:
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self.vectors: Dict[int, np.ndarray] = {}
+        self._matrix: np.ndarray | None = None
+        self._row_ids: List[int] = []
+
+    def matrix(self) -> tuple[np.ndarray, List[int]]:
+        # rebuilt lazily after inserts/evictions; lookups are one matrix-vector product
+        if self._matrix is None:
+            self._row_ids = list(self.entries)
+            self._matrix = np.stack([self.vectors[i] for i in self._row_ids]) if self._row_ids else np.empty((0, 0), np.float32)
+        return self._matrix, self._row_ids
+
+    def add(self, entry_id: int, vec: np.ndarray, entry: CachedAnswer, max_entries: int) -> None:
+        self.entries[entry_id] = entry
+        self.vectors[entry_id] = vec
+        while len(self.entries) > max_entries:
+            old, _ = self.entries.popitem(last=False)
+            self.vectors.pop(old, None)
+        self._matrix = None
+
+
+class SemanticCache:
+    """Per-namespace cache of RAG answers keyed by query embedding.
+
+    A hit requires cosine similarity >= ``threshold`` against a cached query *and* a Jaccard overlap
+    >= ``min_chunk_overlap`` between the cached and freshly retrieved chunk ids, so a paraphrase that
+    lands on different context still goes to the LLM. Each namespace carries a version counter in
+    Redis that ingestion bumps; entries from an older version are discarded on the next lookup.
+    Conversation history is not part of the key, so this is opt-in (SEMANTIC_CACHE_ENABLED).
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        min_chunk_overlap: float,
+        max_entries_per_namespace: int,
+        max_namespaces: int,
+    ) -> None:
+        self.threshold = threshold
+        self.min_chunk_overlap = min_chunk_overlap
+        self.max_entries = max_entries_per_namespace
+        self.max_namespaces = max_namespaces
+        self._namespaces: "OrderedDict[str, _NamespaceEntries]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        n = float(np.linalg.norm(v))
+        return v / n if n else v
+
+    def _bucket(self, namespace: str, version: int) -> _NamespaceEntries:
+        bucket = self._namespaces.get(namespace)
+        if bucket is None or bucket.version != version:
+            bucket = _NamespaceEntries(version)
+            self._namespaces[namespace] = bucket
+        self._namespaces.move_to_end(namespace)
+        while len(self._namespaces) > self.max_namespaces:
+            self._namespaces.popitem(last=False)
+        return bucket
+
+    def lookup(
+        self, namespace: str, version: int, embedding: Sequence[float], chunk_ids: Sequence[str]
+    ) -> CachedAnswer | None:
+        q = self._unit(embedding)
+        ids = frozenset(chunk_ids)
+        with self._lock:
+            bucket = self._bucket(namespace, version)
+            if bucket.entries:
+                matrix, row_ids = bucket.matrix()
+                sims = matrix @ q
+                for row in np.argsort(-sims):
+                    if sims[row] < self.threshold:
+                        break
+                    entry = bucket.entries[row_ids[row]]
+                    union = ids | entry.chunk_ids
+                    overlap = len(ids & entry.chunk_ids) / len(union) if union else 1.0
+                    if overlap >= self.min_chunk_overlap:
+                        bucket.entries.move_to_end(row_ids[row])
+                        self.hits += 1
+                        return entry
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        namespace: str,
+        version: int,
+        embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        answer: str,
+        sources: List[Dict[str, Any]],
+    ) -> None:
+        entry = CachedAnswer(frozenset(chunk_ids), answer, sources, version, time.time())
+        with self._lock:
+            bucket = self._bucket(namespace, version)
+            self._next_id += 1
+            bucket.add(self._next_id, self._unit(embedding), entry, self.max_entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "namespaces": len(self._namespaces),
+                "entries": sum(len(b.entries) for b in self._namespaces.values()),
+            }
+
+
+async def aget_namespace_version(namespace: str) -> int:
+    raw = await redis_memory.ar.get(_version_key(namespace))
+    return int(raw) if raw else 0
+
+
+def get_namespace_version(namespace: str) -> int:
+    raw = redis_memory.r.get(_version_key(namespace))
+    return int(raw) if raw else 0
+
+
+def bump_namespace_version(namespace: str) -> int:
+    """Invalidate every cached answer for ``namespace`` across all workers."""
+    version = int(redis_memory.r.incr(_version_key(namespace)))
+    logger.debug(f"Semantic cache: namespace {namespace} now at version {version}")
+    return version
+
+
+semantic_cache = (
+    SemanticCache(
+        threshold=settings.semantic_cache_threshold,
+        min_chunk_overlap=settings.semantic_cache_min_chunk_overlap,
+        max_entries_per_namespace=settings.semantic_cache_max_entries,
+        max_namespaces=settings.semantic_cache_max_namespaces,
+    )
+    if settings.semantic_cache_enabled
+    else None
+)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import re
+from array import array
+from functools import lru_cache
+from typing import Sequence
+
+from loguru import logger
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class Tokenizer:
+    """Local tokenizer used to size chunks and prompts in tokens.
+
+    ``starts`` returns the character offset of each token (as a compact int array) so callers can
+    cut the original string by offset without re-joining tokens. The default splits words and punctuation, which tracks subword
+    tokenizers closely enough for budgeting; set TOKENIZER to ``tiktoken:<encoding>`` or
+    ``hf:<name-or-path>`` to count with a real vocabulary when that package is installed.
+    """
+
+    name = "regex"
+
+    def starts(self, text: str) -> Sequence[int]:
+        return array("q", (m.start() for m in _WORD_RE.finditer(text)))
+
+    def count(self, text: str) -> int:
+        return len(_WORD_RE.findall(text))
+
+
+class _TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding: str) -> None:
+        import tiktoken
+        self.enc = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def starts(self, text: str) -> Sequence[int]:
+        tokens = self.enc.encode(text, disallowed_special=())
+        _, offsets = self.enc.decode_with_offsets(tokens)
+        return array("q", offsets)
+
+    def count(self, text: str) -> int:
+        return len(self.enc.encode(text, disallowed_special=()))
+
+
+class _HFTokenizer(Tokenizer):
+    def __init__(self, name: str) -> None:
+        from tokenizers import Tokenizer as HFTokenizer
+        self.tok = HFTokenizer.from_file(name) if name.endswith(".json") else HFTokenizer.from_pretrained(name)
+        self.name = f"hf:{name}"
+
+    def starts(self, text: str) -> Sequence[int]:
+        enc = self.tok.encode(text, add_special_tokens=False)
+        return array("q", (o[0] for o in enc.offsets if o[1] > o[0]))
+
+    def count(self, text: str) -> int:
+        return len(self.tok.encode(text, add_special_tokens=False).ids)
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(spec: str | None = None) -> Tokenizer:
+    spec = spec or settings.tokenizer
+    kind, _, arg = spec.partition(":")
+    try:
+        if kind == "tiktoken":
+            return _TiktokenTokenizer(arg or "cl100k_base")
+        if kind == "hf":
+            return _HFTokenizer(arg)
+    except Exception:
+        logger.exception(f"Tokenizer {spec!r} unavailable; falling back to regex tokenizer")
+    return Tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    return get_tokenizer().count(text)
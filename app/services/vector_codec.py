@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import struct
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+# One format byte, then (int8 only) a little-endian float32 scale, then the raw little-endian values.
+# A 1024-d vector is 2 KB as float16 and 1 KB as int8, versus ~20 KB as a JSON float list.
+FORMATS = {"float32": 0, "float16": 1, "int8": 2}
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2"), 2: np.dtype("i1")}
+_SCALE = struct.Struct("<f")
+
+
+def encode(vec: Sequence[float] | np.ndarray, fmt: str = "float16") -> bytes:
+    """Pack one embedding. ``int8`` is symmetric per-vector quantization (scale = max|v| / 127)."""
+    code = FORMATS[fmt]
+    v = np.asarray(vec, dtype=np.float32)
+    if code == 2:
+        peak = float(np.abs(v).max()) if v.size else 0.0
+        scale = peak / 127.0 or 1.0
+        q = np.clip(np.rint(v / scale), -127, 127).astype(np.int8)
+        return bytes((code,)) + _SCALE.pack(scale) + q.tobytes()
+    return bytes((code,)) + v.astype(_DTYPES[code]).tobytes()
+
+
+def view(raw: bytes | memoryview) -> Tuple[np.ndarray, float]:
+    """Zero-copy view of the stored values and their scale (1.0 unless int8).
+
+    The array aliases ``raw`` and is read-only; float16/int8 values stay in their stored dtype.
+    """
+    code = raw[0]
+    if code == 2:
+        (scale,) = _SCALE.unpack_from(raw, 1)
+        return np.frombuffer(raw, dtype=_DTYPES[2], offset=1 + _SCALE.size), scale
+    return np.frombuffer(raw, dtype=_DTYPES[code], offset=1), 1.0
+
+
+def decode(raw: bytes | memoryview) -> np.ndarray:
+    """Stored embedding as float32 (copies unless it was stored as float32)."""
+    values, scale = view(raw)
+    if values.dtype == np.float32:
+        return values
+    out = values.astype(np.float32)
+    if scale != 1.0:
+        out *= scale
+    return out
+
+
+def decode_many(raws: Iterable[bytes]) -> np.ndarray:
+    """Stack stored embeddings into one float32 matrix, converting each same-format run in one step."""
+    raws = list(raws)
+    if not raws:
+        return np.zeros((0, 0), dtype=np.float32)
+    code = raws[0][0]
+    if code != 2 and all(r[0] == code and len(r) == len(raws[0]) for r in raws):
+        # strip the format byte, join once, reinterpret: one copy for the whole batch
+        flat = np.frombuffer(b"".join(memoryview(r)[1:] for r in raws), dtype=_DTYPES[code])
+        return flat.reshape(len(raws), -1).astype(np.float32, copy=False)
+    return np.stack([decode(r) for r in raws])
@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+from urllib.parse import quote, unquote
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+from app.core.config import get_settings
+from app.services.pinecone_service import BatchStats, PineconeService, _batched
+
+settings = get_settings()
+
+DEFAULT_NAMESPACE = "__default__"
+
+
+class VectorStore(ABC):
+    """Upsert/query/delete of embedding vectors, partitioned by namespace.
+
+    Items are ``{"id", "values", "metadata"}`` dicts and query results are
+    ``{"id", "score", "metadata"}`` dicts, the shapes the Pinecone SDK uses.
+    """
+
+    name = "base"
+    last_upsert_stats: Dict[str, Any] | None = None
+
+    @abstractmethod
+    def upsert(
+        self,
+        items: List[Dict[str, Any]],
+        namespace: str | None = None,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> None: ...
+
+    @abstractmethod
+    def query(
+        self, vector: Sequence[float], top_k: int = 5, namespace: str | None = None, include_metadata: bool = True
+    ) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: str | None = None) -> None: ...
+
+    @abstractmethod
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]], namespace: str | None = None) -> None: ...
+
+    @abstractmethod
+    def namespaces(self) -> List[str]: ...
+
+
+def _field(m: Any, name: str, default: Any = None) -> Any:
+    v = getattr(m, name, None)
+    if v is None and isinstance(m, dict):
+        v = m.get(name)
+    return default if v is None else v
+
+
+class PineconeVectorStore(VectorStore):
+    name = "pinecone"
+
+    def __init__(self, pc: PineconeService | None = None) -> None:
+        self.pc = pc or PineconeService()
+
+    def upsert(self, items, namespace=None, on_progress=None) -> None:
+        self.pc.upsert(items, namespace=namespace, on_progress=on_progress)
+        self.last_upsert_stats = self.pc.last_upsert_stats
+
+    def query(self, vector, top_k=5, namespace=None, include_metadata=True) -> List[Dict[str, Any]]:
+        res = self.pc.index.query(
+            vector=list(vector), top_k=top_k, include_metadata=include_metadata, namespace=namespace
+        )
+        matches = _field(res, "matches", [])
+        return [
+            {"id": _field(m, "id"), "score": _field(m, "score"), "metadata": _field(m, "metadata", {})}
+            for m in matches
+        ]
+
+    def delete(self, ids, namespace=None) -> None:
+        self.pc.delete(ids, namespace=namespace)
+
+    def update_metadata(self, updates, namespace=None) -> None:
+        self.pc.update_metadata(updates, namespace=namespace)
+
+    def namespaces(self) -> List[str]:
+        stats = self.pc.index.describe_index_stats()
+        return list(_field(stats, "namespaces", {}).keys())
+
+
+class _IVF:
+    """Inverted-file index: k-means centroids over unit vectors, one row list per centroid."""
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray], built_rows: int) -> None:
+        self.centroids = centroids
+        self.lists = lists
+        self.built_rows = built_rows  # rows appended after this are scanned exhaustively
+
+    @classmethod
+    def build(cls, mat: np.ndarray, rows: np.ndarray, iters: int = 10, seed: int = 0) -> "_IVF":
+        rng = np.random.default_rng(seed)
+        # never more lists than rows: LOCAL_IVF_MIN_VECTORS may be set below the 16-list floor
+        n_lists = int(min(4096, max(16, np.sqrt(len(rows))), len(rows)))
+        sample = rows if len(rows) <= 64 * n_lists else rng.choice(rows, 64 * n_lists, replace=False)
+        data = np.asarray(mat[np.sort(sample)], dtype=np.float32)
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = data[assign == c]
+                if len(members):
+                    v = members.sum(axis=0)
+                    centroids[c] = v / (np.linalg.norm(v) or 1.0)
+        assign = np.empty(len(rows), dtype=np.int32)
+        for s in range(0, len(rows), 65536):
+            block = np.asarray(mat[rows[s:s + 65536]], dtype=np.float32)
+            assign[s:s + 65536] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        lists = [rows[order[bounds[c]:bounds[c + 1]]] for c in range(n_lists)]
+        return cls(centroids, lists, int(rows.max()) + 1 if len(rows) else 0)
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = np.argsort(-(self.centroids @ q))[:nprobe]
+        return np.concatenate([self.lists[c] for c in probe])
+
+
+class _LocalNamespace:
+    """One namespace on disk: ``vectors.bin`` (a row-major matrix, memory-mapped) plus ``log.jsonl``.
+
+    Vectors are L2-normalized on write, so cosine similarity is a dot product. Upserts append rows
+    and log records; deletes and overwrites only tombstone rows until ``compact`` rewrites the files.
+    The vector file is written before the log, so a crash can leave unreferenced rows but never
+    a log record without its vector. Writers hold an exclusive lock on ``lock``; every operation
+    first replays log records appended by other processes (e.g. the ingest worker).
+    """
+
+    def __init__(self, path: str, dtype: str) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.lock = threading.RLock()
+        self.dim: int | None = None
+        self.mm: np.memmap | None = None
+        self.ivf: _IVF | None = None
+        self._ivf_live = 0
+        os.makedirs(path, exist_ok=True)
+        self._reset()
+
+    # --- files -------------------------------------------------------------
+
+    @property
+    def _vec_path(self) -> str:
+        return os.path.join(self.path, "vectors.bin")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "log.jsonl")
+
+    @property
+    def _header_path(self) -> str:
+        return os.path.join(self.path, "header.json")
+
+    @property
+    def n(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live(self) -> int:
+        return len(self.row_of)
+
+    def _reset(self) -> None:
+        self.ids: List[str | None] = []
+        self.meta: List[Dict[str, Any] | None] = []
+        self.row_of: Dict[str, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.mm = None
+        self.cap = 0
+        self.ivf = None
+        self._log_pos = 0
+        self._log_ino: int | None = None
+
+    def _sync(self) -> None:
+        """Catch up with the files: remap a grown matrix and replay new log records."""
+        if self.dim is None:
+            if not os.path.exists(self._header_path):
+                return
+            with open(self._header_path) as f:
+                header = json.load(f)
+            self.dim, self.dtype = header["dim"], np.dtype(header["dtype"])
+        try:
+            st = os.stat(self._log_path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and (st.st_ino != self._log_ino or st.st_size < self._log_pos):
+            if self._log_ino is not None:
+                self._reset()  # compacted by another process
+            self._log_ino = st.st_ino
+        rows = os.path.getsize(self._vec_path) // (self.dim * self.dtype.itemsize)
+        if rows > self.cap or self.mm is None:
+            self._map(rows)
+        if st is None or st.st_size == self._log_pos:
+            return
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # record still being written
+                self._log_pos += len(line)
+                self._apply(json.loads(line))
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        op, row = rec["op"], rec["row"]
+        if op == "add":
+            if row >= self.cap:
+                return
+            while self.n <= row:
+                self.ids.append(None)
+                self.meta.append(None)
+            old = self.row_of.get(rec["id"])
+            if old is not None and old != row:
+                self._kill(old)
+            self.ids[row], self.meta[row] = rec["id"], rec.get("metadata") or {}
+            self.row_of[rec["id"]] = row
+            self.alive[row] = True
+        elif op == "del" and row < self.n and self.ids[row] is not None:
+            self._kill(row)
+        elif op == "set" and row < self.n and self.meta[row] is not None:
+            self.meta[row].update(rec["metadata"])
+
+    def _kill(self, row: int) -> None:
+        vid = self.ids[row]
+        if vid is not None and self.row_of.get(vid) == row:
+            del self.row_of[vid]
+        self.ids[row], self.meta[row] = None, None
+        self.alive[row] = False
+
+    def _map(self, cap: int) -> None:
+        self.mm = None
+        self.cap = cap
+        if cap:
+            self.mm = np.memmap(self._vec_path, dtype=self.dtype, mode="r+", shape=(cap, self.dim))
+        alive = np.zeros(cap, dtype=bool)
+        alive[: len(self.alive)] = self.alive[:cap]
+        self.alive = alive
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self.cap:
+            return
+        cap = max(1024, 2 * self.cap, rows)
+        if self.mm is not None:
+            self.mm.flush()
+        with open(self._vec_path, "ab") as f:
+            f.truncate(cap * self.dim * self.dtype.itemsize)
+        self._map(cap)
+
+    def _write_log(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+        with open(self._log_path, "ab") as f:
+            f.write(data)
+        for rec in records:
+            self._apply(rec)
+        self._log_pos += len(data)
+        if self._log_ino is None:
+            self._log_ino = os.stat(self._log_path).st_ino
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with self.lock, open(os.path.join(self.path, "lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._sync()
+            yield
+
+    # --- operations -----------------------------------------------------------
+
+    def append(self, items: List[Dict[str, Any]]) -> None:
+        vecs = np.asarray([it["values"] for it in items], dtype=np.float32)
+        if vecs.ndim != 2:
+            raise ValueError("vectors must share one dimension")
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs /= np.where(norms == 0, 1.0, norms)
+        with self._writing():
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                with open(self._header_path, "w") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+                open(self._vec_path, "ab").close()
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"dimension {vecs.shape[1]} does not match namespace dimension {self.dim}")
+            start = self.n
+            self._reserve(start + len(items))
+            self.mm[start:start + len(items)] = vecs
+            self.mm.flush()
+            self._write_log([
+                {"op": "add", "row": start + i, "id": it["id"], "metadata": it.get("metadata") or {}}
+                for i, it in enumerate(items)
+            ])
+
+    def delete(self, ids: List[str]) -> int:
+        with self._writing():
+            records = [{"op": "del", "row": self.row_of[i]} for i in dict.fromkeys(ids) if i in self.row_of]
+            if records:
+                self._write_log(records)
+            if self.n - self.live > max(1024, self.live):
+                self._compact()
+            return len(records)
+
+    def update(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        with self._writing():
+            records = [{"op": "set", "row": self.row_of[i], "metadata": md} for i, md in updates.items() if i in self.row_of]
+            if records:
+                self._write_log(records)
+
+    def compact(self) -> None:
+        """Rewrite the files with live rows only (drops tombstones, shrinks the matrix)."""
+        with self._writing():
+            self._compact()
+
+    def _compact(self) -> None:
+        if self.dim is None:
+            return
+        rows = np.flatnonzero(self.alive[: self.n])
+        tmp_vec, tmp_log = self._vec_path + ".tmp", self._log_path + ".tmp"
+        out = np.memmap(tmp_vec, dtype=self.dtype, mode="w+", shape=(max(len(rows), 1), self.dim))
+        for s in range(0, len(rows), 65536):
+            out[s:s + len(rows[s:s + 65536])] = self.mm[rows[s:s + 65536]]
+        out.flush()
+        del out
+        with open(tmp_log, "w") as f:
+            for new, old in enumerate(rows):
+                f.write(json.dumps({"op": "add", "row": new, "id": self.ids[old], "metadata": self.meta[old]},
+                                   separators=(",", ":")) + "\n")
+        os.replace(tmp_vec, self._vec_path)
+        os.replace(tmp_log, self._log_path)
+        self._reset()
+        self._sync()
+        logger.info(f"compacted local vector namespace {self.path}: {self.live} live rows")
+
+    def search(self, q: np.ndarray, top_k: int, ivf_min: int, nprobe: int) -> List[tuple[int, float]]:
+        with self.lock:
+            self._sync()
+            n = self.n
+            if not self.live or self.mm is None:
+                return []
+            if q.shape[0] != self.dim:
+                raise ValueError(f"query dimension {q.shape[0]} does not match namespace dimension {self.dim}")
+            if ivf_min and self.live >= ivf_min:
+                # rebuild once the namespace has changed by a quarter since the last build
+                if self.ivf is None or abs(self.live - self._ivf_live) > self._ivf_live // 4:
+                    t0 = time.perf_counter()
+                    self.ivf = _IVF.build(self.mm, np.flatnonzero(self.alive[:n]))
+                    self._ivf_live = self.live
+                    logger.info(f"built IVF for {self.path}: {len(self.ivf.lists)} lists in {time.perf_counter() - t0:.2f}s")
+                rows = np.concatenate([self.ivf.candidates(q, nprobe), np.arange(self.ivf.built_rows, n)])
+                rows = np.sort(rows[self.alive[rows]])
+                scores = np.asarray(self.mm[rows], dtype=np.float32) @ q
+            else:
+                rows = None
+                scores = np.empty(n, dtype=np.float32)
+                for s in range(0, n, 65536):  # bounded upcast for float16 matrices
+                    scores[s:s + 65536] = np.asarray(self.mm[s:min(s + 65536, n)], dtype=np.float32) @ q
+                scores[~self.alive[:n]] = -np.inf
+            k = min(top_k, int(np.isfinite(scores).sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(rows[i]) if rows is not None else int(i), float(scores[i])) for i in top]
+
+    def row(self, row: int, include_metadata: bool) -> Dict[str, Any]:
+        return {"id": self.ids[row], "metadata": dict(self.meta[row] or {}) if include_metadata else {}}
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store: one memory-mapped float32/float16 matrix per namespace under ``root``.
+
+    Exact search is a vectorized dot product over the matrix; namespaces with at least ``ivf_min``
+    live vectors are searched through an IVF index (``nprobe`` lists), rebuilt lazily after the
+    namespace grows or shrinks by a quarter. Data persists across restarts; the IVF index does not.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str | None = None,
+        dtype: str | None = None,
+        ivf_min: int | None = None,
+        nprobe: int | None = None,
+    ) -> None:
+        self.root = root or settings.local_vector_dir
+        self.dtype = dtype or settings.local_vector_dtype
+        self.ivf_min = settings.local_ivf_min_vectors if ivf_min is None else ivf_min
+        self.nprobe = nprobe or settings.local_ivf_nprobe
+        self._namespaces: Dict[str, _LocalNamespace] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _ns(self, namespace: str | None) -> _LocalNamespace:
+        key = namespace or DEFAULT_NAMESPACE
+        with self._lock:
+            ns = self._namespaces.get(key)
+            if ns is None:
+                ns = self._namespaces[key] = _LocalNamespace(os.path.join(self.root, quote(key, safe="")), self.dtype)
+            return ns
+
+    def upsert(self, items, namespace=None, on_progress=None) -> None:
+        stats = BatchStats("upsert")
+        ns = self._ns(namespace)
+        for batch in _batched(items, 1000):
+            t0 = time.perf_counter()
+            ns.append(list(batch))
+            stats.record(len(batch), time.perf_counter() - t0)
+            if on_progress:
+                on_progress(len(batch))
+        self.last_upsert_stats = stats.summary()
+
+    def query(self, vector, top_k=5, namespace=None, include_metadata=True) -> List[Dict[str, Any]]:
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        ns = self._ns(namespace)
+        with ns.lock:
+            return [
+                {**ns.row(row, include_metadata), "score": score}
+                for row, score in ns.search(q, top_k, self.ivf_min, self.nprobe)
+            ]
+
+    def delete(self, ids, namespace=None) -> None:
+        self._ns(namespace).delete(list(ids))
+
+    def update_metadata(self, updates, namespace=None) -> None:
+        if updates:
+            self._ns(namespace).update(updates)
+
+    def namespaces(self) -> List[str]:
+        return sorted(unquote(d) for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def compact(self, namespace: str | None = None) -> None:
+        self._ns(namespace).compact()
+
+    def stats(self) -> Dict[str, Any]:
+        out = {}
+        for key in self.namespaces():
+            ns = self._ns(key)
+            with ns.lock:
+                ns._sync()
+            out[key] = {"rows": ns.n, "live": ns.live, "dim": ns.dim, "dtype": ns.dtype.name,
+                        "ivf_lists": len(ns.ivf.lists) if ns.ivf else None}
+        return out
+
+
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    kind = settings.vector_store.lower()
+    if kind == "local":
+        return LocalVectorStore()
+    if kind != "pinecone":
+        raise ValueError(f"Unknown VECTOR_STORE {settings.vector_store!r}; expected 'pinecone' or 'local'")
+    return PineconeVectorStore()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from loguru import logger
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import get_settings
+from app.core.metrics import stage
+from app.db.session import async_engine
+from app.models.db_models import ChatMessage
+
+settings = get_settings()
+
+
+class WriteBehindBuffer:
+    """Batches inserts into one table off the request path.
+
+    ``submit`` enqueues a unit of rows (e.g. both messages of a turn) on a bounded queue, waiting
+    when it is full so a slow database applies backpressure instead of growing memory. A single
+    background task drains the queue into multi-row INSERTs of up to ``batch_size`` rows, flushing
+    at least every ``flush_interval`` seconds; units are never split across batches. ``stop`` drains
+    everything before returning, so a graceful shutdown loses nothing. Failed batches are retried
+    with backoff, then logged in full so they can be replayed.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        engine: AsyncEngine = async_engine,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        max_retries: int = 5,
+    ) -> None:
+        self.table = table
+        self.engine = engine
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue[List[Dict[str, Any]]] | None = None
+        self._task: asyncio.Task | None = None
+        self.rows_written = 0
+        self.batches_written = 0
+        self.rows_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name=f"write-behind:{self.table.name}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.put([])  # sentinel: everything queued before it is flushed first
+        await self._task
+        self._task = None
+
+    async def submit(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        if not self.running:
+            # not started (scripts, tests without lifespan): write through
+            await self._write(rows)
+            return
+        await self._queue.put(rows)
+
+    async def _run(self) -> None:
+        q = self._queue
+        stopping = False
+        while not stopping:
+            unit = await q.get()
+            if not unit:
+                break
+            batch = list(unit)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    unit = q.get_nowait() if q.qsize() else await asyncio.wait_for(
+                        q.get(), max(0.0, deadline - time.monotonic())
+                    )
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if not unit:
+                    stopping = True
+                    break
+                batch.extend(unit)
+            await self._flush(batch)
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(self.table), rows)
+
+    async def _flush(self, rows: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with stage(f"db_write:{self.table.name}"):
+                    await self._write(rows)
+                self.rows_written += len(rows)
+                self.batches_written += 1
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    break
+                delay = random.uniform(0, min(5.0, 0.1 * 2 ** attempt))
+                logger.warning(f"write-behind {self.table.name}: insert of {len(rows)} rows failed; retry in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self.rows_failed += len(rows)
+        logger.error(
+            f"write-behind {self.table.name}: dropping {len(rows)} rows after {self.max_retries} retries: "
+            f"{json.dumps(rows, default=str)}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued_units": self._queue.qsize() if self._queue is not None else 0,
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "rows_failed": self.rows_failed,
+        }
+
+
+chat_messages_buffer = (
+    WriteBehindBuffer(
+        ChatMessage.__table__,
+        max_queue=settings.chat_write_behind_max_queue,
+        batch_size=settings.chat_write_behind_batch_size,
+        flush_interval=settings.chat_write_behind_flush_interval,
+    )
+    if settings.chat_write_behind_enabled
+    else None
+)
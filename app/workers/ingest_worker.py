@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import threading
+import time
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.clients import clients
+from app.core.config import get_settings
+from app.services.ingestion_jobs import process_job
+from app.services.job_queue import WorkerIdInUse, get_job_queue
+
+settings = get_settings()
+
+
+def _work(worker_id: str, stop: threading.Event) -> None:
+    queue = get_job_queue()
+    while not stop.is_set():
+        job_id = queue.reserve(worker_id, timeout=2)
+        if job_id is None:
+            continue
+        try:
+            process_job(job_id, queue)
+        except Exception:
+            logger.exception(f"ingest job {job_id}: unexpected worker error")
+        finally:
+            queue.ack(worker_id, job_id)
+
+
+def run(concurrency: int, worker_id: str, metrics_port: int | None = None) -> None:
+    if metrics_port:
+        metrics.serve(metrics_port)
+    queue = get_job_queue()
+    ttl = settings.ingest_worker_heartbeat_ttl
+    try:
+        queue.register(worker_id, ttl)
+    except WorkerIdInUse as e:
+        raise SystemExit(str(e))
+    recovered = queue.recover()
+    if recovered:
+        logger.info(f"Re-queued {recovered} in-flight job(s) left by stopped workers")
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    threads = [
+        threading.Thread(target=_work, args=(worker_id, stop), name=f"ingest-{i}", daemon=True)
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    logger.info(f"Ingest worker {worker_id} started with concurrency={concurrency}")
+
+    # the main thread schedules due retries and keeps the heartbeat alive until asked to stop;
+    # every few beats it also re-queues the jobs of workers that died meanwhile
+    beat = max(ttl / 3, 1.0)
+    next_beat = time.monotonic() + beat
+    while not stop.wait(1.0):
+        queue.promote_due()
+        if time.monotonic() >= next_beat:
+            queue.heartbeat(worker_id, ttl)
+            recovered = queue.recover()
+            if recovered:
+                logger.info(f"Re-queued {recovered} in-flight job(s) left by stopped workers")
+            next_beat = time.monotonic() + beat
+
+    logger.info("Stopping; waiting for in-flight jobs to finish")
+    for t in threads:
+        # keep beating, or a long job could be re-queued by another worker while it finishes here
+        t.join(beat)
+        while t.is_alive():
+            queue.heartbeat(worker_id, ttl)
+            t.join(beat)
+    queue.unregister(worker_id)
+    asyncio.run(clients.aclose())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background document ingestion worker")
+    parser.add_argument("--concurrency", type=int, default=settings.ingest_worker_concurrency)
+    # unique per process: workers sharing a host (or pod) must not share a processing list
+    parser.add_argument("--worker-id", default=os.environ.get("INGEST_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}")
+    parser.add_argument("--metrics-port", type=int, default=settings.ingest_worker_metrics_port,
+                        help="serve Prometheus metrics on this port")
+    args = parser.parse_args()
+    run(args.concurrency, args.worker_id, args.metrics_port)
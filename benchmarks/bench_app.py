@@ -0,0 +1,339 @@
+"""End-to-end load test of the FastAPI app against local stand-ins for Groq, Pinecone, Redis and Postgres.
+
+Boots ``create_app()`` in-process with the fakes from ``benchmarks.fakes`` (configurable latency),
+SQLite in a temporary directory and fakeredis (or ``--redis-url`` for a real server), runs the
+ingest worker in background threads, then drives three closed-loop workloads through the ASGI
+interface:
+  * ``ingest``: concurrent ``/ingest/upload`` of generated documents, plus each job's end-to-end time;
+  * ``chat``: ``/chat/query`` over multi-turn sessions, with a share of booking requests;
+  * ``booking``: ``/booking`` creates.
+Each workload reports p50/p95/p99 latency, requests per second and errors; peak RSS (and, with
+``--tracemalloc``, peak Python heap) is reported per workload and for the run. The JSON on stdout
+carries the git commit so runs can be compared across commits:
+
+    python -m benchmarks.bench_app --concurrency 32 --chat-requests 2000 > bench_app.json
+
+``--serve PORT`` boots the same faked app under uvicorn instead, for external load generators.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks import fakes
+
+TOPICS = ("refund policy", "shipping times", "warranty claims", "account security", "api rate limits",
+          "invoice exports", "data retention", "sso setup", "webhook retries", "pricing tiers")
+FILLER = ("the customer team reviews each request within two business days and records the outcome "
+          "in the ticket history so that support agents can follow up with accurate information").split()
+
+
+def make_document(i: int, kb: int, rng: random.Random) -> str:
+    topic = TOPICS[i % len(TOPICS)]
+    sentences = []
+    while sum(len(s) for s in sentences) < kb * 1024:
+        code = f"SKU-{rng.randint(1000, 9999)}"
+        sentences.append(f"Section on {topic} for {code}: " + " ".join(rng.choices(FILLER, k=18)) + ".")
+    return f"Handbook {i}: {topic}\n\n" + "\n".join(sentences)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ms = np.asarray(samples) * 1000
+    out = {f"p{p}_ms": round(float(np.percentile(ms, p)), 2) for p in (50, 95, 99)}
+    out.update(mean_ms=round(float(ms.mean()), 2), max_ms=round(float(ms.max()), 2))
+    return out
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str | None:
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except Exception:
+        return None
+
+
+def boot(args: argparse.Namespace, workdir: str):
+    """Configure the environment, install the fakes, import the app and create its tables."""
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        PINECONE_API_KEY="bench", PINECONE_INDEX_NAME="bench", PINECONE_EMBEDDING_MODEL="fake-embed",
+        GROQ_API_KEY="bench",
+        VECTOR_STORE=args.vector_store,
+        LOCAL_VECTOR_DIR=f"{workdir}/vectors",
+        INGEST_SPOOL_DIR=f"{workdir}/spool",
+        LOG_LEVEL=args.log_level,
+    )
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    fakes.install(
+        fakes.FakeConfig(
+            llm=fakes.Latency(args.llm_ms, args.jitter),
+            llm_stream_token_ms=args.llm_token_ms,
+            embed=fakes.Latency(args.embed_ms, args.jitter),
+            vector=fakes.Latency(args.vector_ms, args.jitter),
+            dim=args.dim,
+        ),
+        redis_url=args.redis_url,
+    )
+    from loguru import logger
+    from sqlmodel import SQLModel
+
+    # stdout is reserved for the JSON report: import-time output and app logs go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        from app.db.session import engine
+        from app.main import create_app
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level.upper())
+
+    SQLModel.metadata.create_all(engine)
+    return create_app()
+
+
+def start_workers(concurrency: int) -> threading.Event:
+    from app.workers.ingest_worker import _work
+
+    stop = threading.Event()
+    for i in range(concurrency):
+        threading.Thread(target=_work, args=("bench", stop), name=f"bench-ingest-{i}", daemon=True).start()
+    return stop
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+
+    def add(self, seconds: float, status: int | str) -> None:
+        self.latencies.append(seconds)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if not (isinstance(status, int) and 200 <= status < 300):
+            self.errors += 1
+
+
+async def closed_loop(
+    n: int, concurrency: int, call: Callable[[int], Awaitable[Tuple[int, Any]]]
+) -> Tuple[Recorder, float, List[Any]]:
+    """Run ``call(i)`` for i in range(n) with ``concurrency`` requests in flight."""
+    rec = Recorder()
+    results: List[Any] = [None] * n
+    counter = iter(range(n))
+
+    async def worker() -> None:
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                status, results[i] = await call(i)
+            except Exception as e:
+                status = type(e).__name__
+            rec.add(time.perf_counter() - t0, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, n)))))
+    return rec, time.perf_counter() - started, results
+
+
+def summarize(rec: Recorder, wall: float, mem: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "requests": len(rec.latencies),
+        "errors": rec.errors,
+        "statuses": rec.statuses,
+        "wall_s": round(wall, 3),
+        "rps": round(len(rec.latencies) / wall, 1) if wall > 0 else None,
+        **percentiles(rec.latencies),
+        **mem,
+    }
+
+
+def memory_snapshot(track_heap: bool) -> Dict[str, float]:
+    out = {"peak_rss_mb": peak_rss_mb()}
+    if track_heap:
+        out["peak_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.reset_peak()
+    return out
+
+
+def stage_breakdown() -> Dict[str, Dict[str, float]]:
+    """Mean latency per instrumented stage over the whole run (from the app's own histograms)."""
+    from app.core.metrics import STAGE_SECONDS
+
+    return {
+        f"{pipeline}.{stage}": {"count": count, "mean_ms": round(total / count * 1000, 2)}
+        for (pipeline, stage), (count, total) in sorted(STAGE_SECONDS.snapshot().items()) if count
+    }
+
+
+async def run_workloads(app, args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from app.core.config import get_settings
+
+    prefix = get_settings().api_prefix
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=120
+    ) as client:
+        # --- ingest --------------------------------------------------------------------------
+        docs = [make_document(i, args.doc_kb, rng) for i in range(args.docs)]
+
+        async def upload(i: int) -> Tuple[int, Any]:
+            r = await client.post(
+                f"{prefix}/ingest/upload",
+                files={"file": (f"handbook-{i}.txt", docs[i].encode(), "text/plain")},
+            )
+            return r.status_code, (r.json().get("job_id") if r.status_code < 300 else None, time.perf_counter())
+
+        started = time.perf_counter()
+        rec, wall, uploaded = await closed_loop(args.docs, args.concurrency, upload)
+        job_times: List[float] = []  # accepted -> succeeded/failed, as seen by polling
+        failed_jobs = 0
+        pending = {job_id: t0 for job_id, t0 in (u for u in uploaded if u) if job_id}
+        deadline = time.perf_counter() + args.ingest_timeout
+        while pending and time.perf_counter() < deadline:
+            for job_id in list(pending):
+                status = (await client.get(f"{prefix}/ingest/jobs/{job_id}")).json().get("status")
+                if status in ("succeeded", "failed"):
+                    job_times.append(time.perf_counter() - pending.pop(job_id))
+                    failed_jobs += status == "failed"
+            await asyncio.sleep(0.05)
+        ingest_wall = time.perf_counter() - started
+        results["ingest"] = summarize(rec, wall, memory_snapshot(args.tracemalloc))
+        results["ingest"]["jobs"] = {
+            "completed": len(job_times), "failed": failed_jobs, "timed_out": len(pending),
+            "docs_per_s": round(len(job_times) / ingest_wall, 2) if ingest_wall else None,
+            **percentiles(job_times),
+        }
+
+        # --- chat ----------------------------------------------------------------------------
+        from app.services.booking_engine import booking_index
+
+        async def chat(i: int) -> Tuple[int, Any]:
+            session = f"bench-session-{i % args.sessions}"
+            if rng.random() < args.booking_share:
+                # two turns: the name arrives in the follow-up, which the local parser reads
+                day, slot = divmod(i, booking_index.n_slots)
+                r = await client.post(f"{prefix}/chat/query", json={"session_id": session, "question": (
+                    f"Please book an interview on 2031-{1 + day // 28 % 12:02d}-{1 + day % 28:02d} at "
+                    f"{booking_index.time_of(slot)}, bench{i}@example.com"
+                )})
+                if r.status_code != 200:
+                    return r.status_code, None
+                question = "My name is Bench User"
+            else:
+                question = f"What does the handbook say about {rng.choice(TOPICS)} for SKU-{rng.randint(1000, 9999)}?"
+            r = await client.post(f"{prefix}/chat/query", json={"session_id": session, "question": question})
+            return r.status_code, None
+
+        # unrecorded warm-up: first-use costs (tokenizer, lexical index, connection pools) are not steady state
+        await closed_loop(args.warmup, args.concurrency, chat)
+        rec, wall, _ = await closed_loop(args.chat_requests, args.concurrency, chat)
+        results["chat"] = summarize(rec, wall, memory_snapshot(args.tracemalloc))
+
+        # --- booking -------------------------------------------------------------------------
+        async def book(i: int) -> Tuple[int, Any]:
+            # a distinct free slot per request (the slot grid is BOOKING_DAY_START/END, BOOKING_SLOT_MINUTES)
+            day, slot = divmod(i, booking_index.n_slots)
+            r = await client.post(f"{prefix}/booking", json={
+                "name": f"Bench User {i}",
+                "email": f"bench{i}@example.com",
+                "date": f"2032-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}",
+                "time": str(booking_index.time_of(slot)),
+            })
+            return r.status_code, None
+
+        rec, wall, _ = await closed_loop(args.booking_requests, args.concurrency, book)
+        results["booking"] = summarize(rec, wall, memory_snapshot(args.tracemalloc))
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--doc-kb", type=int, default=32)
+    parser.add_argument("--chat-requests", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--booking-share", type=float, default=0.05, help="share of chat turns that book")
+    parser.add_argument("--booking-requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20, help="unrecorded chat requests before measuring")
+    parser.add_argument("--ingest-workers", type=int, default=2)
+    parser.add_argument("--ingest-timeout", type=float, default=300.0)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="simulated Groq latency per call")
+    parser.add_argument("--llm-token-ms", type=float, default=5.0, help="simulated delay per streamed token")
+    parser.add_argument("--embed-ms", type=float, default=30.0, help="simulated Pinecone inference latency")
+    parser.add_argument("--vector-ms", type=float, default=20.0, help="simulated Pinecone index latency")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--vector-store", choices=["pinecone", "local"], default="pinecone",
+                        help="pinecone = fake index with --vector-ms latency; local = the real local store")
+    parser.add_argument("--redis-url", default=None, help="use this Redis instead of fakeredis")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report peak Python heap (slower)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT",
+                        help="serve the faked app with uvicorn on PORT instead of running the workloads")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory(prefix="bench_app_") as workdir:
+        if args.tracemalloc:
+            tracemalloc.start()
+        app = boot(args, workdir)
+        stop = start_workers(args.ingest_workers)
+        try:
+            if args.serve:
+                import uvicorn
+
+                uvicorn.run(app, host="127.0.0.1", port=args.serve, log_level=args.log_level.lower())
+                return
+            started = time.perf_counter()
+            results = asyncio.run(run_workloads(app, args))
+        finally:
+            stop.set()
+
+    print(json.dumps({
+        "benchmark": "app",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("serve", "log_level")},
+        "wall_s": round(time.perf_counter() - started, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+        "stages": stage_breakdown(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Vector metadata payload size and retrieval latency: chunk text in metadata vs. fetched by id.
+
+Builds a synthetic corpus in a temporary directory (local vector store + SQLite Chunk table) and
+measures, per query, the serialized size of the matches and the latency of
+  * ``text_in_metadata``: the old layout, text returned by the vector query itself;
+  * ``slim_query_only``: slim metadata, vector query alone (what crosses the wire from the index);
+  * ``slim_db``: slim metadata, text fetched with one batched SELECT per query (cold cache);
+  * ``slim_lru``: slim metadata, text served from the in-process LRU (hot chunks).
+
+    python -m benchmarks.bench_chunk_text --chunks 20000 --chunk-chars 800 > bench_chunk_text.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models.db_models import Chunk
+from app.services.chunk_text import ChunkTextStore
+from app.services.vector_store import LocalVectorStore
+
+WORDS = ("invoice refund shipping latency cluster replica timeout policy customer account vector "
+         "index interview schedule billing export quota region token gateway").split()
+
+
+def make_text(rng: np.random.Generator, chars: int) -> str:
+    words = rng.choice(WORDS, size=chars // 6)
+    return " ".join(words)[:chars]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+def measure(fn: Callable[[np.ndarray], List[Dict]], queries: np.ndarray) -> Dict[str, float]:
+    fn(queries[0])  # warm: page in the matrix
+    times, sizes = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        docs = fn(q)
+        times.append(time.perf_counter() - t0)
+        sizes.append(len(json.dumps(docs).encode("utf-8")))
+    return {**percentiles(times), "payload_bytes_per_query": int(np.mean(sizes))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--chunk-chars", type=int, default=800)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+    texts = [make_text(rng, args.chunk_chars) for _ in range(args.chunks)]
+    queries = vectors[rng.integers(0, args.chunks, args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim))
+
+    def metadata(i: int) -> Dict:
+        return {"document_id": 1, "filename": "corpus.txt", "chunk_index": i, "page_start": None, "page_end": None}
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as root:
+        engine = create_engine(f"sqlite:///{root}/chunks.db")
+        # only the chunk table: Document.meta is JSONB, which SQLite cannot create
+        SQLModel.metadata.create_all(engine, tables=[Chunk.__table__])
+        with Session(engine) as session:
+            session.add_all(
+                Chunk(document_id=1, chunk_index=i, text=t, vector_id=str(i)) for i, t in enumerate(texts)
+            )
+            session.commit()
+
+        fat = LocalVectorStore(f"{root}/fat", ivf_min=0)
+        fat.upsert([{"id": str(i), "values": v, "metadata": {**metadata(i), "text": texts[i]}}
+                    for i, v in enumerate(vectors)])
+        slim = LocalVectorStore(f"{root}/slim", ivf_min=0)
+        slim.upsert([{"id": str(i), "values": v, "metadata": metadata(i)} for i, v in enumerate(vectors)])
+
+        cold = ChunkTextStore(max_items=0, redis_client=None, ttl_seconds=0, db_engine=engine)
+        hot = ChunkTextStore(max_items=args.chunks, redis_client=None, ttl_seconds=0, db_engine=engine)
+        hot.get_many(str(i) for i in range(args.chunks))
+
+        results["text_in_metadata"] = measure(lambda q: fat.query(q, args.top_k), queries)
+        results["slim_query_only"] = measure(lambda q: slim.query(q, args.top_k), queries)
+        results["slim_db"] = measure(lambda q: cold.hydrate(slim.query(q, args.top_k)), queries)
+        results["slim_lru"] = measure(lambda q: hot.hydrate(slim.query(q, args.top_k)), queries)
+
+    metadata_bytes = {
+        "text_in_metadata": int(np.mean([len(json.dumps({**metadata(i), "text": t})) for i, t in enumerate(texts)])),
+        "slim": int(np.mean([len(json.dumps(metadata(i))) for i in range(args.chunks)])),
+    }
+    print(json.dumps({
+        "benchmark": "chunk_text",
+        "chunks": args.chunks,
+        "chunk_chars": args.chunk_chars,
+        "dim": args.dim,
+        "top_k": args.top_k,
+        "metadata_bytes_per_vector": metadata_bytes,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Chunking throughput and peak-memory benchmark.
+
+Compares the pre-engine implementations (``list(text)`` sliding window, a fresh
+RecursiveCharacterTextSplitter per call) with ChunkingEngine on a synthetic document.
+
+    python -m benchmarks.bench_chunking --mb 8 --repeat 3 > bench_chunking.json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.chunking import get_engine
+from app.services.parsers import PageText
+
+
+def legacy_sliding(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    tokens = list(text)
+    chunks: List[str] = []
+    start = 0
+    n = len(tokens)
+    while start < n:
+        end = min(start + chunk_size, n)
+        chunks.append("".join(tokens[start:end]))
+        if end == n:
+            break
+        start = end - chunk_overlap
+    return chunks
+
+
+def legacy_recursive(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    return splitter.split_text(text)
+
+
+def make_document(mb: float, seed: int = 7) -> List[PageText]:
+    rng = random.Random(seed)
+    vocab = ["lorem", "ipsum", "dolor", "sit", "amet,", "consectetur", "adipiscing", "elit.", "sed", "do",
+             "eiusmod", "tempor", "SKU-4821", "error:", "timeout", "inference", "namespace", "vector"]
+    pages: List[PageText] = []
+    size, target, n = 0, int(mb * 1024 * 1024), 0
+    while size < target:
+        paras = []
+        for _ in range(rng.randint(3, 6)):
+            paras.append(" ".join(rng.choice(vocab) for _ in range(rng.randint(40, 120))))
+        text = "\n\n".join(paras)
+        n += 1
+        pages.append(PageText(n, text))
+        size += len(text) + 1
+    return pages
+
+
+def measure(fn: Callable[[], int], repeat: int) -> Dict[str, float]:
+    # timing runs and the memory run are separate: tracemalloc slows allocation-heavy code a lot
+    fn()  # warm caches (splitter construction, regex compilation)
+    times = []
+    chunks = 0
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        chunks = fn()
+        times.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"chunks": chunks, "seconds": round(min(times), 4), "peak_mb": round(peak / 2**20, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=4.0, help="synthetic document size")
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = make_document(args.mb)
+    text = "\n".join(p.text for p in pages)
+    size_mb = len(text) / 2**20
+    cs, co = args.chunk_size, args.chunk_overlap
+    tok_cs, tok_co = max(cs // 4, 2), max(co // 4, 1)
+
+    cases: Dict[str, Callable[[], int]] = {
+        "legacy_sliding": lambda: len(legacy_sliding(text, cs, co)),
+        "engine_sliding_chars": lambda: len(get_engine("sliding", cs, co).split(text)),
+        "engine_sliding_chars_stream": lambda: sum(1 for _ in get_engine("sliding", cs, co).stream(iter(pages))),
+        "engine_sliding_tokens": lambda: len(get_engine("sliding", tok_cs, tok_co, "tokens").split(text)),
+        "legacy_recursive": lambda: len(legacy_recursive(text, cs, co)),
+        "engine_recursive_chars": lambda: len(get_engine("recursive", cs, co).split(text)),
+        "engine_recursive_chars_stream": lambda: sum(1 for _ in get_engine("recursive", cs, co).stream(iter(pages))),
+        "engine_recursive_tokens": lambda: len(get_engine("recursive", tok_cs, tok_co, "tokens").split(text)),
+    }
+    results = {}
+    for name, fn in cases.items():
+        r = measure(fn, args.repeat)
+        r["mb_per_s"] = round(size_mb / r["seconds"], 2) if r["seconds"] else None
+        results[name] = r
+
+    print(json.dumps({
+        "benchmark": "chunking",
+        "document_mb": round(size_mb, 2),
+        "pages": len(pages),
+        "chunk_size": cs,
+        "chunk_overlap": co,
+        "token_chunk_size": tok_cs,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Cold-start benchmark: ``import app.main`` time and time to the first served request.
+
+Every sample is a fresh interpreter, so nothing is shared between runs:
+  * ``import``: ``python -c "import app.main"`` with the real SDKs (no network is touched at import).
+    Reports wall time, the modules loaded, the slowest top-level packages (from ``-X importtime``)
+    and which of the heavy, lazily imported modules (pypdf, langchain, groq, pinecone, httpx)
+    were loaded eagerly;
+  * ``first_request``: boots the app against ``benchmarks.fakes`` for each warm-up mode
+    (``blocking``: CLIENT_WARMUP, the default; ``background``: CLIENT_WARMUP_BACKGROUND;
+    ``off``: CLIENT_WARMUP=0) and times the lifespan startup, the first ``/health/live``, the first
+    ``/health`` that reports ready and the first ``/chat/query``.
+
+Median and min over ``--runs`` samples go to stdout as JSON. For CI, ``--max-import-ms`` and
+``--forbid-eager`` turn a regression into a non-zero exit code:
+
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 2500 --forbid-eager > bench_startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pypdf", "langchain_text_splitters", "langchain_core", "groq", "pinecone", "httpx")
+MODES = {
+    "blocking": {"CLIENT_WARMUP": "1", "CLIENT_WARMUP_BACKGROUND": "0"},
+    "background": {"CLIENT_WARMUP": "1", "CLIENT_WARMUP_BACKGROUND": "1"},
+    "off": {"CLIENT_WARMUP": "0"},
+}
+
+IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - t0
+heavy = {heavy!r}
+print(json.dumps({{"import_ms": round(elapsed * 1000, 1), "modules": len(sys.modules),
+                  "eager": [m for m in heavy if m in sys.modules]}}))
+"""
+
+
+def git_commit() -> str | None:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except Exception:
+        return None
+
+
+def child_env(workdir: str, extra: Dict[str, str] | None = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        PINECONE_API_KEY="bench", PINECONE_INDEX_NAME="bench", PINECONE_EMBEDDING_MODEL="fake-embed",
+        GROQ_API_KEY="bench",
+        LOCAL_VECTOR_DIR=f"{workdir}/vectors",
+        INGEST_SPOOL_DIR=f"{workdir}/spool",
+        LOG_LEVEL="WARNING",
+        PYTHONPATH=ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    )
+    env.update(extra or {})
+    return env
+
+
+def run_child(cmd: List[str], env: Dict[str, str]) -> Dict[str, Any]:
+    spawned = time.time()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[:4])} failed:\n{proc.stderr[-2000:]}")
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["spawned"] = spawned
+    return out
+
+
+def parse_importtime(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """Cumulative import time of each top-level package, slowest first."""
+    packages: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        name = name.strip()
+        if "." not in name and name not in packages:
+            packages[name] = int(cumulative)
+    ranked = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def summarize(samples: List[Dict[str, Any]], keys: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for key in keys:
+        values = [s[key] for s in samples if s.get(key) is not None]
+        if values:
+            out[key] = {"median": round(statistics.median(values), 1), "min": round(min(values), 1)}
+    return out
+
+
+def bench_import(runs: int, top: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as workdir:
+        env = child_env(workdir)
+        probe = IMPORT_PROBE.format(heavy=HEAVY_MODULES)
+        samples = [run_child([sys.executable, "-c", probe], env) for _ in range(runs)]
+        # -X importtime slows the import down; it is only used for the per-package breakdown
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                              capture_output=True, text=True)
+    return {
+        **summarize(samples, ["import_ms"]),
+        "modules": samples[-1]["modules"],
+        "eager_heavy_modules": sorted({m for s in samples for m in s["eager"]}),
+        "slowest_packages": parse_importtime(proc.stderr, top),
+    }
+
+
+def bench_first_request(mode: str, runs: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="bench_startup_") as workdir:
+            s = run_child([sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+                          child_env(workdir, MODES[mode]))
+        # interpreter start-up plus the harness imports (fakes, httpx), before the app import
+        s["interpreter_ms"] = (s["entered"] - s["spawned"]) * 1000
+        # process spawn to first response, less the bench-only table creation
+        s["time_to_first_request_ms"] = (s["first_response_at"] - s["spawned"]) * 1000 - s["setup_ms"]
+        samples.append(s)
+    keys = ["time_to_first_request_ms", "interpreter_ms", "import_ms", "startup_ms", "first_request_ms",
+            "ready_ms", "first_chat_ms"]
+    return summarize(samples, keys)
+
+
+def child() -> None:
+    """One cold boot against the fakes; prints its timings as one JSON line."""
+    entered = time.time()
+    import asyncio
+
+    import httpx
+    from loguru import logger
+    from sqlmodel import SQLModel
+
+    from benchmarks import fakes
+
+    fakes.install(fakes.FakeConfig(fakes.Latency(0), 0.0, fakes.Latency(0), fakes.Latency(0)))
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        from app.main import app
+    timings["import_ms"] = (time.perf_counter() - t0) * 1000
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    t0 = time.perf_counter()
+    from app.db.session import engine
+
+    SQLModel.metadata.create_all(engine)
+    timings["setup_ms"] = (time.perf_counter() - t0) * 1000
+
+    async def serve() -> None:
+        from app.core.config import get_settings
+
+        prefix = get_settings().api_prefix
+        transport = httpx.ASGITransport(app=app)
+        t0 = time.perf_counter()
+        async with app.router.lifespan_context(app), httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=60
+        ) as client:
+            serving = time.perf_counter()
+            timings["startup_ms"] = (serving - t0) * 1000
+            r = await client.get(f"{prefix}/health/live")
+            r.raise_for_status()
+            timings["first_response_at"] = time.time()
+            timings["first_request_ms"] = (time.perf_counter() - serving) * 1000
+            while (await client.get(f"{prefix}/health")).status_code != 200:
+                if time.perf_counter() - serving > 30:
+                    raise RuntimeError("app did not report ready within 30 s")
+                await asyncio.sleep(0.01)
+            timings["ready_ms"] = (time.perf_counter() - serving) * 1000
+            t0 = time.perf_counter()
+            r = await client.post(f"{prefix}/chat/query", json={"session_id": "bench", "question": "refund policy"})
+            r.raise_for_status()
+            timings["first_chat_ms"] = (time.perf_counter() - t0) * 1000
+
+    asyncio.run(serve())
+    timings["entered"] = entered
+    print(json.dumps(timings))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--top", type=int, default=15, help="packages listed in slowest_packages")
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="exit 1 if the median import time exceeds this")
+    parser.add_argument("--forbid-eager", action="store_true",
+                        help="exit 1 if importing the app loads any of the lazily imported heavy modules")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        child()
+        return
+    started = time.perf_counter()
+    imports = bench_import(args.runs, args.top)
+    first = {mode: bench_first_request(mode, args.runs) for mode in args.modes}
+    failures = []
+    if args.max_import_ms is not None and imports["import_ms"]["median"] > args.max_import_ms:
+        failures.append(f"median import {imports['import_ms']['median']} ms > {args.max_import_ms} ms")
+    if args.forbid_eager and imports["eager_heavy_modules"]:
+        failures.append(f"imported eagerly: {', '.join(imports['eager_heavy_modules'])}")
+    print(json.dumps({
+        "benchmark": "startup",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "child"},
+        "wall_s": round(time.perf_counter() - started, 2),
+        "import": imports,
+        "first_request": first,
+        "failures": failures,
+    }, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Local vector store query latency and recall benchmark.
+
+Builds a clustered synthetic corpus in a temporary directory, then measures top-k query latency
+for exact search (float32 and float16) and for the IVF mode, with IVF recall against exact search.
+
+    python -m benchmarks.bench_vector_store --vectors 100000 --dim 1024 > bench_vector_store.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+
+
+def make_corpus(n: int, dim: int, clusters: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+
+def run_queries(store: LocalVectorStore, queries: np.ndarray, top_k: int) -> tuple[List[set], List[float]]:
+    store.query(queries[0], top_k)  # warm: page in the matrix, build the IVF index
+    hits, times = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = store.query(q, top_k)
+        times.append(time.perf_counter() - t0)
+        hits.append({r["id"] for r in res})
+    return hits, times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.vectors, args.dim, args.clusters)
+    rng = np.random.default_rng(11)
+    queries = corpus[rng.integers(0, len(corpus), args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim))
+    items = [{"id": str(i), "values": v} for i, v in enumerate(corpus)]
+
+    results: Dict[str, Dict[str, float]] = {}
+    exact_hits: List[set] = []
+    with tempfile.TemporaryDirectory() as root:
+        for name, dtype, ivf_min in (
+            ("exact_float32", "float32", 0),
+            ("exact_float16", "float16", 0),
+            ("ivf_float32", "float32", 1),
+        ):
+            store = LocalVectorStore(f"{root}/{name}", dtype=dtype, ivf_min=ivf_min, nprobe=args.nprobe)
+            t0 = time.perf_counter()
+            store.upsert(items)
+            load_s = time.perf_counter() - t0
+            hits, times = run_queries(store, queries, args.top_k)
+            if name == "exact_float32":
+                exact_hits = hits
+            r = {"upsert_s": round(load_s, 3), **percentiles(times), "qps": round(len(times) / sum(times), 1)}
+            r["recall_at_k"] = round(float(np.mean([len(h & e) / args.top_k for h, e in zip(hits, exact_hits)])), 4)
+            results[name] = r
+
+    print(json.dumps({
+        "benchmark": "vector_store",
+        "vectors": args.vectors,
+        "dim": args.dim,
+        "top_k": args.top_k,
+        "nprobe": args.nprobe,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""In-process stand-ins for Groq, Pinecone (inference + index) and Redis, with configurable latency.
+
+``install()`` patches the client constructors the app uses and must run before anything under
+``app`` is imported. The stand-ins behave like the real services where the app depends on it:
+embeddings are deterministic bag-of-words vectors (so retrieval returns related chunks), the
+booking classifier prompt is answered with ``BOOKING_READY``/``BOOKING_PARTIAL``/``NO_BOOKING`` and
+booking follow-ups with the email they contain, responses carry usage, and Redis is fakeredis with
+one server shared by the sync and asyncio clients.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+
+
+@dataclass
+class Latency:
+    """Simulated service latency: ``mean_ms`` +/- uniform ``jitter`` (fraction of the mean)."""
+
+    mean_ms: float = 0.0
+    jitter: float = 0.2
+
+    def sample(self) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        return max(0.0, self.mean_ms * (1 + random.uniform(-self.jitter, self.jitter))) / 1000
+
+
+@dataclass
+class FakeConfig:
+    llm: Latency
+    llm_stream_token_ms: float
+    embed: Latency
+    vector: Latency
+    dim: int = 384
+    answer_words: int = 60
+
+
+CONFIG = FakeConfig(Latency(300), 5.0, Latency(30), Latency(20))
+
+
+def embed_text(text: str, dim: int) -> List[float]:
+    v = np.zeros(dim, dtype=np.float32)
+    for w in _WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    n = float(np.linalg.norm(v))
+    return (v / n if n else v).tolist()
+
+
+# --- Pinecone -----------------------------------------------------------------------------------
+
+class _Inference:
+    def embed(self, model: str, inputs: List[str], parameters: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        time.sleep(CONFIG.embed.sample())
+        return {"data": [{"values": embed_text(t, CONFIG.dim)} for t in inputs]}
+
+    def get_model(self, model: str | None = None, **_: Any) -> Dict[str, Any]:
+        return {"model": model, "dimension": CONFIG.dim}
+
+
+class FakeIndex:
+    def __init__(self) -> None:
+        self._ns: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _space(self, namespace: str | None) -> Dict[str, Any]:
+        return self._ns.setdefault(namespace or "", {"ids": [], "rows": {}, "vecs": [], "meta": []})
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str | None = None) -> None:
+        time.sleep(CONFIG.vector.sample())
+        with self._lock:
+            sp = self._space(namespace)
+            for v in vectors:
+                row = sp["rows"].get(v["id"])
+                vec = np.asarray(v["values"], dtype=np.float32)
+                if row is None:
+                    sp["rows"][v["id"]] = len(sp["ids"])
+                    sp["ids"].append(v["id"])
+                    sp["vecs"].append(vec)
+                    sp["meta"].append(dict(v.get("metadata") or {}))
+                else:
+                    sp["vecs"][row], sp["meta"][row] = vec, dict(v.get("metadata") or {})
+            sp.pop("matrix", None)
+
+    def query(self, vector, top_k: int = 5, namespace: str | None = None, include_metadata: bool = True, **_) -> Dict:
+        time.sleep(CONFIG.vector.sample())
+        with self._lock:
+            sp = self._space(namespace)
+            if "matrix" not in sp:
+                live = [i for i, vid in enumerate(sp["ids"]) if vid is not None]
+                sp["matrix"] = (np.stack([sp["vecs"][i] for i in live]) if live else None, live)
+            mat, rows = sp["matrix"]
+            if mat is None:
+                return {"matches": []}
+            scores = mat @ np.asarray(vector, dtype=np.float32)
+            top = np.argsort(-scores)[:top_k]
+            return {"matches": [
+                {"id": sp["ids"][rows[i]], "score": float(scores[i]),
+                 "metadata": dict(sp["meta"][rows[i]]) if include_metadata else {}}
+                for i in top
+            ]}
+
+    def delete(self, ids: List[str], namespace: str | None = None) -> None:
+        with self._lock:
+            sp = self._space(namespace)
+            for vid in ids:
+                row = sp["rows"].pop(vid, None)
+                if row is not None:
+                    sp["ids"][row] = None
+            sp.pop("matrix", None)
+
+    def update(self, id: str, set_metadata: Dict[str, Any], namespace: str | None = None) -> None:
+        with self._lock:
+            sp = self._space(namespace)
+            row = sp["rows"].get(id)
+            if row is not None:
+                sp["meta"][row].update(set_metadata)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {"namespaces": {k: {"vector_count": len(v["rows"])} for k, v in self._ns.items()}}
+
+
+_INDEX = FakeIndex()
+
+
+class FakePinecone:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.inference = _Inference()
+
+    def Index(self, *args: Any, **kwargs: Any) -> FakeIndex:  # noqa: N802
+        return _INDEX
+
+    def close(self) -> None:
+        pass
+
+
+# --- Groq ---------------------------------------------------------------------------------------
+
+def _reply(messages: List[Dict[str, str]]) -> str:
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    user = messages[-1]["content"]
+    email = _EMAIL_RE.search(user)
+    if "collecting details to book" in system:  # follow-up turn of a booking draft
+        return json.dumps({"email": email.group()}) if email else "OTHER"
+    if "book an interview" in system:
+        day = zlib.crc32(user.encode()) % 28 + 1
+        slots = {"name": "Bench User", "date": f"2031-01-{day:02d}", "time": "15:00:00"}
+        if "book" in user.lower() and email:
+            return "BOOKING_READY: " + json.dumps({**slots, "email": email.group()})
+        return "BOOKING_PARTIAL: " + json.dumps(slots) if "book" in user.lower() else "NO_BOOKING"
+    if "running summary" in system:
+        return "User asked several product questions."
+    words = _WORD_RE.findall(user) or ["ok"]
+    return " ".join(words[i % len(words)] for i in range(CONFIG.answer_words))
+
+
+class _Usage(SimpleNamespace):
+    def model_dump(self) -> Dict[str, int]:  # the SDK's usage is a pydantic model
+        return dict(vars(self))
+
+
+def _usage(messages: List[Dict[str, str]], text: str) -> _Usage:
+    prompt = sum(len(m.get("content") or "") for m in messages) // 4
+    completion = len(text) // 4
+    return _Usage(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+def _response(messages: List[Dict[str, str]]) -> SimpleNamespace:
+    text = _reply(messages)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=_usage(messages, text)
+    )
+
+
+class _Completions:
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> SimpleNamespace:
+        time.sleep(CONFIG.llm.sample())
+        return _response(messages)
+
+
+class _AsyncCompletions:
+    async def create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any):
+        await asyncio.sleep(CONFIG.llm.sample())
+        if not stream:
+            return _response(messages)
+        return self._stream(messages)
+
+    async def _stream(self, messages: List[Dict[str, str]]):
+        text = _reply(messages)
+        for word in text.split(" "):
+            await asyncio.sleep(CONFIG.llm_stream_token_ms / 1000)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+        yield SimpleNamespace(choices=[], usage=_usage(messages, text))
+
+
+class FakeGroq:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.chat = SimpleNamespace(completions=_Completions())
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(data=[]))
+
+    def close(self) -> None:
+        pass
+
+
+class FakeAsyncGroq:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.chat = SimpleNamespace(completions=_AsyncCompletions())
+        self.models = SimpleNamespace(list=self._list_models)
+
+    async def _list_models(self) -> SimpleNamespace:
+        return SimpleNamespace(data=[])
+
+    async def close(self) -> None:
+        pass
+
+
+# --- wiring -------------------------------------------------------------------------------------
+
+def install(config: FakeConfig | None = None, redis_url: str | None = None) -> None:
+    """Patch Groq, Pinecone and (unless ``redis_url`` is given) Redis; call before importing ``app``."""
+    global CONFIG
+    if config is not None:
+        CONFIG = config
+
+    import groq
+    import pinecone
+
+    groq.Groq, groq.AsyncGroq = FakeGroq, FakeAsyncGroq
+    pinecone.Pinecone = FakePinecone
+
+    if redis_url is None:
+        import fakeredis
+        import redis
+        import redis.asyncio
+
+        from fakeredis import aioredis as fake_aioredis
+
+        server = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kw: fakeredis.FakeRedis(server=server, **kw)
+        redis.asyncio.from_url = lambda url, **kw: fakeredis.FakeAsyncRedis(server=server, **kw)
+        # the app's pooled clients (app.core.clients) build their pools with from_url
+        def fake_pool(build, conn_cls):
+            def from_url(cls, url, **kw):
+                kw.pop("health_check_interval", None)  # fakeredis' asyncio connection fails redis-py's PING check
+                return build(cls, url, connection_class=conn_cls, server=server, **kw)
+            return classmethod(from_url)
+
+        for pool_cls, conn_cls in (
+            (redis.BlockingConnectionPool, fakeredis.FakeConnection),
+            (redis.asyncio.BlockingConnectionPool, fake_aioredis.FakeConnection),
+        ):
+            pool_cls.from_url = fake_pool(pool_cls.from_url.__func__, conn_cls)
+
+    # Document.meta is JSONB; let SQLite store it as JSON
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(JSONB, "sqlite")
+    def _jsonb_sqlite(type_, compiler, **kw):  # noqa: ANN001
+        return "JSON"